@@ -0,0 +1,66 @@
+import time
+
+"""
+Linger-window batching of the per-clip Kafka alerts.
+
+Items are held for at most 'linger' seconds (or until 'max_batch' are pending) and then handed to send_many() as
+one batch, which is sent as a single alert -- so a backlog drain after an outage costs one produce per batch rather
+than one per clip. A batch of one is sent through send_one() unchanged, and items for which bypass() returns True
+(e.g., calibration alerts) flush whatever is pending and are sent on their own immediately.
+
+Not thread-safe: add()/poll() are called from the main process's alert loop only.
+"""
+
+##=============================================================================
+
+class AlertBatcher():
+	"""
+	Accumulates alerts and flushes them by linger window / batch size.
+	"""
+	def __init__(self, send_one, send_many, linger=1.0, max_batch=100, bypass=None):
+		self.send_one = send_one
+		self.send_many = send_many
+		self.linger = linger
+		self.max_batch = max(1, max_batch)
+		self.bypass = bypass
+		self.__pending = []
+		self.__first_added = None
+
+	def __len__(self):
+		return len(self.__pending)
+
+	def add(self, item):
+		""" Queues an alert; sends the batch right away if it is full (or the item bypasses batching). """
+		if self.bypass is not None and self.bypass(item):
+			self.flush()
+			self.send_one(item)
+			return
+		if not self.__pending:
+			self.__first_added = time.monotonic()
+		self.__pending.append(item)
+		if len(self.__pending) >= self.max_batch or self.linger <= 0:
+			self.flush()
+
+	def time_to_flush(self):
+		""" Seconds until the pending batch's linger window expires (None if nothing is pending). """
+		if not self.__pending:
+			return None
+		return max(0.0, self.__first_added + self.linger - time.monotonic())
+
+	def poll(self):
+		""" Flushes the pending batch if its linger window has expired. """
+		if self.__pending and self.time_to_flush() <= 0:
+			self.flush()
+
+	def flush(self):
+		if not self.__pending:
+			return
+		batch, self.__pending = self.__pending, []
+		self.__first_added = None
+		if len(batch) == 1:
+			self.send_one(batch[0])
+		else:
+			self.send_many(batch)
+
+
+##=============================================================================
@@ -0,0 +1,119 @@
+import os
+import json
+import sqlite3
+import threading
+
+"""
+Durable (SQLite) outbox for the Kafka messages (alerts, heartbeats) the sensor sends.
+
+Messages are appended with their final envelope (timestamp, messageId) at the time they are created and deleted
+only once they have been handed to the presentation layer, so a Kafka outage -- or a container restart during
+one -- delays messages instead of losing them, and they are drained in their original order on reconnect.
+
+A message may carry a 'coalesce_key' (e.g., heartbeats): queuing it replaces any undelivered message with the same
+key, so an outage leaves one stale heartbeat behind rather than thousands. The outbox is bounded by 'max_rows':
+a message more than 'max_rows' ids older than the newest one is dropped (and counted), which costs a primary-key
+range delete per insert rather than a table count. Delivered messages are deleted a peek() page at a time. A message that can never be sent (e.g., it fails the
+serializer's validation) is moved to a 'dead_letter' table by dead_letter(), so it can't block the messages behind it.
+
+The connection is opened lazily per process, so the outbox may be created before the sensor forks.
+"""
+
+##=============================================================================
+
+class AlertOutbox():
+	"""
+	Ordered, persistent FIFO of (recipient, message) pairs.
+	"""
+	def __init__(self, path, max_rows=100000):
+		self.path = path
+		self.max_rows = max_rows
+		self.dropped = 0
+		self.__conn = None
+		self.__pid = None
+		self.__lock = threading.Lock()
+
+	def __db(self):
+		if self.__pid != os.getpid():
+			directory = os.path.dirname(self.path)
+			if directory:
+				os.makedirs(directory, exist_ok=True)
+			self.__conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+			self.__conn.execute('PRAGMA journal_mode=WAL')
+			self.__conn.execute('PRAGMA synchronous=NORMAL')
+			self.__conn.execute('CREATE TABLE IF NOT EXISTS outbox ('
+								'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+								'recipient TEXT NOT NULL, '
+								'coalesce_key TEXT, '
+								'message TEXT NOT NULL)')
+			self.__conn.execute('CREATE TABLE IF NOT EXISTS dead_letter ('
+								'id INTEGER PRIMARY KEY, '
+								'recipient TEXT NOT NULL, '
+								'message TEXT NOT NULL, '
+								'reason TEXT, '
+								'failed_at REAL DEFAULT (julianday(\'now\')))')
+			self.__pid = os.getpid()
+		return self.__conn
+
+	def __len__(self):
+		with self.__lock:
+			return self.__db().execute('SELECT COUNT(*) FROM outbox').fetchone()[0]
+
+	def put(self, recipient, message, coalesce_key=None):
+		""" Appends a message (any JSON-serializable object). """
+		payload = json.dumps(message, default=str)
+		with self.__lock:
+			db = self.__db()
+			db.execute('BEGIN')
+			try:
+				if coalesce_key is not None:
+					db.execute('DELETE FROM outbox WHERE coalesce_key = ?', (coalesce_key,))
+				new_id = db.execute('INSERT INTO outbox (recipient, coalesce_key, message) VALUES (?, ?, ?)',
+									(recipient, coalesce_key, payload)).lastrowid
+				trimmed = db.execute('DELETE FROM outbox WHERE id <= ?', (new_id - self.max_rows,)).rowcount
+				db.execute('COMMIT')
+				self.dropped += max(0, trimmed)
+			except BaseException:
+				db.execute('ROLLBACK')
+				raise
+
+	def peek(self, limit=100):
+		""" Returns up to 'limit' of the oldest messages as [(id, recipient, message)]. """
+		with self.__lock:
+			rows = self.__db().execute('SELECT id, recipient, message FROM outbox ORDER BY id LIMIT ?', (limit,)).fetchall()
+		return [(row_id, recipient, json.loads(message)) for row_id, recipient, message in rows]
+
+	def delete(self, row_id):
+		""" Removes a delivered message. """
+		self.delete_many([row_id])
+
+	def delete_many(self, row_ids):
+		""" Removes delivered messages in one transaction. """
+		if not row_ids:
+			return
+		with self.__lock:
+			db = self.__db()
+			db.execute('BEGIN')
+			try:
+				db.executemany('DELETE FROM outbox WHERE id = ?', [(row_id,) for row_id in row_ids])
+				db.execute('COMMIT')
+			except BaseException:
+				db.execute('ROLLBACK')
+				raise
+
+	def dead_letter(self, row_id, reason):
+		""" Moves an undeliverable message out of the outbox into the 'dead_letter' table (with the reason). """
+		with self.__lock:
+			db = self.__db()
+			db.execute('BEGIN')
+			try:
+				db.execute('INSERT OR REPLACE INTO dead_letter (id, recipient, message, reason) '
+						   'SELECT id, recipient, message, ? FROM outbox WHERE id = ?', (str(reason), row_id))
+				db.execute('DELETE FROM outbox WHERE id = ?', (row_id,))
+				db.execute('COMMIT')
+			except BaseException:
+				db.execute('ROLLBACK')
+				raise
+
+
+##=============================================================================
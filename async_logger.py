@@ -0,0 +1,198 @@
+import os
+import sys
+import time
+import queue
+import atexit
+import weakref
+import threading
+
+"""
+Non-blocking, rate-limited logging front-end.
+
+AsyncLogger wraps any logger exposing info/warning/error/critical (the Alcazar logger or the get_logger stand-in)
+and hands each record to a background writer thread through a bounded queue, so a slow stdout or a full container
+log buffer can never stall capture or upload. If the queue is full the record is dropped (and the drop count is
+reported with the next record that gets through).
+
+Records may carry structured fields and an optional rate-limiting key:
+
+		logger.info("Waiting for VLC to exit", key="listen_stop_wait", pid=1234)
+		--> [INFO]  Waiting for VLC to exit | pid=1234
+
+At most 'burst' records per key are written each 'period' seconds; the rest are counted and summarized as
+"(+N suppressed)" on the next record for that key.
+
+NOTE: 	The writer thread is (re)started lazily in whichever process first logs, so one AsyncLogger created before
+		the sensor forks its audio/hash/posting processes works in all of them. The lock is replaced in a forked
+		child (os.register_at_fork), as the parent's copy may have been held by another thread at the fork.
+		multiprocessing children leave through os._exit(), which skips atexit: call close() at the end of every
+		process target, or the records still queued there are lost.
+"""
+
+LEVELS = ('debug', 'info', 'warning', 'error', 'critical')
+
+_instances = weakref.WeakSet()   ## Live AsyncLoggers, for the (once-registered) fork && exit hooks below
+
+##=============================================================================
+
+class _RateLimit():
+	""" Fixed-window limiter state for one message key. """
+	__slots__ = ('window_start', 'count', 'suppressed')
+
+	def __init__(self, now):
+		self.window_start = now
+		self.count = 0
+		self.suppressed = 0
+
+
+class AsyncLogger():
+	"""
+	Queue-backed logger with a background writer thread, structured fields and per-key rate limiting.
+	"""
+	def __init__(self, target, max_queue=2000, period=10.0, burst=1):
+		self.target = target
+		self.max_queue = max_queue
+		self.period = period
+		self.burst = burst
+		self.name = getattr(target, 'name', self.__class__.__name__)
+		self.__pid = None
+		self.__queue = None
+		self.__thread = None
+		self.__limits = {}
+		self.__dropped = 0
+		self.__lock = threading.Lock()
+		_instances.add(self)
+
+
+	def _after_fork(self):
+		## Only the forking thread survives: a lock it didn't hold may be stuck 'held' forever, && the writer is gone
+		self.__lock = threading.Lock()
+		self.__pid = None
+
+
+	def __ensure_writer(self):
+		""" Starts (or, after a fork, restarts) this process's writer thread. """
+		pid = os.getpid()
+		if self.__pid == pid:
+			return
+		with self.__lock:
+			if self.__pid == pid:
+				return
+			self.__queue = queue.Queue(maxsize=self.max_queue)
+			self.__limits = {}
+			self.__dropped = 0
+			self.__thread = threading.Thread(target=self.__writer, name=f'{self.name}_writer', daemon=True)
+			self.__thread.start()
+			self.__pid = pid
+
+
+	def __writer(self):
+		q = self.__queue
+		while True:
+			record = q.get()
+			try:
+				if record is None:
+					return
+				level, msg = record
+				getattr(self.target, level, self.target.info)(msg)
+			except Exception as exc:
+				try:
+					sys.stderr.write(f'[AsyncLogger]  Failed to write log record: {exc}\n')
+				except Exception:
+					pass
+			finally:
+				q.task_done()
+
+
+	def __allow(self, key, now):
+		""" Returns (allowed, suppressed_count) for a record with the given rate-limiting key. """
+		state = self.__limits.get(key)
+		if state is None:
+			state = self.__limits[key] = _RateLimit(now)
+		if now - state.window_start >= self.period:
+			state.window_start = now
+			state.count = 0
+		if state.count >= self.burst:
+			state.suppressed += 1
+			return False, 0
+		state.count += 1
+		suppressed, state.suppressed = state.suppressed, 0
+		return True, suppressed
+
+
+	def log(self, level, msg, key=None, **fields):
+		self.__ensure_writer()
+		suppressed = 0
+		if key is not None:
+			with self.__lock:
+				allowed, suppressed = self.__allow(key, time.monotonic())
+			if not allowed:
+				return
+		if fields:
+			msg = f"{msg} | " + ' '.join(f'{k}={v}' for k, v in fields.items())
+		if suppressed:
+			msg = f"{msg} (+{suppressed} suppressed)"
+		with self.__lock:
+			if self.__dropped:
+				msg = f"{msg} [{self.__dropped} log records dropped]"
+			try:
+				self.__queue.put_nowait((level, msg))
+				self.__dropped = 0
+			except queue.Full:
+				self.__dropped += 1
+
+
+	def debug(self, msg, key=None, **fields):
+		self.log('debug', msg, key, **fields)
+
+	def info(self, msg, key=None, **fields):
+		self.log('info', msg, key, **fields)
+
+	def warning(self, msg, key=None, **fields):
+		self.log('warning', msg, key, **fields)
+
+	def error(self, msg, key=None, **fields):
+		self.log('error', msg, key, **fields)
+
+	def critical(self, msg, key=None, **fields):
+		self.log('critical', msg, key, **fields)
+
+
+	def flush(self, timeout=2.0):
+		""" Waits (up to 'timeout' seconds) for this process's queued records to be written. """
+		if self.__pid != os.getpid() or self.__queue is None:
+			return
+		deadline = time.monotonic() + timeout
+		while self.__queue.unfinished_tasks and time.monotonic() < deadline:
+			time.sleep(0.01)
+
+
+	def close(self, timeout=2.0):
+		""" Flushes, then stops this process's writer thread (a later record restarts it). """
+		if self.__pid != os.getpid() or self.__queue is None:
+			return
+		self.flush(timeout)
+		with self.__lock:
+			thread, self.__pid = self.__thread, None
+		try:
+			self.__queue.put(None, timeout=timeout)
+		except queue.Full:
+			return
+		thread.join(timeout)
+
+
+def _after_fork_in_child():
+	for logger in list(_instances):
+		logger._after_fork()
+
+
+def _close_all():
+	for logger in list(_instances):
+		logger.close()
+
+
+if hasattr(os, 'register_at_fork'):
+	os.register_at_fork(after_in_child=_after_fork_in_child)
+atexit.register(_close_all)
+
+##=============================================================================
@@ -0,0 +1,427 @@
+import os
+import struct
+from dataclasses import dataclass
+import numpy as np
+
+"""
+Vectorized (NumPy) helpers for reading captured WAV clips and objectively scoring their audio quality.
+
+NOTE: 	VLC writes its WAV header up-front and is SIGKILL'd by VLCAudioListener.listen_stop(), so the RIFF/data
+		chunk sizes of a captured clip are frequently left as 0 (or 0xFFFFFFFF); the parser below falls back to
+		"everything after the 'data' chunk header" whenever the recorded size is not trustworthy.
+"""
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+ANALYSIS_BLOCK_SECONDS = 5.0   ## Decode size of iter_wav_blocks(): ~5 s x samplerate x channels x 4 bytes per block
+
+##=============================================================================
+
+@dataclass
+class WavInfo:
+	""" Header fields of a WAV file, plus the location of its sample data. """
+	format_tag: int
+	channels: int
+	samplerate: int
+	byte_rate: int
+	block_align: int
+	bits_per_sample: int
+	data_offset: int
+	data_size: int
+
+	@property
+	def is_pcm(self):
+		""" True if the sample data is linear PCM or IEEE float (i.e., can be decoded without a codec). """
+		return self.format_tag in (WAVE_FORMAT_PCM, WAVE_FORMAT_IEEE_FLOAT)
+
+	@property
+	def duration(self):
+		""" Clip duration (in seconds) derived from the byte rate; also valid for CBR compressed payloads (e.g., mpga). """
+		return self.data_size / self.byte_rate if self.byte_rate else 0.0
+
+	@property
+	def frame_count(self):
+		""" Number of sample frames in the clip (only meaningful for PCM payloads). """
+		return self.data_size // self.block_align if self.block_align else 0
+
+
+def read_wav_info(path):
+	""" Parses the RIFF chunks of the WAV file at 'path'; raises ValueError if it is not a usable WAV file. """
+	file_size = os.path.getsize(path)
+	with open(path, 'rb') as f:
+		riff = f.read(12)
+		if len(riff) < 12 or riff[:4] != b'RIFF' or riff[8:12] != b'WAVE':
+			raise ValueError(f"'{path}' is not a RIFF/WAVE file")
+		fmt = None
+		while True:
+			chunk_hdr = f.read(8)
+			if len(chunk_hdr) < 8:
+				raise ValueError(f"'{path}' has no 'data' chunk")
+			chunk_id, chunk_size = struct.unpack('<4sI', chunk_hdr)
+			if chunk_id == b'fmt ':
+				fmt = f.read(chunk_size)
+				if chunk_size % 2:
+					f.seek(1, os.SEEK_CUR)
+			elif chunk_id == b'data':
+				if fmt is None or len(fmt) < 16:
+					raise ValueError(f"'{path}' has a 'data' chunk before its 'fmt ' chunk")
+				data_offset = f.tell()
+				remaining = file_size - data_offset
+				## Unfinalized header (VLC killed mid-capture) --> trust the file size instead
+				data_size = chunk_size if 0 < chunk_size <= remaining else remaining
+				break
+			else:
+				f.seek(chunk_size + (chunk_size % 2), os.SEEK_CUR)
+
+	format_tag, channels, samplerate, byte_rate, block_align, bits = struct.unpack('<HHIIHH', fmt[:16])
+	if format_tag == WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+		format_tag = struct.unpack('<H', fmt[24:26])[0]   ## First 2 bytes of the SubFormat GUID
+	if block_align:
+		data_size -= data_size % block_align   ## Drop any partially-written trailing frame
+	return WavInfo(format_tag, channels, samplerate, byte_rate, block_align, bits, data_offset, data_size)
+
+
+def load_wav(path, max_seconds=None):
+	"""
+	Loads a PCM/float WAV file as a float32 array of shape (frames, channels) normalized to [-1.0, 1.0];
+	returns the tuple (samples, samplerate). Raises ValueError for compressed payloads (e.g., mpga-in-WAV).
+	"""
+	info = read_wav_info(path)
+	if not info.is_pcm:
+		raise ValueError(f"'{path}' holds a compressed payload (format tag 0x{info.format_tag:04x}); PCM is required")
+	frames = info.frame_count
+	if max_seconds is not None:
+		frames = min(frames, int(max_seconds * info.samplerate))
+	raw = np.fromfile(path, dtype=np.uint8, count=frames * info.block_align, offset=info.data_offset)
+	return _decode(raw, info, path), info.samplerate
+
+
+def iter_wav_blocks(path, block_seconds=ANALYSIS_BLOCK_SECONDS):
+	"""
+	Yields a PCM/float WAV file's samples as consecutive float32 (frames, channels) blocks of 'block_seconds' (the
+	last one shorter), so the decoded clip never has to fit in memory at once. Raises ValueError like load_wav().
+	"""
+	info = read_wav_info(path)
+	if not info.is_pcm:
+		raise ValueError(f"'{path}' holds a compressed payload (format tag 0x{info.format_tag:04x}); PCM is required")
+	block_bytes = max(1, int(block_seconds * info.samplerate)) * info.block_align
+	remaining = info.frame_count * info.block_align
+	with open(path, 'rb') as f:
+		f.seek(info.data_offset)
+		while remaining > 0:
+			raw = np.frombuffer(f.read(min(block_bytes, remaining)), dtype=np.uint8)
+			raw = raw[:len(raw) - len(raw) % info.block_align]
+			if not len(raw):
+				break
+			remaining -= len(raw)
+			yield _decode(raw, info, path)
+
+
+def _decode(raw, info, path):
+	""" Converts raw little-endian sample bytes to a float32 (frames, channels) array in [-1.0, 1.0]. """
+	width = info.bits_per_sample // 8
+	if info.format_tag == WAVE_FORMAT_IEEE_FLOAT:
+		samples = raw.view('<f4' if width == 4 else '<f8').astype(np.float32)
+	elif width == 1:
+		samples = (raw.astype(np.float32) - 128.0) / 128.0
+	elif width == 2:
+		samples = raw.view('<i2').astype(np.float32) / 32768.0
+	elif width == 3:
+		triplets = raw.reshape(-1, 3).astype(np.int32)
+		ints = triplets[:, 0] | (triplets[:, 1] << 8) | (triplets[:, 2] << 16)
+		ints = np.where(ints & 0x800000, ints - 0x1000000, ints)
+		samples = ints.astype(np.float32) / 8388608.0
+	elif width == 4:
+		samples = raw.view('<i4').astype(np.float32) / 2147483648.0
+	else:
+		raise ValueError(f"'{path}' has an unsupported sample width of {info.bits_per_sample} bits")
+	return samples.reshape(-1, info.channels)
+
+
+def to_mono(samples):
+	""" Downmixes a (frames, channels) array to a 1-D array by averaging the channels. """
+	return samples.mean(axis=1) if samples.ndim == 2 else samples
+
+
+def resample_linear(signal, src_rate, dst_rate):
+	""" Cheap linear-interpolation resampler; adequate for alignment and broadband quality metrics. """
+	if src_rate == dst_rate or len(signal) == 0:
+		return signal
+	n_out = int(round(len(signal) * dst_rate / src_rate))
+	src_t = np.arange(len(signal)) / src_rate
+	dst_t = np.arange(n_out) / dst_rate
+	return np.interp(dst_t, src_t, signal).astype(np.float32)
+
+
+def db(value, floor=1e-12):
+	""" Converts an amplitude ratio to decibels. """
+	return 20.0 * np.log10(np.maximum(value, floor))
+
+
+##=============================================================================
+## Objective quality metrics
+
+def find_alignment(reference, test, samplerate, max_lag_seconds=2.0):
+	"""
+	Returns the lag (in samples) that best aligns 1-D 'test' against 1-D 'reference', using an FFT-based
+	cross-correlation; a positive lag means 'test' starts later than 'reference'.
+	"""
+	max_lag = int(max_lag_seconds * samplerate)
+	n = len(reference) + len(test) - 1
+	nfft = 1 << (n - 1).bit_length()
+	xcorr = np.fft.irfft(np.fft.rfft(test, nfft) * np.conj(np.fft.rfft(reference, nfft)), nfft)
+	## Re-order so that index 0 corresponds to lag -max_lag
+	lags = np.concatenate((xcorr[-max_lag:], xcorr[:max_lag + 1])) if max_lag > 0 else xcorr[:1]
+	return int(np.argmax(lags)) - max_lag
+
+
+def align(reference, test, lag):
+	""" Trims both 1-D signals to their overlapping region given the lag from find_alignment(). """
+	if lag > 0:
+		test = test[lag:]
+	elif lag < 0:
+		reference = reference[-lag:]
+	n = min(len(reference), len(test))
+	return reference[:n], test[:n]
+
+
+def snr_db(reference, test):
+	"""
+	Signal-to-noise ratio (dB) of aligned 'test' against 'reference'; the test signal is first scaled by the
+	least-squares gain so that pure level differences (e.g., codec normalization) are not counted as noise.
+	"""
+	energy = np.dot(test, test)
+	gain = np.dot(reference, test) / energy if energy > 0 else 0.0
+	noise = reference - gain * test
+	return float(10.0 * np.log10(max(np.dot(reference, reference), 1e-20) / max(np.dot(noise, noise), 1e-20)))
+
+
+def average_spectrum(signal, nfft=2048):
+	""" Mean power spectrum over Hann-windowed, 50%-overlapped frames. """
+	hop = nfft // 2
+	if len(signal) < nfft:
+		signal = np.pad(signal, (0, nfft - len(signal)))
+	n_frames = 1 + (len(signal) - nfft) // hop
+	idx = np.arange(nfft)[None, :] + hop * np.arange(n_frames)[:, None]
+	frames = signal[idx] * np.hanning(nfft).astype(np.float32)
+	return (np.abs(np.fft.rfft(frames, axis=1)) ** 2).mean(axis=0)
+
+
+def spectral_distance_db(reference, test, nfft=2048):
+	""" Log-spectral distance (dB, RMS over frequency bins) between the average spectra of two aligned signals. """
+	ref_spec = average_spectrum(reference, nfft)
+	test_spec = average_spectrum(test, nfft)
+	## Normalize total power so the metric reflects spectral shape rather than overall level
+	test_spec *= ref_spec.sum() / max(test_spec.sum(), 1e-20)
+	diff = 10.0 * np.log10(np.maximum(ref_spec, 1e-20) / np.maximum(test_spec, 1e-20))
+	return float(np.sqrt(np.mean(diff ** 2)))
+
+
+def count_clipped(samples, threshold=0.999):
+	""" Number of samples whose magnitude is at (or beyond) full scale. """
+	return int(np.count_nonzero(np.abs(samples) >= threshold))
+
+
+def compare_clips(reference_path, test_path, max_lag_seconds=2.0, nfft=2048):
+	"""
+	Objectively compares an encoded clip against a reference capture of the same audio;
+	returns a dictionary of {lag_seconds, snr_db, spectral_distance_db, clipped_samples, overlap_seconds}.
+	"""
+	ref, ref_rate = load_wav(reference_path)
+	test, test_rate = load_wav(test_path)
+	clipped = count_clipped(test)
+	ref_mono = to_mono(ref)
+	test_mono = resample_linear(to_mono(test), test_rate, ref_rate)
+
+	lag = find_alignment(ref_mono, test_mono, ref_rate, max_lag_seconds)
+	ref_aligned, test_aligned = align(ref_mono, test_mono, lag)
+	return {
+		"lag_seconds": lag / ref_rate,
+		"snr_db": snr_db(ref_aligned, test_aligned),
+		"spectral_distance_db": spectral_distance_db(ref_aligned, test_aligned, nfft),
+		"clipped_samples": clipped,
+		"overlap_seconds": len(ref_aligned) / ref_rate,
+	}
+
+
+##=============================================================================
+## Voice/activity detection
+
+def frame_levels_db(signal, frame_len):
+	""" Per-frame RMS level (dBFS) of a 1-D signal split into non-overlapping frames of 'frame_len' samples. """
+	n_frames = len(signal) // frame_len
+	if n_frames == 0:
+		return np.empty(0, dtype=np.float32)
+	frames = signal[:n_frames * frame_len].reshape(n_frames, frame_len)
+	return db(np.sqrt(np.mean(frames * frames, axis=1)))
+
+
+def score_activity(samples, samplerate, threshold_db=-50.0, margin_db=10.0, noise_floor_db=None,
+				   frame_seconds=0.03, min_active_ratio=0.02):
+	"""
+	Energy-based activity score for a clip. A frame is active when its level exceeds both the absolute
+	'threshold_db' and the noise floor + 'margin_db' (the floor is estimated as the clip's 10th-percentile frame
+	level unless a calibrated 'noise_floor_db' is given); the clip is active if at least 'min_active_ratio' of its
+	frames are. Returns a JSON-serializable dictionary.
+	"""
+	mono = to_mono(samples)
+	levels = frame_levels_db(mono, max(1, int(frame_seconds * samplerate)))
+	peak = float(np.max(np.abs(samples))) if samples.size else 0.0
+	return _activity(levels, float(np.mean(mono * mono)) if len(mono) else 0.0, peak, threshold_db, margin_db,
+					 noise_floor_db, frame_seconds, min_active_ratio)
+
+
+def score_activity_file(path, threshold_db=-50.0, margin_db=10.0, noise_floor_db=None, frame_seconds=0.03,
+						min_active_ratio=0.02, block_seconds=ANALYSIS_BLOCK_SECONDS, on_block=None):
+	"""
+	score_activity() for a PCM WAV file decoded one block at a time (see iter_wav_blocks), so memory is bounded by
+	a block plus one float per frame; on_block(samples, samplerate) also sees every block (e.g., a level meter).
+	'noise_floor_db' may be a callable of the file's samplerate. Returns (activity, samplerate).
+	"""
+	info = read_wav_info(path)
+	frame_len = max(1, int(frame_seconds * info.samplerate))
+	block_seconds = max(1, int(block_seconds * info.samplerate) // frame_len) * frame_len / info.samplerate   ## Whole frames per block
+	levels, sum_sq, count, peak = [], 0.0, 0, 0.0
+	for block in iter_wav_blocks(path, block_seconds):
+		if on_block is not None:
+			on_block(block, info.samplerate)
+		mono = to_mono(block)
+		levels.append(frame_levels_db(mono, frame_len))
+		sum_sq += float(np.dot(mono, mono))
+		count += len(mono)
+		peak = max(peak, float(np.max(np.abs(block))) if block.size else 0.0)
+	if callable(noise_floor_db):
+		noise_floor_db = noise_floor_db(info.samplerate)
+	levels = np.concatenate(levels) if levels else np.empty(0, dtype=np.float32)
+	return _activity(levels, sum_sq / count if count else 0.0, peak, threshold_db, margin_db, noise_floor_db,
+					 frame_seconds, min_active_ratio), info.samplerate
+
+
+def _activity(levels, mean_square, peak, threshold_db, margin_db, noise_floor_db, frame_seconds, min_active_ratio):
+	if len(levels) == 0:
+		return {"active": False, "active_ratio": 0.0, "active_seconds": 0.0, "rms_db": None,
+				"peak_db": None, "noise_floor_db": noise_floor_db, "threshold_db": threshold_db}
+	floor = float(np.percentile(levels, 10)) if noise_floor_db is None else float(noise_floor_db)
+	threshold = max(threshold_db, floor + margin_db)
+	active_frames = int(np.count_nonzero(levels > threshold))
+	active_ratio = active_frames / len(levels)
+	return {
+		"active": bool(active_ratio >= min_active_ratio),
+		"active_ratio": round(active_ratio, 4),
+		"active_seconds": round(active_frames * frame_seconds, 2),
+		"rms_db": round(float(db(np.sqrt(mean_square))), 2),
+		"peak_db": round(float(db(peak)), 2),
+		"noise_floor_db": round(floor, 2),
+		"threshold_db": round(threshold, 2),
+	}
+
+
+##=============================================================================
+## Calibration profile
+
+OCTAVE_BAND_CENTERS = (63, 125, 250, 500, 1000, 2000, 4000, 8000, 16000)
+
+
+def frame_spectra(signal, nfft=4096):
+	"""
+	Power spectra of Hann-windowed, 50%-overlapped frames, scaled so that each bin holds its share of the signal's
+	mean-square power (i.e., summing a band's bins gives the band power in FS^2); shape (frames, nfft // 2 + 1).
+	"""
+	hop = nfft // 2
+	if len(signal) < nfft:
+		signal = np.pad(signal, (0, nfft - len(signal)))
+	n_frames = 1 + (len(signal) - nfft) // hop
+	idx = np.arange(nfft)[None, :] + hop * np.arange(n_frames)[:, None]
+	window = np.hanning(nfft).astype(np.float32)
+	return np.abs(np.fft.rfft(signal[idx] * window, axis=1)) ** 2 * (2.0 / (nfft * float(np.dot(window, window))))
+
+
+def band_noise_floor_db(spectra, samplerate, nfft=4096, percentile=10):
+	"""
+	Noise floor (dB) of each octave band that lies wholly below Nyquist (a truncated band would under-read, so it
+	is left out rather than reported): the band power of every frame is computed and the 'percentile'-th quietest
+	frame is taken, so speech/transients during calibration do not raise the floor.
+	"""
+	freqs = np.fft.rfftfreq(nfft, 1.0 / samplerate)
+	bands = {}
+	for center in OCTAVE_BAND_CENTERS:
+		lo, hi = center / np.sqrt(2.0), center * np.sqrt(2.0)
+		if hi > samplerate / 2.0:
+			break
+		mask = (freqs >= lo) & (freqs < hi)
+		if not mask.any():
+			continue
+		band_power = spectra[:, mask].sum(axis=1)
+		bands[str(center)] = round(float(10.0 * np.log10(max(np.percentile(band_power, percentile), 1e-20))), 2)
+	return bands
+
+
+def find_hum(spectrum, samplerate, nfft=4096, mains=(50.0, 60.0), harmonics=6, min_prominence_db=10.0):
+	"""
+	Looks for mains hum in an average power spectrum: the local maximum nearest each harmonic of 50 Hz and 60 Hz is
+	compared against the median of the surrounding bins. Returns the prominent peaks as
+	[{frequency_hz, level_db, prominence_db}], loudest first.
+	"""
+	bin_hz = samplerate / nfft
+	candidates = {}
+	for fundamental in mains:
+		for k in range(1, harmonics + 1):
+			target = int(round(fundamental * k / bin_hz))
+			if target < 2 or target + 12 >= len(spectrum):
+				break
+			peak_bin = target - 1 + int(np.argmax(spectrum[target - 1:target + 2]))
+			if not spectrum[peak_bin - 1] < spectrum[peak_bin] > spectrum[peak_bin + 1]:
+				continue   ## Edge of the search window --> leakage from a neighbouring peak
+			neighbours = np.concatenate((spectrum[max(0, peak_bin - 12):max(0, peak_bin - 3)], spectrum[peak_bin + 4:peak_bin + 13]))
+			prominence = 10.0 * np.log10(max(spectrum[peak_bin], 1e-20) / max(float(np.median(neighbours)), 1e-20))
+			if prominence >= min_prominence_db:
+				## Parabolic interpolation (on the log spectrum) for a sub-bin frequency estimate
+				a, b, c = np.log(np.maximum(spectrum[peak_bin - 1:peak_bin + 2], 1e-30))
+				offset = 0.5 * (a - c) / (a - 2.0 * b + c) if (a - 2.0 * b + c) else 0.0
+				candidates[peak_bin] = {"frequency_hz": round(float(peak_bin + offset) * bin_hz, 1),
+										"level_db": round(float(10.0 * np.log10(max(spectrum[peak_bin], 1e-20))), 2),
+										"prominence_db": round(float(prominence), 2)}
+	return sorted(candidates.values(), key=lambda p: p["level_db"], reverse=True)
+
+
+def channel_balance(samples):
+	""" Per-channel RMS (dBFS), the max-min imbalance (dB) and the inter-channel correlation of a (frames, channels) array. """
+	if samples.ndim == 1 or samples.shape[1] == 1:
+		rms = float(db(np.sqrt(np.mean(samples * samples))))
+		return {"channel_rms_db": [round(rms, 2)], "imbalance_db": 0.0, "correlation": None}
+	rms = [float(db(np.sqrt(np.mean(samples[:, ch] * samples[:, ch])))) for ch in range(samples.shape[1])]
+	left, right = samples[:, 0], samples[:, 1]
+	denom = np.sqrt(np.dot(left, left) * np.dot(right, right))
+	return {
+		"channel_rms_db": [round(r, 2) for r in rms],
+		"imbalance_db": round(max(rms) - min(rms), 2),
+		"correlation": round(float(np.dot(left, right) / denom), 4) if denom > 0 else None,
+	}
+
+
+def calibration_profile(samples, samplerate, nfft=4096, frame_seconds=0.03):
+	"""
+	FFT-based calibration profile of a (quiet-room) clip: broadband and per-octave-band noise floor, dominant hum
+	frequencies, channel balance and headroom. Returns a JSON-serializable dictionary; 'band_limit_hz' is the
+	Nyquist frequency the profile was limited to (bands above it are absent).
+	"""
+	mono = to_mono(samples)
+	spectra = frame_spectra(mono, nfft)
+	levels = frame_levels_db(mono, max(1, int(frame_seconds * samplerate)))
+	return {
+		"samplerate": samplerate,
+		"band_limit_hz": samplerate / 2.0,
+		"channels": 1 if samples.ndim == 1 else samples.shape[1],
+		"seconds": round(len(mono) / samplerate, 2),
+		"noise_floor_db": round(float(np.percentile(levels, 10)), 2) if len(levels) else None,
+		"band_noise_floor_db": band_noise_floor_db(spectra, samplerate, nfft),
+		"hum": find_hum(spectra.mean(axis=0), samplerate, nfft),
+		"balance": channel_balance(samples),
+		"peak_db": round(float(db(np.max(np.abs(samples)))), 2) if samples.size else None,
+		"clipped_samples": count_clipped(samples),
+	}
+
+
+##=============================================================================
@@ -0,0 +1,52 @@
+import os
+import re
+import json
+import time
+import tempfile
+
+"""
+On-disk cache of the most recent calibration profile (see audio_analysis.calibration_profile()) for each capture device.
+
+Profiles are stored as '<directory>/<device key>.json' and replaced atomically, so a sensor restarted mid-write
+(or a second reader such as a quality check) never sees a partial file.
+"""
+
+##=============================================================================
+
+class CalibrationStore():
+	"""
+	Loads/saves the calibration profile of one device; 'device_key' is sanitized into a filename.
+	"""
+	def __init__(self, directory, device_key):
+		self.directory = directory
+		self.device_key = re.sub(r'[^A-Za-z0-9_.-]+', '_', device_key).strip('_') or 'default'
+
+	@property
+	def path(self):
+		return os.path.join(self.directory, f"{self.device_key}.json")
+
+	def load(self):
+		""" Returns the cached profile, or None if there is none (or it is unreadable). """
+		try:
+			with open(self.path) as f:
+				return json.load(f)
+		except (OSError, ValueError):
+			return None
+
+	def save(self, profile):
+		""" Stamps the profile with the device key and creation time, then writes it atomically; returns the stamped profile. """
+		profile = dict(profile, device=self.device_key, created=time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()))
+		os.makedirs(self.directory, exist_ok=True)
+		fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=f".{self.device_key}.", suffix='.tmp')
+		try:
+			with os.fdopen(fd, 'w') as f:
+				json.dump(profile, f, indent=1)
+			os.replace(tmp_path, self.path)
+		except BaseException:
+			if os.path.exists(tmp_path):
+				os.remove(tmp_path)
+			raise
+		return profile
+
+
+##=============================================================================
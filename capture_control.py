@@ -0,0 +1,66 @@
+from multiprocessing import Array, Value
+
+"""
+Shared-memory control block for live capture reconfiguration.
+
+The control-message handler (main process) writes new clip settings with update(); the capture process polls
+'generation' once per clip boundary -- a single lock-free shared-memory read -- and only takes the lock to
+snapshot() the settings when the generation has changed. Create the block before the capture process is forked.
+"""
+
+CODEC_BYTES = 16
+
+##=============================================================================
+
+class CaptureControl():
+	"""
+	Clip duration plus the listener's transcode settings (codec, bitrate, channels, samplerate).
+	"""
+	FIELDS = ('duration', 'codec', 'bitrate', 'channels', 'samplerate')
+
+	def __init__(self, duration, codec, bitrate, channels, samplerate):
+		self.__duration = Value('d', float(duration), lock=False)
+		self.__codec = Array('c', CODEC_BYTES, lock=False)
+		self.__bitrate = Value('i', int(bitrate), lock=False)
+		self.__channels = Value('i', int(channels), lock=False)
+		self.__samplerate = Value('i', int(samplerate), lock=False)
+		self.__generation = Value('L', 0)   ## Its lock guards the whole block
+		self.__codec.value = codec.encode()[:CODEC_BYTES - 1]
+
+	@property
+	def generation(self):
+		""" Incremented by every update(); cheap to poll. """
+		return self.__generation.value
+
+	def update(self, **changes):
+		""" Applies any of duration/codec/bitrate/channels/samplerate; returns the new generation. """
+		unknown = set(changes) - set(self.FIELDS)
+		if unknown:
+			raise KeyError(f"Unknown capture setting(s): {', '.join(sorted(unknown))}")
+		with self.__generation.get_lock():
+			if 'duration' in changes:
+				self.__duration.value = float(changes['duration'])
+			if 'codec' in changes:
+				self.__codec.value = str(changes['codec']).encode()[:CODEC_BYTES - 1]
+			if 'bitrate' in changes:
+				self.__bitrate.value = int(changes['bitrate'])
+			if 'channels' in changes:
+				self.__channels.value = int(changes['channels'])
+			if 'samplerate' in changes:
+				self.__samplerate.value = int(changes['samplerate'])
+			self.__generation.value += 1
+			return self.__generation.value
+
+	def snapshot(self):
+		""" Returns (generation, {setting: value}) read atomically with respect to update(). """
+		with self.__generation.get_lock():
+			return self.__generation.value, {
+				'duration': self.__duration.value,
+				'codec': self.__codec.value.decode(),
+				'bitrate': self.__bitrate.value,
+				'channels': self.__channels.value,
+				'samplerate': self.__samplerate.value,
+			}
+
+
+##=============================================================================
@@ -0,0 +1,96 @@
+import time
+import datetime as dt
+from audio_analysis import read_wav_info
+
+"""
+Sample-derived clip timestamps.
+
+A clip's end is the monotonic instant its last sample was captured (just before the listener is stopped), and its
+start is that instant minus the clip's actual audio duration (derived from the WAV data size), so neither timestamp
+includes VLC process startup/teardown time. Monotonic instants are converted to UTC through a single
+UTC <--> monotonic calibration pair, refreshed periodically so that NTP corrections are picked up without every
+clip being exposed to wall-clock steps.
+
+NOTE: 	"Its last sample" is really the listener's kill instant: the streamer's ALSA buffer (--live-caching, 300 ms by
+		default), the transcode && mux all sit between capture && the loopback port, so the true end precedes the kill
+		by that pipeline delay. VLC rebases its TS/RTP timestamps, so the delay cannot be read off the packets; instead
+		CaptureLatency measures it at every stream start as the time from launching the streamer to its first loopback
+		packet. That includes VLC's own startup, so the smallest measurement is kept. It does not cover the listener's
+		input buffer (--network-caching, lost on SIGKILL); a configured offset for the whole chain (e.g., from an
+		impulse played at a known UTC instant) overrides the measurement.
+"""
+
+##=============================================================================
+
+def format_icd_timestamp(epoch_seconds):
+	""" Formats a UTC epoch timestamp as per the ICD (same format as SensorBase._get_timestamp()). """
+	return '{}Z'.format(dt.datetime.fromtimestamp(epoch_seconds, dt.timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3])
+
+
+class ClockAnchor():
+	"""
+	A (UTC, monotonic) calibration pair; to_utc() maps time.monotonic() instants onto UTC epoch seconds.
+	"""
+	def __init__(self, refresh_period=300.0, samples=5):
+		self.refresh_period = refresh_period
+		self.samples = samples
+		self.anchor_utc = 0.0
+		self.anchor_mono = 0.0
+		self.uncertainty = 0.0
+		self.refresh()
+
+
+	def refresh(self):
+		""" Re-calibrates using the tightest of several back-to-back (monotonic, UTC, monotonic) readings. """
+		best = None
+		for _ in range(self.samples):
+			m0 = time.monotonic()
+			utc = time.time()
+			m1 = time.monotonic()
+			if best is None or (m1 - m0) < best[0]:
+				best = (m1 - m0, utc, (m0 + m1) / 2.0)
+		self.uncertainty, self.anchor_utc, self.anchor_mono = best
+
+
+	def to_utc(self, mono):
+		""" Converts a time.monotonic() instant to UTC epoch seconds. """
+		if time.monotonic() - self.anchor_mono > self.refresh_period:
+			self.refresh()
+		return self.anchor_utc + (mono - self.anchor_mono)
+
+
+class CaptureLatency():
+	"""
+	The capture-to-loopback pipeline delay subtracted from clip end instants: 'configured' seconds if given, else
+	the smallest streamer-launch-to-first-packet time observed so far (0 until the first stream start is observed).
+	"""
+	def __init__(self, configured=None):
+		self.configured = configured
+		self.measured = None
+
+
+	def observe(self, seconds):
+		""" Records one stream start's launch-to-first-packet time; returns the delay now in effect. """
+		if seconds >= 0 and (self.measured is None or seconds < self.measured):
+			self.measured = seconds
+		return self.value
+
+
+	@property
+	def value(self):
+		if self.configured is not None:
+			return self.configured
+		return self.measured if self.measured is not None else 0.0
+
+
+def clip_bounds(path, last_sample_mono, anchor, capture_latency=0.0):
+	"""
+	Returns (start_timestamp, end_timestamp, duration_seconds) for the clip at 'path', given the monotonic instant
+	the listener was stopped; 'capture_latency' (the capture-to-loopback pipeline delay, see CaptureLatency) is subtracted.
+	"""
+	duration = read_wav_info(path).duration
+	end_utc = anchor.to_utc(last_sample_mono - capture_latency)
+	return format_icd_timestamp(end_utc - duration), format_icd_timestamp(end_utc), duration
+
+
+##=============================================================================
@@ -0,0 +1,91 @@
+import time
+from collections import deque
+
+"""
+Per-clip latency tracing through the capture --> hash --> upload --> alert pipeline.
+
+A trace is a plain dictionary of stage name --> time.monotonic() timestamp, so it pickles cheaply through the
+multiprocessing queues (hash_queue, post_queue, kafka_queue). CLOCK_MONOTONIC is system-wide on Linux, so stamps
+taken in different processes are directly comparable.
+"""
+
+TRACE_STAGES = ('captured', 'hashed', 'upload_start', 'upload_end', 'verified', 'alerted')
+
+## (segment name, from stage, to stage)
+TRACE_SEGMENTS = (
+	('hash', 'captured', 'hashed'),
+	('post_wait', 'hashed', 'upload_start'),
+	('upload', 'upload_start', 'upload_end'),
+	('verify', 'upload_end', 'verified'),
+	('alert_wait', 'verified', 'alerted'),
+	('end_to_end', 'captured', 'alerted'),
+)
+
+##=============================================================================
+
+def new_trace(stage='captured'):
+	""" Starts a trace, stamping its first stage (normally the moment the listener stopped capturing the clip). """
+	return {stage: time.monotonic()}
+
+
+def mark(trace, stage):
+	""" Stamps 'stage' on the trace (no-op if the clip has no trace, e.g. a residual file from a previous run). """
+	if trace is not None:
+		trace[stage] = time.monotonic()
+	return trace
+
+
+def segment_durations(trace):
+	""" Returns {segment: seconds} for every segment whose two boundary stages were stamped. """
+	if not trace:
+		return {}
+	return {name: trace[end] - trace[start] for name, start, end in TRACE_SEGMENTS
+			if start in trace and end in trace}
+
+
+class LatencySummary():
+	"""
+	Rolling window of the most recent 'window' clips' segment latencies, summarized as percentiles (in ms).
+	"""
+	def __init__(self, window=200, percentiles=(50, 95, 99)):
+		self.percentiles = percentiles
+		self.samples = {name: deque(maxlen=window) for name, _, _ in TRACE_SEGMENTS}
+		self.clips = 0
+
+	def add(self, trace):
+		""" Records a completed trace; returns its segment durations (seconds). """
+		durations = segment_durations(trace)
+		for name, seconds in durations.items():
+			self.samples[name].append(seconds)
+		if durations:
+			self.clips += 1
+		return durations
+
+	@staticmethod
+	def _percentile(ordered, pct):
+		return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+	def summary(self):
+		""" Returns {segment: {'p50': ms, 'p95': ms, 'p99': ms, 'max': ms, 'n': count}} over the rolling window. """
+		result = {}
+		for name, values in self.samples.items():
+			if not values:
+				continue
+			ordered = sorted(values)
+			stats = {f'p{pct}': round(1000.0 * self._percentile(ordered, pct), 1) for pct in self.percentiles}
+			stats['max'] = round(1000.0 * ordered[-1], 1)
+			stats['n'] = len(ordered)
+			result[name] = stats
+		return result
+
+	def format(self):
+		""" One-line human-readable summary for the logs. """
+		parts = []
+		for name, stats in self.summary().items():
+			pcts = '/'.join(str(stats[f'p{pct}']) for pct in self.percentiles)
+			parts.append(f"{name}={pcts}")
+		labels = '/'.join(f'p{pct}' for pct in self.percentiles)
+		return f"clip latency ms ({labels}, last {max(len(v) for v in self.samples.values())} clips): " + ', '.join(parts)
+
+
+##=============================================================================
@@ -0,0 +1,167 @@
+import os
+import re
+import time
+import socket
+import threading
+from collections import namedtuple
+
+"""
+ALSA capture device discovery with hotplug monitoring.
+
+The card list is read straight from /proc/asound/cards (no 'cat' subprocess) and cached until a hotplug event for
+the 'sound' subsystem arrives on the kernel's uevent netlink socket (NETLINK_KOBJECT_UEVENT, the same feed udev
+listens to), at which point it is re-read and on_change(card id, present, action) is called -- typically within
+a few hundred milliseconds of the replug. Where netlink is unavailable (non-Linux, restricted containers) the card
+list is polled instead.
+"""
+
+CARDS_PATH = '/proc/asound/cards'
+NETLINK_KOBJECT_UEVENT = 15
+KERNEL_EVENTS_GROUP = 1
+
+SoundCard = namedtuple('SoundCard', ['index', 'id', 'driver', 'name'])
+
+## e.g. ' 1 [Microphone     ]: USB-Audio - Yeti Stereo Microphone'
+_CARD_RE = re.compile(r'^\s*(\d+)\s+\[([^\]]+)\]:\s*(.*?)\s+-\s+(.*)$')
+
+##=============================================================================
+
+def parse_cards(text):
+	""" Parses the contents of /proc/asound/cards into a list of SoundCard tuples. """
+	cards = []
+	for line in text.splitlines():
+		match = _CARD_RE.match(line)
+		if match:
+			cards.append(SoundCard(int(match.group(1)), match.group(2).strip(), match.group(3).strip(), match.group(4).strip()))
+	return cards
+
+
+def read_cards(path=CARDS_PATH):
+	try:
+		with open(path) as f:
+			return parse_cards(f.read())
+	except OSError:
+		return []
+
+
+def parse_uevent(data):
+	""" Splits a kernel uevent datagram ('action@devpath\\0KEY=VALUE\\0...') into a dict (with 'ACTION' and 'DEVPATH'). """
+	fields = data.split(b'\0')
+	event = {}
+	for field in fields[1:]:
+		key, sep, value = field.partition(b'=')
+		if sep:
+			event[key.decode('utf-8', 'replace')] = value.decode('utf-8', 'replace')
+	if fields and b'@' in fields[0]:
+		action, _, devpath = fields[0].decode('utf-8', 'replace').partition('@')
+		event.setdefault('ACTION', action)
+		event.setdefault('DEVPATH', devpath)
+	return event
+
+
+class DeviceDiscovery():
+	"""
+	Cached lookup of the ALSA card id of the first card whose id/name contains 'match' (falling back to the first card,
+	then to 'default'); start() begins hotplug monitoring in the calling process.
+	"""
+	def __init__(self, match='Yeti', default='Microphone', on_change=None, logger=None, settle=0.2, poll_period=2.0,
+				 cards_path=CARDS_PATH):
+		self.match = match
+		self.default = default
+		self.on_change = on_change
+		self.logger = logger
+		self.settle = settle 		## Delay after a uevent before re-reading (the kernel updates /proc/asound after it)
+		self.poll_period = poll_period
+		self.cards_path = cards_path
+		self.__device_name = None
+		self.__present = False
+		self.__lock = threading.Lock()
+		self.__stop = threading.Event()
+
+	def __log(self, level, msg):
+		if self.logger:
+			getattr(self.logger, level)(f"[DeviceDiscovery]  {msg}")
+		else:
+			print(f"[DeviceDiscovery]  {msg}")
+
+	def select(self, cards):
+		""" Returns (card id, True if it matched) for the given cards. """
+		for card in cards:
+			if self.match in card.name or self.match in card.id:
+				return card.id, True
+		if cards:
+			return cards[0].id, False
+		return self.default, False
+
+	@property
+	def device_name(self):
+		""" The cached card id; read from /proc/asound on first use or after invalidate(). """
+		with self.__lock:
+			if self.__device_name is None:
+				self.__device_name, self.__present = self.select(read_cards(self.cards_path))
+			return self.__device_name
+
+	@property
+	def present(self):
+		""" True if a card matching 'match' was found on the last read. """
+		self.device_name
+		return self.__present
+
+	def invalidate(self):
+		with self.__lock:
+			self.__device_name = None
+
+	def refresh(self, action='change'):
+		""" Re-reads the card list; calls on_change() && returns True if the selected card (or its presence) changed. """
+		with self.__lock:
+			old_name, old_present = self.__device_name, self.__present
+			self.__device_name, self.__present = self.select(read_cards(self.cards_path))
+			new_name, new_present = self.__device_name, self.__present
+		if (new_name, new_present) == (old_name, old_present):
+			return False
+		self.__log('info', f"Capture device {old_name!r} (present: {old_present}) --> {new_name!r} (present: {new_present}) on '{action}'")
+		if self.on_change is not None:
+			try:
+				self.on_change(new_name, new_present, action)
+			except Exception as exc:
+				self.__log('error', f"on_change failed: {exc}")
+		return True
+
+	def start(self):
+		""" Starts the hotplug monitoring thread (netlink uevents, or polling as a fallback). """
+		self.device_name
+		try:
+			sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_KOBJECT_UEVENT)
+			sock.bind((0, KERNEL_EVENTS_GROUP))
+		except (AttributeError, OSError) as exc:
+			self.__log('warning', f"Netlink uevents unavailable ({exc}); polling {self.cards_path} every {self.poll_period} s")
+			threading.Thread(target=self.__poll, name='device_discovery', daemon=True).start()
+			return
+		threading.Thread(target=self.__listen, args=(sock,), name='device_discovery', daemon=True).start()
+
+	def stop(self):
+		self.__stop.set()
+
+	def __listen(self, sock):
+		sock.settimeout(1.0)
+		try:
+			while not self.__stop.is_set():
+				try:
+					event = parse_uevent(sock.recv(16384))
+				except socket.timeout:
+					continue
+				if event.get('SUBSYSTEM') != 'sound' or not os.path.basename(event.get('DEVPATH', '')).startswith('card'):
+					continue
+				time.sleep(self.settle)
+				self.refresh(event.get('ACTION', 'change'))
+		except OSError as exc:
+			self.__log('error', f"Netlink listener stopped: {exc}")
+		finally:
+			sock.close()
+
+	def __poll(self):
+		while not self.__stop.wait(self.poll_period):
+			self.refresh('poll')
+
+
+##=============================================================================
@@ -0,0 +1,156 @@
+import re
+import json
+
+try:
+	import orjson
+except ImportError:
+	orjson = None
+
+"""
+Fast-path validation and (de)serialization for the few telemetry message types the microphone actually handles:
+'Microphone'/'Heartbeat' (and the base lifecycle) CONTROL messages and 'Status'/'Acknowledgement' ALERT messages.
+
+The checks mirror telem_message.Message / AlertBody / ControlBody (version, enumerations, site/subtype regexes,
+ICD timestamp, severity/confidence ranges, title length), but with the regexes compiled once and without building
+marshmallow schema objects or calling strptime() per message. Anything off the fast path is handed to the
+fallback (generic) serializer unchanged, so behaviour for other message types is exactly as before.
+
+orjson is used for encoding/decoding when installed (pip3 install orjson); otherwise a cached compact
+json.JSONEncoder is used.
+"""
+
+VERSION = '0.1'
+COMPONENT_TYPES = frozenset(('COMMANDER', 'SENSOR', 'ACTUATOR'))
+MESSAGE_TYPES = frozenset(('ALERT', 'CONTROL', 'RAW', 'SUMMARY'))
+SEVERITIES = frozenset(range(8))
+
+## (messageType, messageSubtype) pairs validated here; everything else goes to the fallback serializer
+FAST_PATH = frozenset((
+	('CONTROL', 'Microphone'), ('CONTROL', 'Heartbeat'), ('CONTROL', 'Activate'), ('CONTROL', 'Deactivate'),
+	('CONTROL', 'Reboot'), ('CONTROL', 'Refresh'), ('CONTROL', 'Config'),
+	('ALERT', 'Status'), ('ALERT', 'Acknowledgement'),
+))
+
+_NAME_RE = re.compile(r'^[a-zA-Z0-9-]+$')
+_TIMESTAMP_RE = re.compile(r'^(\d{4})-(0[1-9]|1[0-2])-(0[1-9]|[12]\d|3[01])T([01]\d|2[0-3]):([0-5]\d):([0-5]\d)\.\d{1,6}Z$')
+
+_ENVELOPE_STR_FIELDS = ('componentId', 'componentType', 'componentSite', 'componentFriendlyName',
+						'messageTimestamp', 'messageId', 'messageType', 'messageSubtype')
+
+##=============================================================================
+
+class ValidationError(ValueError):
+	""" Raised when a fast-path message does not conform to the ICD. """
+
+
+def _require_str(body, key, where):
+	value = body.get(key)
+	if not isinstance(value, str):
+		raise ValidationError(f"{where}.{key} must be a string (got {type(value).__name__})")
+	return value
+
+
+def validate_control_body(body):
+	if not isinstance(body, dict):
+		raise ValidationError("messageBody must be an object")
+	for key in ('target', 'commandTitle', 'commandText'):
+		_require_str(body, key, 'messageBody')
+	if not isinstance(body.get('commandDetail'), dict):
+		raise ValidationError("messageBody.commandDetail must be an object")
+
+
+def validate_alert_body(body):
+	if not isinstance(body, dict):
+		raise ValidationError("messageBody must be an object")
+	if body.get('severity') not in SEVERITIES or isinstance(body.get('severity'), bool):
+		raise ValidationError(f"messageBody.severity must be one of 0-7 (got {body.get('severity')!r})")
+	confidence = body.get('confidence')
+	if not isinstance(confidence, int) or isinstance(confidence, bool) or not 1 <= confidence <= 6:
+		raise ValidationError(f"messageBody.confidence must be in [1, 6] (got {confidence!r})")
+	if 'host' not in body or not (body['host'] is None or isinstance(body['host'], str)):
+		raise ValidationError("messageBody.host must be a string or null")
+	refs = body.get('messageRef')
+	if not isinstance(refs, list) or not all(isinstance(ref, str) for ref in refs):
+		raise ValidationError("messageBody.messageRef must be a list of strings")
+	if len(_require_str(body, 'alertTitle', 'messageBody')) > 50:
+		raise ValidationError("messageBody.alertTitle must be at most 50 characters")
+	_require_str(body, 'alertText', 'messageBody')
+	if not isinstance(body.get('alertDetail'), dict):
+		raise ValidationError("messageBody.alertDetail must be an object")
+
+
+_BODY_VALIDATORS = {'CONTROL': validate_control_body, 'ALERT': validate_alert_body}
+
+
+def is_fast_path(message):
+	return isinstance(message, dict) and (message.get('messageType'), message.get('messageSubtype')) in FAST_PATH
+
+
+def validate_message(message):
+	""" Validates a fast-path message dictionary in place; raises ValidationError. Returns the message. """
+	for key in _ENVELOPE_STR_FIELDS:
+		_require_str(message, key, 'message')
+	if str(message.get('version')) != VERSION:
+		raise ValidationError(f"message.version must be {VERSION} (got {message.get('version')!r})")
+	if not message['componentId'] or not message['messageId']:
+		raise ValidationError("message.componentId and message.messageId must not be empty")
+	if message['componentType'] not in COMPONENT_TYPES:
+		raise ValidationError(f"Invalid componentType: {message['componentType']}")
+	if not _NAME_RE.match(message['componentSite']):
+		raise ValidationError(f"Invalid componentSite: {message['componentSite']}")
+	if not _NAME_RE.match(message['messageSubtype']):
+		raise ValidationError(f"Invalid messageSubtype: {message['messageSubtype']}")
+	if not _TIMESTAMP_RE.match(message['messageTimestamp']):
+		raise ValidationError(f"Invalid messageTimestamp: {message['messageTimestamp']}")
+	validator = _BODY_VALIDATORS.get(message['messageType'])
+	if validator is None:
+		raise ValidationError(f"Invalid messageType: {message['messageType']}")
+	validator(message.get('messageBody'))
+	return message
+
+
+##=============================================================================
+## Encoding
+
+_ENCODER = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False, default=str)
+
+
+def dumps(obj):
+	""" Compact UTF-8 JSON encoding. """
+	if orjson is not None:
+		try:
+			return orjson.dumps(obj, default=str)
+		except TypeError:   ## e.g., non-string dict keys or ints beyond 64 bits --> stdlib handles those
+			pass
+	return _ENCODER.encode(obj).encode('utf-8')
+
+
+def loads(data):
+	if orjson is not None:
+		return orjson.loads(data)
+	return json.loads(data)
+
+
+class FastJSONSerializer():
+	"""
+	Drop-in for the CnC JSONSerializer (serialize_to_utf_8 / deserialize_from_utf_8): fast-path messages are
+	validated and encoded here, everything else is delegated to 'fallback' (if given).
+	"""
+	def __init__(self, fallback=None):
+		self.fallback = fallback
+
+	def serialize_to_utf_8(self, message):
+		if self.fallback is not None and not is_fast_path(message):
+			return self.fallback.serialize_to_utf_8(message)
+		return dumps(validate_message(message))
+
+	def deserialize_from_utf_8(self, data):
+		message = loads(data)
+		if is_fast_path(message):
+			return validate_message(message)
+		if self.fallback is not None:
+			return self.fallback.deserialize_from_utf_8(data)
+		return message
+
+
+##=============================================================================
@@ -0,0 +1,47 @@
+import mmap
+import hashlib
+
+"""
+Constant-memory file hashing for the clip pipeline.
+
+hash_file() feeds the digest from a fixed-size scratch buffer filled with readinto(), so hashing a 30 s clip or a
+multi-hour recording costs the same (buffer-sized) memory; pass the same 'buffer' on every call to avoid even that
+allocation. hash_file_mmap() hashes a memory-mapped view instead (no copy into user space, but the mapped pages count
+towards the process's resident set while they are hashed). hashlib releases the GIL for large updates either way.
+
+See misc/bench_hashing.py for throughput across clip lengths.
+"""
+
+DEFAULT_CHUNK_SIZE = 1 << 20   ## 1 MiB
+
+##=============================================================================
+
+def hash_file(path, algorithm='sha1', buffer=None, chunk_size=DEFAULT_CHUNK_SIZE):
+	""" Returns the hex digest of the file at 'path', read through 'buffer' (a bytearray, reused if given). """
+	if buffer is None:
+		buffer = bytearray(chunk_size)
+	view = memoryview(buffer)
+	digest = hashlib.new(algorithm)
+	with open(path, 'rb', buffering=0) as f:
+		while True:
+			n = f.readinto(view)
+			if not n:
+				break
+			digest.update(view[:n])
+	return digest.hexdigest()
+
+
+def hash_file_mmap(path, algorithm='sha1'):
+	""" Returns the hex digest of the file at 'path', hashed through a read-only memory map. """
+	digest = hashlib.new(algorithm)
+	with open(path, 'rb') as f:
+		try:
+			mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+		except ValueError:   ## Empty file (cannot be mapped)
+			return digest.hexdigest()
+		with mapped:
+			digest.update(mapped)
+	return digest.hexdigest()
+
+
+##=============================================================================
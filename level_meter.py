@@ -0,0 +1,210 @@
+import math
+import time
+import socket
+import threading
+import numpy as np
+from multiprocessing import Array
+
+"""
+Live input level metering (block RMS, peak, clipped samples) aggregated per heartbeat period.
+
+The streamer sends an extra s16l PCM copy of the live stream (before the lossy transcode, at the stream's sample
+rate && channel count) to a local UDP port (see VLCAudioStreamer's 'meter_port'); LiveLevelFeed receives it in the
+capture process and feeds the LevelMeter every 'period' seconds. The meter's accumulators live in shared memory
+(create it before the sensor's processes are forked) so that the heartbeat thread in the parent process can
+snapshot and reset them; the silence threshold is shared too, so a calibration in a hash worker applies to it.
+
+CPU budget: at most 'max_blocks' blocks of each update are measured (evenly strided across it); the clipped sample
+count is scaled back up by the stride, so it is an estimate whenever the budget is exceeded. A live update holds
+'period' seconds of audio, i.e. a few blocks, so the whole stream is normally metered.
+"""
+
+## Indices into the shared accumulator array
+(_BLOCKS, _SUM_SQ, _PEAK, _CLIPPED, _SAMPLES, _SECONDS, _MIN_BLOCK, _MAX_BLOCK, _LAST_UPDATE, _SAMPLERATE,
+ _SILENCE_DB) = range(11)
+
+##=============================================================================
+
+def _to_db(value):
+	return round(20.0 * math.log10(value), 2) if value > 0 else None
+
+
+class LevelMeter():
+	"""
+	Shared-memory level accumulator; update() is called per block of live samples, snapshot() once per heartbeat.
+	"""
+	def __init__(self, block_seconds=0.1, max_blocks=400, clip_threshold=0.999, silence_db=-70.0, clipping_ratio=0.001):
+		self.block_seconds = block_seconds
+		self.max_blocks = max_blocks
+		self.clip_threshold = clip_threshold
+		self.clipping_ratio = clipping_ratio
+		self.__acc = Array('d', 11)
+		self.__acc[_SILENCE_DB] = silence_db
+		self.__last = {}
+		self.__reset_locked()
+
+
+	def __reset_locked(self):
+		last_update, silence_db = self.__acc[_LAST_UPDATE], self.__acc[_SILENCE_DB]
+		for idx in range(len(self.__acc)):
+			self.__acc[idx] = 0.0
+		self.__acc[_MIN_BLOCK] = float('inf')
+		self.__acc[_LAST_UPDATE] = last_update
+		self.__acc[_SILENCE_DB] = silence_db
+
+
+	@property
+	def silence_db(self):
+		""" Block RMS (dBFS) below which the input is reported 'silent' (muted/disconnected). """
+		return self.__acc[_SILENCE_DB]
+
+	@silence_db.setter
+	def silence_db(self, value):
+		self.__acc[_SILENCE_DB] = value
+
+
+	def update(self, samples, samplerate):
+		""" Accumulates the levels of a (frames, channels) or 1-D float array normalized to [-1.0, 1.0]. """
+		block_len = max(1, int(self.block_seconds * samplerate))
+		n_blocks = len(samples) // block_len
+		if n_blocks == 0:
+			return
+		stride = max(1, math.ceil(n_blocks / self.max_blocks))
+		blocks = samples[:n_blocks * block_len].reshape((n_blocks, -1))[::stride]
+		block_ms = np.mean(blocks * blocks, axis=1)
+		peak = float(np.max(np.abs(blocks)))
+		clipped = int(np.count_nonzero(np.abs(blocks) >= self.clip_threshold)) * stride
+
+		with self.__acc.get_lock():
+			self.__acc[_BLOCKS] += len(block_ms)
+			self.__acc[_SUM_SQ] += float(block_ms.sum())
+			self.__acc[_PEAK] = max(self.__acc[_PEAK], peak)
+			self.__acc[_CLIPPED] += clipped
+			self.__acc[_SAMPLES] += samples[:n_blocks * block_len].size
+			self.__acc[_SECONDS] += n_blocks * block_len / samplerate
+			self.__acc[_MIN_BLOCK] = min(self.__acc[_MIN_BLOCK], float(block_ms.min()))
+			self.__acc[_MAX_BLOCK] = max(self.__acc[_MAX_BLOCK], float(block_ms.max()))
+			self.__acc[_LAST_UPDATE] = time.monotonic()
+			self.__acc[_SAMPLERATE] = samplerate
+
+
+	def status(self, summary):
+		""" Classifies a summary as 'clipping', 'silent' (muted/disconnected input) or 'ok'. """
+		if summary["clipped_ratio"] >= self.clipping_ratio:
+			return 'clipping'
+		if summary["block_rms_max_db"] is None or summary["block_rms_max_db"] < self.silence_db:
+			return 'silent'
+		return 'ok'
+
+
+	def snapshot(self, reset=True):
+		"""
+		Returns the levels accumulated since the previous reset. If nothing was metered during the period (e.g., the
+		stream is down), the previous summary is repeated with 'fresh' set to False.
+		"""
+		with self.__acc.get_lock():
+			acc = self.__acc[:]
+			if reset and acc[_BLOCKS]:
+				self.__reset_locked()
+		last_update = acc[_LAST_UPDATE]
+		age = round(time.monotonic() - last_update, 1) if last_update else None
+		if not acc[_BLOCKS]:
+			if not self.__last:
+				return {"status": 'no_data', "fresh": False, "age_seconds": age}
+			return dict(self.__last, fresh=False, age_seconds=age)
+
+		summary = {
+			"rms_db": _to_db(math.sqrt(acc[_SUM_SQ] / acc[_BLOCKS])),
+			"peak_db": _to_db(acc[_PEAK]),
+			"block_rms_min_db": _to_db(math.sqrt(acc[_MIN_BLOCK])),
+			"block_rms_max_db": _to_db(math.sqrt(acc[_MAX_BLOCK])),
+			"clipped_samples": int(acc[_CLIPPED]),
+			"clipped_ratio": round(acc[_CLIPPED] / acc[_SAMPLES], 6) if acc[_SAMPLES] else 0.0,
+			"metered_seconds": round(acc[_SECONDS], 2),
+			"samplerate": int(acc[_SAMPLERATE]),
+		}
+		summary["status"] = self.status(summary)
+		if reset:
+			self.__last = summary
+		return dict(summary, fresh=True, age_seconds=age)
+
+
+class LiveLevelFeed():
+	"""
+	Background thread receiving the streamer's raw s16l PCM meter copy on a local UDP port && feeding 'meter' every
+	'period' seconds of audio (make it a multiple of the meter's block length). Datagrams are collected in one
+	preallocated buffer (with room for one more datagram than an update needs); whatever follows the last whole
+	period is carried over to the next update.
+	"""
+	def __init__(self, meter, address, port, samplerate, channels, period=0.5):
+		self.meter = meter
+		self.address = address
+		self.port = port
+		self.period = period
+		self.bytes_received = 0
+		self.__lock = threading.Lock()
+		self.__stop = threading.Event()
+		self.__sock = None
+		self.set_format(samplerate, channels)
+
+
+	def set_format(self, samplerate, channels):
+		""" Adopts a new stream format (e.g., after the stream settings changed); buffered samples are discarded. """
+		with self.__lock:
+			self.samplerate = int(samplerate)
+			self.channels = int(channels)
+			self.__frame_bytes = 2 * self.channels
+			self.__update_bytes = max(1, int(self.period * self.samplerate)) * self.__frame_bytes
+			self.__buffer = bytearray(self.__update_bytes + 65536)   ## One update plus a maximal datagram
+			self.__filled = 0
+
+
+	def start(self):
+		""" Binds the meter port (raises OSError if it is taken) && starts the receiving thread. """
+		self.__sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+		try:
+			self.__sock.bind((self.address, self.port))
+		except OSError:
+			self.__sock.close()
+			raise
+		self.__sock.settimeout(0.5)
+		threading.Thread(target=self.__run, name=f'level_feed_{self.port}', daemon=True).start()
+
+
+	def stop(self):
+		self.__stop.set()
+
+
+	def feed(self, data):
+		""" Appends received PCM bytes, metering them once a 'period' of audio is buffered. """
+		with self.__lock:
+			self.__buffer[self.__filled:self.__filled + len(data)] = data
+			self.__filled += len(data)
+			if self.__filled >= self.__update_bytes:
+				self.__meter_buffered()
+			self.bytes_received += len(data)
+
+
+	def __meter_buffered(self):
+		used = self.__filled - self.__filled % self.__update_bytes   ## Whole periods, so the meter's blocks are whole too
+		samples = np.frombuffer(self.__buffer, dtype='<i2', count=used // 2).astype(np.float32)
+		samples *= 1.0 / 32768.0
+		self.meter.update(samples.reshape(-1, self.channels), self.samplerate)
+		self.__buffer[:self.__filled - used] = self.__buffer[used:self.__filled]
+		self.__filled -= used
+
+
+	def __run(self):
+		try:
+			while not self.__stop.is_set():
+				try:
+					self.feed(self.__sock.recv(65536))
+				except socket.timeout:
+					continue
+				except OSError:
+					break
+		finally:
+			self.__sock.close()
+
+
+##=============================================================================
@@ -1,15 +1,40 @@
 import os
+import re
 import sys
+import math
 import time
+import uuid
+import queue
 import shutil
-import hashlib
 import requests
+import threading
 import traceback
+import concurrent.futures
 import datetime as dt
-from signal import SIGKILL
+import dataclasses
+from signal import SIGKILL, SIGTERM, signal
 from urllib3.exceptions import NewConnectionError
 from multiprocessing import Queue, Process, Lock, Value 
-from vlc_audio_util import VLCAudioSettings, VLCAudioStreamer, VLCAudioListener, VLCAudioBase
+from vlc_audio_util import VLCAudioSettings, VLCAudioStreamer, VLCAudioListener, VLCAudioBase, VLCOutputMonitor, KNOWN_VLC_EVENTS
+from vlc_audio_util import StreamPacketProbe, StreamMonitor, REPLACED_MAKE_BEFORE_BREAK, REPLACED_BY_RESTART, REPLACEMENT_FAILED
+from synthetic_audio import SyntheticAudioSource, SYNTHETIC_KINDS
+from sensor_metrics import MetricsRegistry
+from clip_trace import LatencySummary, new_trace, mark
+from async_logger import AsyncLogger
+from clip_timing import ClockAnchor, CaptureLatency, clip_bounds, format_icd_timestamp
+from audio_analysis import read_wav_info, load_wav, score_activity, score_activity_file, calibration_profile
+from calibration_store import CalibrationStore
+from level_meter import LevelMeter, LiveLevelFeed
+from sha_cache import ShaCache, CONFIRMED, PROBABLE
+from alert_batcher import AlertBatcher
+from alert_outbox import AlertOutbox
+from fast_messages import FastJSONSerializer
+from capture_control import CaptureControl
+from device_discovery import DeviceDiscovery
+from file_hashing import hash_file
+from upload_scheduler import UploadScheduler, UPLOAD_CLASSES, CALIBRATION, CLIP
+from upload_shaper import TokenBucket, ThrottledMultipart, UploadRateController, EgressMonitor, STREAM_OVERHEAD
+from sensor_config import get_config, ConfigWatcher, SensorConfig
 
 """
 To receive the audio stream from another machine, simply run the command:
@@ -23,7 +48,8 @@ NOTE: 	This module absolutely requires the 'vlc' package be installed via 'apt',
 """
 
 SEGREGATED_TEST_MODE = True  ## Set to False for deployment and integration testing w/ Alcazar CnC API
-DRY_RUN = SEGREGATED_TEST_MODE and True  ## Will skip any network-dependent tasks if set to True (i.e., posting to the CDN or Kafka)
+DRY_RUN = SEGREGATED_TEST_MODE and os.getenv("DRY_RUN", "1") != "0"  ## Will skip any network-dependent tasks if set to True (i.e., posting to the CDN or Kafka);
+																	## set DRY_RUN=0 to post to a local CDN stand-in (misc/cdn_server.py)
 
 DEBUG = True
 CHECK_FOR_MISSING_DEPENDENCY = True #False   ## Will check that the prerequisite VLC is installed 
@@ -32,12 +58,23 @@ INSTALL_MISSING_DEPENDENCY = CHECK_FOR_MISSING_DEPENDENCY and False 	## If True,
 
 if not SEGREGATED_TEST_MODE:
 	from alcazar_common.cnc.cnc_base import SensorBase
+	from alcazar_common.cnc.presentation_layer import KafkaPresentationLayer
 	from alcazar_common.models import telem_message as model
 	from alcazar_common.logger import get_logger
 else:
 	## Using shallow classes as mock replacements for Alcazar CnC modules
 	import typing 
 
+	class MockPresentationLayer():
+		def __init__(self):
+			self.sent = 0
+
+		def send_message(self, msg, recipient):
+			self.sent += 1
+
+		def shutdown(self):
+			pass
+
 	class SensorBase():
 		def __init__(self, component_site='component_site', component_type='component_type', component_id=None,
 						 component_name='component_name', topics='CNC.CONTROL.*',
@@ -49,32 +86,66 @@ else:
 			self.topics = topics
 			self.component_friendly_name = component_friendly_name
 			self.__state = ''
-			self.logger = get_logger('cnc_base')
+			self.logger = AsyncLogger(get_logger('cnc_base'))
 			self.ready = False
+			self.version = '0.1'
+			self.commander_id = 'commander'
+			self.presentation_layer = None
+			self.heartbeat_period = 30
+			self.heartbeat_event = threading.Event()
 
 		def set_ready(self, ready):
-			self.ready = ready
+			if ready != self.ready:
+				self.ready = ready
+				self.send_heartbeat()
 
 		def start(self):
+			self.connect_to_presentation()
+			threading.Thread(target=self.heartbeat_thread, daemon=True).start()
 			self.set_ready(True)
 			self.update_state("Activated")
 
+		def heartbeat_thread(self):
+			while not self.heartbeat_event.wait(timeout=self.heartbeat_period):
+				self.send_heartbeat()
+
 		def add_message_callback(self, value, message):
 			pass
 
 		def update_state(self, new_state):
 			self.__state = new_state
-			print(f"[{self.__class__.__name__}]\t[update_state]  New state:  {new_state}")
+			self.logger.info(f"[{self.__class__.__name__}]\t[update_state]  New state:  {new_state}")
 
 		def shutdown(self):
-			pass
+			self.heartbeat_event.set()
+
+		def connect_to_presentation(self):
+			self.presentation_layer = MockPresentationLayer()
+
+		def send_message(self, recipient: str, message_type: str, message_subtype: str, message_body: dict):
+			self.presentation_layer.send_message({'messageType': message_type, 'messageSubtype': message_subtype,
+												  'messageBody': message_body}, recipient)
+
+		def send_control(self, target: str, subtype: str, title: str, text: str,
+						 detail: typing.Dict = None,
+						 component_name: typing.Optional[str] = None,
+						 component_site: typing.Optional[str] = None):
+			self.logger.info(f"[{self.__class__.__name__}]\t[send_control]  Target: {target}; Title: {title}; Text: {text}; Detail: {detail}")
+			self.send_message(f'CNC.Control.{subtype}.{self.component_name}.{self.component_site}', 'Control', subtype,
+							  {'target': target, 'commandTitle': title, 'commandText': text, 'commandDetail': detail or {}})
+
+		def send_heartbeat(self):
+			self.send_control(self.commander_id, 'Heartbeat', 'heartbeat', self.__state)
 
 		def send_alert(self, subtype: str, severity: int, confidence: int,
 				   title: str, text: str, details: dict = None,
 				   message_refs: typing.List[str] = None,
 				   component_name: typing.Optional[str] = None,
 				   component_site: typing.Optional[str] = None):
-			print(f"[{self.__class__.__name__}]\t[send_alert]  Severity: {severity}; Title: {title}; Text: {text}")
+			self.logger.info(f"[{self.__class__.__name__}]\t[send_alert]  Severity: {severity}; Title: {title}; Text: {text}")
+			self.send_message(f'CNC.Alert.{subtype}.{self.component_name}.{self.component_site}', 'Alert', subtype,
+							  {'severity': severity, 'confidence': confidence, 'alertTitle': title, 'alertText': text,
+							   'alertDetail': details or {}})
 
 		@staticmethod
 		def _get_timestamp():
@@ -106,8 +177,11 @@ else:
 ##=============================================================================
 ## TODO (optional): Extract other globals from the MicrophoneSensor class && add here?
 
-cdn_url = os.getenv('CDNURL', 'pipeline-cdn.telemetry.svc.kube.local')
-cdn_port = os.getenv('CDNPORT', '5000')
+## Live-updatable clip transcode settings accepted by the 'Microphone' control command
+VALID_CODEC = re.compile(r'^[a-z0-9]{3,4}$')   ## VLC fourcc, e.g. 'mpga', 'mp3', 's16l', 'flac', 'vorb'
+AUDIO_SETTING_RANGES = {'bitrate': (8, 512), 'channels': (1, 2), 'samplerate': (8000, 48000)}
+STREAM_COMMANDS = frozenset(('codec',) + tuple(AUDIO_SETTING_RANGES))   ## Also accepted with a 'stream_' prefix
+CLIP_COMMANDS = STREAM_COMMANDS | {'duration', 'multiplier', 'calibrate'}
 
 ##=============================================================================
 ## Debug functions
@@ -151,11 +225,17 @@ class MicrophoneSensor(SensorBase):
 						 component_friendly_name=f"Blue Yeti Microphone - {component_site}")
 		self.room = component_site
 		self.microphone_number = mic_number
+		## All tunables come from the validated config file (MIC_CONFIG) + environment overrides, parsed once
+		self.config = get_config(os.getenv("MIC_CONFIG", "mic_config.yaml"))
+		self.config_watcher = None
+		cfg = self.config
+		if not SEGREGATED_TEST_MODE:
+			## Precompiled validation + faster JSON for the message types handled here; the rest use the generic serializer
+			self.serializer = FastJSONSerializer(fallback=self.serializer)
 
 		self.stream_name = f"YetiAudioStreamer_{self.microphone_number}"
 		self.listener_name = f"YetiAudioListener_{self.microphone_number}"
 		self.loopback_name = f"loopback_{self.microphone_number}"
-		self.__device_name = None
 		self.vlc_exe = "cvlc" if sys.platform != "darwin" else "/Applications/VLC.app/Contents/MacOS/VLC -I dummy"
 
 		## Calibration flag
@@ -163,9 +243,17 @@ class MicrophoneSensor(SensorBase):
 		self.calibration_lock = Lock()
 		self.calibration_duration = 31
 
-		self.my_logger = get_logger('microphone')
+		## Non-blocking: records are written by a background thread in each process, with per-key rate limiting
+		self.my_logger = AsyncLogger(get_logger('microphone'), period=cfg['logging.rate_period'])
 		self.my_logger.info('[{}]  My id: {}'.format(self.__class__.__name__, self.component_id))
-		self.my_logger.info('[{}]  Device MRL: {}'.format(self.__class__.__name__, self.stream_mrl))
+		for warning in cfg.warnings:
+			self.my_logger.warning(f'[{self.__class__.__name__}]  {warning}')
+
+		## The Yeti's ALSA card id, cached && re-read on USB hotplug (the capture process re-points the streamer)
+		self.device_event = threading.Event()
+		self.device_discovery = DeviceDiscovery(match='Yeti', on_change=self.on_device_change, logger=self.my_logger)
+
+		self.__mic_state = ''
 		self.update_state("Initializing")
 
 		if not SEGREGATED_TEST_MODE:
@@ -175,35 +263,113 @@ class MicrophoneSensor(SensorBase):
 		
 		## The duration multiplier accounts for sample rate skew between the Blue Yeti and real time (Time is in seconds)
 		self.sampling_multiplier = 1.036
-		self.file_duration = self.truncate(float(os.getenv("RECORDING_DURATION", "30")) * self.sampling_multiplier, 3)
-		self.duration_update = True
-		self.duration_lock = Lock()
-		self.start_time = ''
-		self.end_time = ''
-		self.filename = None
+		self.file_duration = self.truncate(cfg['recording.duration'] * self.sampling_multiplier, 3)
+
+		## Clip timestamps are derived from the captured samples, anchored to a periodically refreshed UTC <--> monotonic pair
+		self.clock_anchor = ClockAnchor(refresh_period=cfg['recording.clock_anchor_refresh'])
+		## ... && corrected for the capture pipeline delay, measured at each stream start unless an offset is configured
+		self.capture_latency = CaptureLatency(cfg['recording.capture_latency_offset'])
 
 		## Multiprocessing queues
 		self.post_queue = Queue()
 		self.hash_queue = Queue()
 		self.kafka_queue = Queue()  ## Needed since producers cannot be shared across processes
+
+		## Outgoing Kafka messages (alerts, heartbeats) go through a durable outbox drained by a background thread,
+		## so a Kafka outage delays them instead of killing the sensor (see connect_to_presentation())
+		self.alert_outbox = AlertOutbox(cfg['outbox.path'], max_rows=cfg['outbox.max_rows'])
+		self.outbox_retry_max = cfg['outbox.retry_max']   ## Max seconds between reconnect attempts
+		self.outbox_event = threading.Event()
+		self.outbox_stop = threading.Event()
+		self.presentation_lock = threading.Lock()
+
+		## SHAs already confirmed by the CDN (persistent LRU + optional Bloom filter), checked before every upload
+		self.cdn_base_url = f"http://{cfg['cdn.url']}:{cfg['cdn.port']}"
+		self.sha_cache = ShaCache(cfg['cdn.sha_cache_file'],
+								  capacity=cfg['cdn.sha_cache_size'],
+								  bloom_capacity=cfg['cdn.sha_bloom_capacity'])   ## 0 disables the Bloom filter
+		self.sha_cache_lock = threading.Lock()   ## Uploads run on several threads of the posting process
+
+		## Pipeline metrics (shared memory, so they must exist before the processes below are forked)
+		self.metrics_port = cfg['metrics.port']   ## 0 disables the HTTP endpoint
+		self.init_metrics()
+		self.latency_summary = LatencySummary(window=cfg['metrics.trace_window'])
+		self.latency_log_every = cfg['metrics.trace_log_every']   ## Log the rolling latency summary every N alerts
+
+		## CDN hash alerts are batched (linger window / max batch size) so backlog drains don't produce one message per clip
+		self.alert_batcher = AlertBatcher(self.send_hash_alert, self.send_hash_alert_batch,
+										  linger=cfg['alerts.linger'],
+										  max_batch=cfg['alerts.max_batch'],
+										  bypass=self.alert_bypasses_batch)
 		
 		## VLC audio settings for streaming && recording
-		## TODO: Read these configuration values in from a config file ( or set them as environment variables )
-		self.stream_rtp_addr = os.getenv("STREAM_RTP_ADDR", "239.255.12.42")
-		self.stream_rtp_port = int(os.getenv("STREAM_RTP_PORT", "1234"))
-		self.loopback_addr = os.getenv("STREAM_LOOP_ADDR", "127.0.0.1")     ## <-- Address to listen on for stream audio processing/saving
-		self.loopback_port = int(os.getenv("STREAM_LOOP_PORT", "1234"))
-		self.recording_format = os.getenv("RECORDING_FORMAT", "WAV").lower()
-		self.verbose_level = int(os.getenv("STREAM_VERBOSE_LEVEL", "0"))    ## 0 = -q, 1 = -v, 2 = -vv, 3 = -vvv
-		self.streaming_protocol = os.getenv("STREAM_PROTOCOL", "RTP").lower()
-		self.CODEC = os.getenv("STREAM_ACODEC", "MPGA").lower()  #"s16l"
-		self.CHANNELS = int(os.getenv("STREAM_CHANNELS", "2"))  #1
-		self.SAMPLERATE = int(os.getenv("STREAM_SAMPLERATE", "44100"))  #48000
-		self.BITRATE = int(os.getenv("STREAM_BITRATE", "256"))  #128
+		self.stream_rtp_addr = cfg['stream.rtp_addr']
+		self.stream_rtp_port = cfg['stream.rtp_port']
+		self.loopback_addr = cfg['stream.loop_addr']     ## <-- Address to listen on for stream audio processing/saving
+		self.loopback_port = cfg['stream.loop_port']
+		self.recording_format = cfg['recording.format']
+		self.verbose_level = cfg['stream.verbose_level']    ## 0 = -q, 1 = -v, 2 = -vv, 3 = -vvv
+		self.streaming_protocol = cfg['stream.protocol']
+		self.CODEC = cfg['audio.codec']  #"s16l"
+		self.CHANNELS = cfg['audio.channels']  #1
+		self.SAMPLERATE = cfg['audio.samplerate']  #48000
+		self.BITRATE = cfg['audio.bitrate']  #128
+		## Capture through ALSA 'dsnoop' so a replacement streamer can open the device while the old one still holds it.
+		## Make-before-break is opt-in: with the default (off) every stream setting change restarts the stream (break-before-make)
+		self.shared_capture = cfg['stream.shared_capture']
+		self.stream_ready_timeout = cfg['stream.ready_timeout']
+		self.stream_ready_attempts = cfg['stream.ready_attempts']
+		## Stall watchdog: the streamer sends a third copy to a local monitor port, && no packets there for 'stall_window'
+		## seconds restarts the encoder (VLC keeps running with '--sout-keep' when its input dies)
+		self.monitor_port = cfg['stream.monitor_port']
+		self.stall_window = cfg['stream.stall_window']
+
+		## Activity detection (VAD) on a low-rate PCM sidecar of each clip; SILENCE_POLICY decides what happens to silent clips:
+		##   'all' = upload everything, 'active' = drop silent clips, 'metadata' = send silent clips as metadata-only alerts
+		self.analysis_samplerate = cfg['analysis.samplerate']   ## 0 disables the sidecar
+		self.silence_policy = cfg['analysis.silence_policy']
+		self.vad_threshold_db = cfg['analysis.vad_threshold_db']
+		self.vad_margin_db = cfg['analysis.vad_margin_db']
+		self.vad_min_active_ratio = cfg['analysis.vad_min_active_ratio']
+
+		## Live input levels (RMS/peak/clipping), metered from a raw PCM copy of the stream sent by the streamer to a local
+		## port && attached to every heartbeat
+		self.level_meter = LevelMeter(max_blocks=cfg['levels.max_blocks'], silence_db=cfg['levels.silence_db'])
+		self.level_meter_port = cfg['levels.meter_port']   ## 0 disables the meter copy
+
+		## Capture backend: 'alsa' (the Yeti) or a synthetic source ('tone', 'noise', 'file') for hardware-less runs
+		self.audio_source = cfg['source.kind']
+		self.synth_source = None
+		if self.audio_source in SYNTHETIC_KINDS:
+			self.synth_options = {'frequency': cfg['source.synth_frequency'],
+								  'amplitude': cfg['source.synth_amplitude'],
+								  'source_file': cfg['source.synth_file']}
+			self.synth_source = self.new_synth_source(self.SAMPLERATE, self.CHANNELS)
+		self.my_logger.info('[{}]  Device MRL: {}'.format(self.__class__.__name__, self.stream_mrl))
 
+		## The latest calibration profile (noise floor, hum, channel balance) of this device is cached on disk &&
+		## used as the VAD noise floor and the level meter's silence threshold until the next calibration
+		device_key = self.device_name if self.synth_source is None else self.synth_source.name
+		self.calibration_store = CalibrationStore(cfg['calibration.dir'],
+												  f"{self.audio_source}_{device_key}_{self.microphone_number}")
+		self.level_silence_margin = cfg['calibration.level_silence_margin_db']
+		self.__vad_noise_floor = Value('d', float('nan'), lock=False)   ## Shared with the hash workers (NaN = none)
+		self.calibration_profile = None
+		self.apply_calibration_profile(self.calibration_store.load())
+
+		## VLC stdout/stderr is piped into shared-memory ring buffers (rather than 'nohup.out') && parsed for known errors
+		self.streamer_output = VLCOutputMonitor(self.stream_name, on_event=self.vlc_output_event_cb('streamer'))
+		self.listener_output = VLCOutputMonitor(self.listener_name, on_event=self.vlc_output_event_cb('listener'))
 
 		self.settings = VLCAudioSettings(self.stream_mrl, self.loop_mrl, self.CODEC, self.CHANNELS, self.SAMPLERATE, self.BITRATE)
 
+		## Clip duration && the listener's transcode settings, changed live by control messages and applied by the
+		## capture process at the next clip boundary (the streamer, and so the multicast, is never restarted for them)
+		self.capture_control = CaptureControl(self.file_duration, self.CODEC, self.BITRATE, self.CHANNELS, self.SAMPLERATE)
+		## The streamer's own transcode settings ('stream_*' control commands; its duration field is unused); a change
+		## replaces the streamer make-before-break (see VLCAudioStreamer.replace())
+		self.stream_control = CaptureControl(0, self.CODEC, self.BITRATE, self.CHANNELS, self.SAMPLERATE)
+
 		self.streamer = VLCAudioStreamer(self.stream_name, 
 										 self.settings, 
 										 self.stream_rtp_addr, 
@@ -215,7 +381,11 @@ class MicrophoneSensor(SensorBase):
 										 executable=self.vlc_exe, 
 										 protocol=self.streaming_protocol, 
 										 logger=self.my_logger, 
-										 use_nohup=True
+										 use_nohup=False,
+										 input_opts=self.synth_source.vlc_input_opts if self.synth_source else '',
+										 output_monitor=self.streamer_output,
+										 monitor_port=self.monitor_port,
+										 meter_port=self.level_meter_port
 										)
 		if DEBUG:
 			self.streamer.display_stream_command()
@@ -228,56 +398,287 @@ class MicrophoneSensor(SensorBase):
 										 executable=self.vlc_exe, 
 										 protocol=self.streaming_protocol, 
 										 logger=self.my_logger, 
-										 use_nohup=True
+										 use_nohup=False,
+										 output_monitor=self.listener_output,
+										 analysis_samplerate=self.analysis_samplerate
 										)
 		if DEBUG:
 			self.listener.display_listen_command()
 
 		## Processes
 		self.my_logger.info(f'[{self.__class__.__name__}]  Initializing Audio Process')
-		self.audio_process = Process(target=self.get_audio, args=(self.hash_queue, self.duration_lock, 
-													self.do_calibration_flag, self.calibration_lock))
+		self.audio_process = Process(target=self.run_process, args=(self.get_audio, self.hash_queue, self.kafka_queue, self.capture_control,
+																	 self.stream_control, self.do_calibration_flag, self.calibration_lock))
 	   
-		self.my_logger.info(f'[{self.__class__.__name__}]  Initializing Hash Process')
-		self.hash_process = Process(target=self.hash_audio_for_post, args=(self.hash_queue, self.post_queue))  #, self.do_calibration_flag))
-
+		## Hashing/finalising runs in a pool of niced workers; the hash process activates more of them while hash_queue
+		## holds a backlog (e.g., after an outage) and drops back to one in steady state
+		self.my_logger.info(f'[{self.__class__.__name__}]  Initializing Hash Process && {cfg["hashing.max_workers"]} Hash Workers')
+		self.residuals_before = time.time()   ## wav_check() only picks up recordings older than this (not new captures)
+		self.hash_backlog_per_worker = cfg['hashing.backlog_per_worker']
+		self.hash_worker_nice = cfg['hashing.nice']
+		self.hash_chunk_size = cfg['hashing.chunk_kib'] * 1024
+		self.hash_workers_active = Value('i', 1)
+		self.hash_process = Process(target=self.run_process, args=(self.manage_hash_workers, self.hash_queue, self.post_queue,
+																	self.hash_workers_active))
+		self.hash_workers = [Process(target=self.run_process, name=f'hash_worker_{idx}',
+									 args=(self.hash_audio_for_post, idx, self.hash_queue, self.post_queue, self.kafka_queue,
+										   self.hash_workers_active))
+							 for idx in range(cfg['hashing.max_workers'])]
+
+		## Uploads are scheduled by class (calibration clips first, on their own slots) && drained oldest- or newest-first
 		self.my_logger.info(f'[{self.__class__.__name__}]  Initializing Posting Process')
-		self.posting_process = Process(target=self.post_cdn, args=(self.post_queue, self.kafka_queue))
+		self.upload_drain_order = cfg['uploads.drain_order']
+		self.upload_limits = {CALIBRATION: cfg['uploads.calibration_concurrency'], CLIP: cfg['uploads.clip_concurrency']}
+		self.upload_retry_max = cfg['uploads.retry_max']
+		## Uploads are rate-limited to the link capacity (configured, or measured) less the live stream && some headroom
+		self.upload_shaping = cfg['uploads.shaping']
+		self.upload_link_kbps = cfg['uploads.link_kbps']   ## 0 = measure
+		self.upload_headroom = cfg['uploads.headroom']
+		self.upload_min_kbps = cfg['uploads.min_kbps']
+		self.upload_probe_interval = cfg['uploads.probe_interval']
+		## Congestion is read from the egress NIC (tx/qdisc drops && backlog): the local stream monitor copy arrives
+		## over loopback, which never loses packets when the uplink is congested
+		self.upload_interface = cfg['uploads.interface'] or None   ## None = the default route's interface
+		self.upload_egress_backlog = cfg['uploads.egress_backlog_kib'] * 1024
+		self.upload_bucket = None   ## Created by the posting process
+		self.posting_process = Process(target=self.run_process, args=(self.post_cdn, self.post_queue, self.kafka_queue))
 
 		## Set all process daemons
 		self.my_logger.info(f'[{self.__class__.__name__}]  Setting all processes to daemon=True')
 		self.audio_process.daemon = True
 		self.hash_process.daemon = True
+		for worker in self.hash_workers:
+			worker.daemon = True
 		self.posting_process.daemon = True
 
-		## Clean up ephemeral recordings from previous containers
+
+	def init_metrics(self):
+		""" Creates the counters/histograms/gauges updated by the audio, hash and posting processes. """
+		self.metrics = MetricsRegistry(prefix='yeti_mic', const_labels={'room': self.room, 'mic': self.microphone_number})
+		self.m_clips_captured = self.metrics.counter('clips_captured_total', 'Audio clips captured by the listener')
+		self.m_bytes_written = self.metrics.counter('bytes_written_total', 'Bytes of audio clips written to disk')
+		self.m_hash_seconds = self.metrics.histogram('hash_seconds', 'Time to hash and rename a clip',
+													 buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5))
+		self.m_upload_seconds = self.metrics.histogram('upload_seconds', 'Time to post a clip to the CDN and confirm it')
+		self.m_upload_failures = self.metrics.counter('upload_failures_total', 'Failed or unconfirmed CDN uploads')
+		self.m_uploads_pending = {name: self.metrics.gauge('uploads_pending', 'Clips waiting in the upload scheduler, by class',
+														   labels={'class': name})
+								  for name in UPLOAD_CLASSES}
+		self.m_uploads_in_flight = {name: self.metrics.gauge('uploads_in_flight', 'CDN uploads in progress, by class',
+															 labels={'class': name})
+									for name in UPLOAD_CLASSES}
+		self.m_upload_retries = self.metrics.counter('upload_retries_total', 'Failed CDN uploads re-queued for another attempt')
+		self.m_upload_missing = self.metrics.counter('upload_missing_files_total', 'Queued clips dropped because their file no longer exists')
+		self.m_upload_bytes = self.metrics.counter('upload_bytes_total', 'Bytes of clips posted to the CDN')
+		self.m_upload_rate = self.metrics.gauge('upload_rate_bps', 'Achieved upload rate over the last busy window (bit/s)')
+		self.m_upload_rate_limit = self.metrics.gauge('upload_rate_limit_bps', 'Current upload rate cap (bit/s)')
+		self.m_link_capacity = self.metrics.gauge('link_capacity_bps', 'Configured or measured uplink capacity (bit/s); 0 = unknown')
+		self.m_upload_congestion_scale = self.metrics.gauge('upload_congestion_scale', 'Factor applied to the upload cap after egress congestion during uploads')
+		self.m_egress_dropped = self.metrics.counter('egress_dropped_total', 'Packets dropped by the egress interface (tx drops/errors + root qdisc drops)')
+		self.m_egress_backlog = self.metrics.gauge('egress_backlog_bytes', 'Bytes queued in the egress interface qdisc at the last sample')
+		self.m_upload_throttled = self.metrics.counter('upload_throttled_seconds_total', 'Time upload threads were held back by the rate limiter')
+		self.m_inter_clip_gap = self.metrics.histogram('inter_clip_gap_seconds', 'Dead time between consecutive clip captures',
+													   buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0))
+		self.m_vlc_restarts = self.metrics.counter('vlc_restarts_total', 'VLC jobs killed or restarted outside the normal clip cycle')
+		self.m_clip_latency = self.metrics.histogram('clip_latency_seconds', 'End-to-end time from clip capture to its Kafka alert',
+													 buckets=(0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0, 300.0, 1800.0))
+		self.m_vlc_events = {(source, kind): self.metrics.counter('vlc_output_events_total', 'Known error lines in VLC output',
+																 labels={'source': source, 'kind': kind})
+							 for source in ('streamer', 'listener') for kind, _ in KNOWN_VLC_EVENTS}
+		self.m_silent_clips = {action: self.metrics.counter('silent_clips_total', 'Clips scored as silent, by the action taken',
+															 labels={'action': action})
+							   for action in ('uploaded', 'dropped', 'metadata_only')}
+		self.m_dedup_skips = {result: self.metrics.counter('dedup_skips_total', 'Uploads skipped because the CDN already holds the clip',
+														   labels={'cache': result})
+							  for result in (CONFIRMED, PROBABLE)}
+		self.m_stream_replacements = {mode: self.metrics.counter('stream_replacements_total', 'Streamer restarts for new stream settings',
+																labels={'mode': mode})
+									  for mode in (REPLACED_MAKE_BEFORE_BREAK, REPLACED_BY_RESTART, REPLACEMENT_FAILED)}
+		self.m_stream_ready = self.metrics.histogram('stream_ready_seconds', 'Time from starting the streamer to its first loopback packet',
+													 buckets=(0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 10.0, 30.0))
+		self.m_capture_latency = self.metrics.gauge('capture_latency_seconds', 'Capture pipeline delay subtracted from clip timestamps')
+		self.m_stream_ready_failures = self.metrics.counter('stream_ready_failures_total', 'Stream starts with no packets within STREAM_READY_TIMEOUT')
+		self.m_stream_stalls = self.metrics.counter('stream_stalls_total', 'Encoder restarts after no packets for STREAM_STALL_WINDOW')
+		self.m_rtp_lost_packets = self.metrics.counter('rtp_lost_packets_total', 'RTP sequence gaps seen on the (loopback) stream monitor port')
+		self.m_stream_packets = self.metrics.counter('stream_packets_total', 'Stream packets seen on the (loopback) stream monitor port')
+		self.m_device_events = {action: self.metrics.counter('device_hotplug_events_total', 'Yeti hotplug events handled',
+															 labels={'action': action})
+								for action in ('added', 'removed')}
+		self.m_bytes_not_uploaded = self.metrics.counter('bytes_not_uploaded_total', 'Bytes of silent clips not uploaded to the CDN')
+		self.m_kafka_send_failures = self.metrics.counter('kafka_send_failures_total', 'Failed Kafka sends/connects (messages stay in the outbox)')
+		self.m_kafka_dead_letters = self.metrics.counter('kafka_dead_letters_total', 'Outbox messages the serializer rejected (moved to the dead-letter table)')
+		self.metrics.gauge('outbox_depth', 'Kafka messages waiting in the durable outbox', callback=lambda: len(self.alert_outbox))
+		self.metrics.gauge('outbox_dropped', 'Kafka messages dropped because the outbox was full', callback=lambda: self.alert_outbox.dropped)
+		self.metrics.gauge('hash_workers_active', 'Hash workers currently taking clips', callback=lambda: self.hash_workers_active.value)
+		for q_name, q in (('hash', self.hash_queue), ('post', self.post_queue), ('kafka', self.kafka_queue)):
+			self.metrics.gauge('queue_depth', 'Items waiting in a pipeline queue', labels={'queue': q_name}, callback=q.qsize)
+
+
+	def start_metrics_endpoint(self):
+		""" Serves the pipeline metrics over HTTP (from the calling process) unless METRICS_PORT is 0. """
+		if self.metrics_port <= 0:
+			return
 		try:
-			self.wav_check(self.post_queue)
-		except Exception as e:
-			self.my_logger.error(e)
+			self.metrics.serve(self.metrics_port, json_routes={'/diagnostics': self.diagnostics})
+			self.my_logger.info(f'[{self.__class__.__name__}]  Serving metrics on port {self.metrics_port} (/metrics)')
+		except OSError as exc:
+			self.my_logger.warning(f'[{self.__class__.__name__}]  Metrics endpoint unavailable on port {self.metrics_port}: {exc}')
+
+
+	def vlc_output_event_cb(self, source):
+		""" Returns the VLCOutputMonitor callback that counts (and rate-limit logs) known VLC error lines. """
+		def on_event(kind, line):
+			self.m_vlc_events[(source, kind)].inc()
+			self.my_logger.warning(f"[{source}]  VLC {kind}: {line}", key=f"vlc_{source}_{kind}")
+		return on_event
+
+
+	def diagnostics(self):
+		""" Recent VLC output and known-error counts for the streamer and listener (served at /diagnostics). """
+		return {"streamer": self.streamer_output.diagnostics(), "listener": self.listener_output.diagnostics()}
+
+
+	def update_state(self, new_state):
+		""" Keeps a copy of the state so that send_heartbeat() can re-send it alongside the input levels. """
+		self.__mic_state = new_state
+		super().update_state(new_state)
+
+
+	def send_heartbeat(self):
+		""" Heartbeat carrying the current state plus the live input levels metered since the previous heartbeat. """
+		self.send_control(self.commander_id,
+						  'Heartbeat' if SEGREGATED_TEST_MODE else model.ControlMessageSubtypes.Heartbeat.value,
+						  'heartbeat', self.__mic_state,
+						  detail={"levels": self.level_meter.snapshot(reset=True)})
+
+
+	def start(self):
+		super().start()
+		threading.Thread(target=self.drain_outbox, name='outbox_drain', daemon=True).start()
+		if self.config.path and os.path.isfile(self.config.path):
+			self.config_watcher = ConfigWatcher(self.config, self.apply_config_change, logger=self.my_logger)
+			self.config_watcher.start()
+
+
+	def connect_to_presentation(self):
+		"""
+		Non-fatal replacement for SensorBase.connect_to_presentation(), which SIGKILLs the process once its retries are
+		exhausted; here a failed connect just leaves the messages in the outbox, and drain_outbox() keeps retrying.
+		Returns True if connected.
+		"""
+		with self.presentation_lock:
+			self.disconnect_presentation()
+			if SEGREGATED_TEST_MODE:
+				super().connect_to_presentation()
+				return self.presentation_layer is not None
+			self.logger.info(f'Connecting to kafka at {self.kafka_server}')
+			try:
+				layer = KafkaPresentationLayer(server=[self.kafka_server],
+											   serializer=self.serializer.serialize_to_utf_8,
+											   deserializer=self.serializer.deserialize_from_utf_8,
+											   group_id=self.component_id)
+				layer.start(self.topics, cb_func=self.handle_message)
+			except Exception as e:
+				self.m_kafka_send_failures.inc()
+				self.my_logger.warning(f'[connect_to_presentation]  Unable to connect to Kafka: {e}', key='kafka_connect')
+				return False
+			self.presentation_layer = layer
+			return True
+
+
+	def disconnect_presentation(self):
+		if self.presentation_layer is not None:
+			try:
+				self.presentation_layer.shutdown()
+			except Exception:
+				pass
+			self.presentation_layer = None
+
+
+	def send_message(self, recipient, message_type, message_subtype, message_body):
+		"""
+		Builds the message envelope (as SensorBase.send_message() does) and appends it to the durable outbox;
+		heartbeats replace any undelivered heartbeat. Delivery happens in drain_outbox().
+		"""
+		msg = {
+			'version': self.version,
+			'componentId': self.component_id,
+			'componentType': self.component_type,
+			'componentSite': self.component_site,
+			'componentFriendlyName': self.component_friendly_name,
+			'messageTimestamp': self._get_timestamp(),
+			'messageId': str(uuid.uuid4()),
+			'messageType': message_type,
+			'messageSubtype': message_subtype,
+			'messageBody': message_body,
+		}
+		heartbeat = message_subtype == ('Heartbeat' if SEGREGATED_TEST_MODE else model.ControlMessageSubtypes.Heartbeat.value)
+		self.alert_outbox.put(recipient, msg, coalesce_key='heartbeat' if heartbeat else None)
+		self.outbox_event.set()
+
+
+	def drain_outbox(self):
+		"""
+		Outbox drain thread: delivers queued messages in order, reconnecting (with exponential backoff after failed
+		connects and sends) as needed. A message the serializer rejects (ValueError/TypeError, e.g. fast_messages'
+		ValidationError, raised by send() every time) is moved to the dead-letter table instead of being retried.
+		"""
+		backoff = 1.0
+		while not self.outbox_stop.is_set():
+			if self.presentation_layer is None and not self.connect_to_presentation():
+				self.outbox_stop.wait(backoff)
+				backoff = min(2.0 * backoff, self.outbox_retry_max)
+				continue
+			self.outbox_event.clear()
+			pending = self.alert_outbox.peek()
+			if not pending:
+				self.outbox_event.wait(timeout=1)
+				continue
+			delivered = []   ## Deleted together once the page is done (a crash in between re-sends at most one page)
+			for row_id, recipient, msg in pending:
+				try:
+					self.presentation_layer.send_message(msg, recipient)
+				except (ValueError, TypeError) as e:   ## Undeliverable as-is --> retrying can only block the outbox
+					self.m_kafka_dead_letters.inc()
+					self.my_logger.error(f'[drain_outbox]  Message to {recipient} rejected by the serializer ({e}); moved to the dead-letter table')
+					self.alert_outbox.dead_letter(row_id, e)
+					continue
+				except Exception as e:
+					self.m_kafka_send_failures.inc()
+					self.my_logger.warning(f'[drain_outbox]  Kafka send failed ({e}); {len(self.alert_outbox)} message(s) held in the outbox',
+										   key='kafka_send')
+					with self.presentation_lock:
+						self.disconnect_presentation()
+					self.outbox_stop.wait(backoff)
+					backoff = min(2.0 * backoff, self.outbox_retry_max)
+					break
+				delivered.append(row_id)
+				backoff = 1.0
+			self.alert_outbox.delete_many(delivered)
 
 
 	@property
 	def device_name(self):
 		""" Returns the Yeti mic's sound card alias relative to alsa (typically just shows as 'Microphone'). """
-		if self.__device_name is None:
-			try:
-				self.__device_name = [card[card.find('[')+1:card.find(']')].strip() for card in os.popen('cat /proc/asound/cards').read().split('\n') if all(x in card for x in ['Yeti', '['])][0]
-			except IndexError:
-				device_list = [card[card.find('[')+1:card.find(']')].strip() for card in os.popen('cat /proc/asound/cards').read().split('\n') if ']' in card]
-				if len(device_list) > 0:
-					self.__device_name = device_list[0]
-				else:
-					self.__device_name = 'Microphone'
-			except Exception:
-				self.__device_name = 'Microphone'
-		return self.__device_name
+		return self.device_discovery.device_name
+
+
+	def new_synth_source(self, samplerate, channels):
+		""" A synthetic source generating PCM in the stream's format (its input is read raw, so they must agree). """
+		return SyntheticAudioSource(f"yeti_synth_{self.microphone_number}", kind=self.audio_source, samplerate=samplerate,
+									channels=channels, logger=self.my_logger, **self.synth_options)
 
 
 	@property
 	def stream_mrl(self):
 		""" Returns the Media Resource Locator (MRL) for the Yeti mic to be used as an audio input for streaming with VLC. """
-		return f"alsa://hw:{self.device_name}" if sys.platform != "darwin" else "qtsound://"
+		if self.synth_source is not None:
+			return self.synth_source.mrl
+		if sys.platform == "darwin":
+			return "qtsound://"
+		if self.shared_capture:
+			return f"alsa://dsnoop:CARD={self.device_name},DEV=0"
+		return f"alsa://hw:{self.device_name}"
 
 
 	@property
@@ -292,56 +693,91 @@ class MicrophoneSensor(SensorBase):
 		return f"rtp://@{self.stream_rtp_addr}:{self.stream_rtp_port}"
 
 
-	def get_audio(self, hash_q, duration_lock, calibration_flag, calibration_lock):
+	def get_audio(self, hash_q, kafka_q, capture_control, stream_control, calibration_flag, calibration_lock):
 		""" 
 		Process for streaming live audio data and simultaneously listening to the live feed 
 		for recording audio clips to be posted to the CDN.
 		"""
 		self.my_logger.info('[get_audio]  Audio Process Successfully Started')
 		self.my_logger.info(f'[get_audio]  Initializing VLC live-stream of audio data to target address ({self.stream_target_url})')
+		if self.synth_source is not None:
+			self.synth_source.start()
+		elif sys.platform.startswith('linux'):
+			self.device_discovery.start()
 		self.streamer.stream_start() 	#use_shell=True)
 		if DEBUG:
 			print_proc_info(process=self.streamer.process, pname="VLCAudioStreamer")
 		self.update_state("Streaming")
-		time.sleep(3)   ## Slight delay to allow VLC stream to init && stabilize
+		self.wait_for_stream_ready(kafka_q)   ## Recording starts as soon as the stream is actually live
+		monitor = self.start_stream_monitor()
+		level_feed = self.start_level_feed()
+		stall_threshold = self.stall_window
+		stream_health = (0, 0)   ## (packets, lost packets) already added to the metrics
+		device_present = True
 
 		calibrating = False
+		last_clip_stop = None
+		applied_generation = None
+		applied_stream_generation = stream_control.generation   ## The streamer was just started with these settings
 		self.my_logger.info(f'[get_audio]  Initializing VLC loopback listener for recording audio data ({self.loop_mrl})')
 		self.my_logger.info('[get_audio]  Recording...')
 		self.update_state("Recording")
 
 		while True:
-			if self.duration_update:
-				self.update_state("Changing recording duration")
-				self.my_logger.info('get_audio: Acquiring recording duration lock...')
-				duration_lock.acquire()   ## Blocking
-				self.my_logger.info('get_audio: Recording duration lock acquired. Opening audio stream.')
-				try:
-					self.listener.set_recording_duration(self.file_duration)
-				finally:
-					self.duration_update = False
-					duration_lock.release()
-			else:
-				if calibration_flag.value:
-					self.update_state("Calibrating")
-					calibrating = True
-					self.my_logger.info("[get_audio]  Beginning Calibration")
+			if capture_control.generation != applied_generation:   ## Clip boundary: pick up any new capture settings
+				applied_generation = self.apply_capture_settings(capture_control)
+			if stream_control.generation != applied_stream_generation:   ## Also between clips, so no clip records the encoders' overlap
+				applied_stream_generation = self.replace_stream(stream_control)
+				if monitor is not None:
+					monitor.reset()
+				if level_feed is not None:
+					level_feed.set_format(self.streamer.cfg.samplerate, self.streamer.cfg.channels)
+			if calibration_flag.value and not calibrating:
+				self.update_state("Calibrating")
+				calibrating = True
+				self.my_logger.info("[get_audio]  Beginning Calibration")
 
 			try:
 				record_seconds = self.listener.recording_duration if not calibrating else self.calibration_duration
 				clip_start_time = SensorBase._get_timestamp()
 				capture_ts = time.time()
+				if last_clip_stop is not None:
+					self.m_inter_clip_gap.observe(time.monotonic() - last_clip_stop)
 				self.listener.listen_start() 	#use_shell=True)
 				if DEBUG:
 					print_proc_info(process=self.listener.process, pname="VLCAudioListener")
+				stalled = None
 				while (time.time() - capture_ts) <= record_seconds:
 					time.sleep(0.1)
+					if self.device_event.is_set():   ## Hotplug: cut the clip short && re-point the streamer below
+						break
+					if monitor is not None:
+						if device_present and monitor.stalled_for() > stall_threshold:
+							stalled = monitor.snapshot()   ## Cut the (dead) clip short && restart the encoder below
+							break
+						stream_health = self.report_stream_health(monitor, stream_health)
+				last_sample_mono = time.monotonic()   ## The listener is killed immediately, so this is its last sample
 				self.listener.listen_stop()
+				trace = new_trace('captured')
+				last_clip_stop = trace['captured']
 				clip_end_time = SensorBase._get_timestamp()
 				temp_recording_name = self.listener.get_recent_clip()
+				analysis_name = self.listener.get_recent_analysis_file()
 
 				if os.path.isfile(temp_recording_name):
-					hash_q.put((temp_recording_name, clip_start_time, clip_end_time, calibrating))
+					try:
+						clip_start_time, clip_end_time, _ = clip_bounds(temp_recording_name, last_sample_mono,
+																		 self.clock_anchor, self.capture_latency.value)
+					except (OSError, ValueError) as exc:
+						self.my_logger.warning(f"[get_audio]  Falling back to process-based clip timestamps: {exc}")
+					self.m_clips_captured.inc()
+					self.m_bytes_written.inc(os.path.getsize(temp_recording_name))
+					hash_q.put({"filename": temp_recording_name,
+								"start_t": clip_start_time,
+								"end_t": clip_end_time,
+								"calibration": calibrating,
+								"trace": trace,
+								"analysis_file": analysis_name})
 				else:
 					self.my_logger.error(f"[get_audio]  No saved audio file named '{temp_recording_name}' was found!")
 					time.sleep(1)
@@ -352,12 +788,253 @@ class MicrophoneSensor(SensorBase):
 						calibration_flag.value = 0
 					self.update_state("Recording")
 
+				if monitor is not None:
+					stream_health = self.report_stream_health(monitor, stream_health)
+				if self.device_event.is_set():
+					self.device_event.clear()
+					device_present = self.repoint_capture(kafka_q, monitor)
+					stall_threshold = self.stall_window
+				elif stalled is not None:
+					live = self.recover_stalled_stream(kafka_q, monitor, stalled)
+					stall_threshold = self.stall_window if live else min(2 * stall_threshold, 300)   ## Back off while the device stays dead
+
 				self.constrain_vlc_instances()
 
 			except Exception as exc_1:
 					self.my_logger.error("[get_audio]  Error in get_audio: {}".format(exc_1))
 
 	
+	def apply_capture_settings(self, capture_control):
+		""" Applies the control block's duration && transcode settings to the listener (capture process); returns their generation. """
+		generation, settings = capture_control.snapshot()
+		self.update_state("Changing recording settings")
+		self.listener.set_recording_duration(settings['duration'])
+		new_cfg = dataclasses.replace(self.listener.cfg, codec=settings['codec'], bitrate=settings['bitrate'],
+									  channels=settings['channels'], samplerate=settings['samplerate'])
+		if new_cfg != self.listener.cfg:
+			self.listener.update_audio_settings(new_cfg)   ## A new instance, so the streamer's settings are left untouched
+			if DEBUG:
+				self.listener.display_listen_command()
+		self.my_logger.info(f"[apply_capture_settings]  Capture settings #{generation} applied: {settings}")
+		self.update_state("Recording")
+		return generation
+
+
+	def probe_stream(self, timeout):
+		"""
+		Waits for the first RTP/TS packet on the loopback port (which the listener has not bound yet); returns its
+		source, 'unverified' if the port cannot be probed, or None on timeout or if the streamer exits. The packet's
+		delay since the streamer was launched is fed to the capture latency measurement.
+		"""
+		deadline = time.monotonic() + timeout
+		try:
+			with StreamPacketProbe(self.loopback_addr, self.loopback_port) as probe:
+				while self.streamer.is_running:
+					remaining = deadline - time.monotonic()
+					if remaining <= 0:
+						return None
+					source = probe.wait_for_source(min(0.25, remaining))
+					if source is not None:
+						self.observe_capture_latency(time.monotonic())
+						return source
+				return None
+		except OSError as exc:   ## e.g., a stray listener still holds the port
+			self.my_logger.warning(f"[probe_stream]  Cannot probe {self.loop_mrl} ({exc}); waiting 3 s instead")
+			time.sleep(3)
+			return 'unverified'
+
+
+	def observe_capture_latency(self, first_packet_mono):
+		""" Measures the capture pipeline delay as the streamer's launch-to-first-loopback-packet time. """
+		if self.streamer.launched_at is None:
+			return
+		delay = first_packet_mono - self.streamer.launched_at
+		latency = self.capture_latency.observe(delay)
+		self.m_capture_latency.set(latency)
+		source = 'configured' if self.capture_latency.configured is not None else 'measured'
+		self.my_logger.info(f"[observe_capture_latency]  First loopback packet {delay:.3f} s after the streamer's launch; "
+							f"clip timestamps corrected by {latency:.3f} s ({source})")
+
+
+	def wait_for_stream_ready(self, kafka_q):
+		"""
+		Blocks until the freshly started streamer delivers packets to the loopback port, restarting it up to
+		STREAM_READY_ATTEMPTS times; if it never does, a 'Microphone Stream Not Ready' alert is sent (with the streamer's
+		recent VLC output) and recording proceeds anyway. Returns True if the stream is live.
+		"""
+		started = time.monotonic()
+		for attempt in range(1, self.stream_ready_attempts + 1):
+			source = self.probe_stream(self.stream_ready_timeout)
+			if source is not None:
+				self.m_stream_ready.observe(time.monotonic() - started)
+				self.my_logger.info(f"[wait_for_stream_ready]  Stream live after {time.monotonic() - started:.2f} s (source {source})")
+				return True
+			self.m_stream_ready_failures.inc()
+			self.my_logger.error(f"[wait_for_stream_ready]  No packets on {self.loop_mrl} within {self.stream_ready_timeout} s "
+								 f"(attempt {attempt}/{self.stream_ready_attempts}); streamer running: {self.streamer.is_running}")
+			if attempt < self.stream_ready_attempts:
+				self.streamer.stream_stop()
+				self.m_vlc_restarts.inc()
+				self.streamer.stream_start()
+		kafka_q.put({'title': 'Microphone Stream Not Ready',
+					 'severity': 2,
+					 'text': f"No audio on {self.loop_mrl} after {self.stream_ready_attempts} stream start(s)",
+					 'details': {"timeoutSeconds": self.stream_ready_timeout,
+								 "attempts": self.stream_ready_attempts,
+								 "streamerRunning": self.streamer.is_running,
+								 "vlcOutput": self.streamer_output.diagnostics(n_lines=10)}})
+		return False
+
+
+	def start_stream_monitor(self):
+		""" Starts the stall watchdog's StreamMonitor on the monitor port (capture process); None if disabled or unavailable. """
+		if not self.monitor_port:
+			return None
+		monitor = StreamMonitor(self.streamer.monitor_addr, self.monitor_port)
+		try:
+			monitor.start()
+		except OSError as exc:
+			self.my_logger.error(f"[start_stream_monitor]  Stall watchdog disabled; cannot bind monitor port {self.monitor_port}: {exc}")
+			return None
+		return monitor
+
+
+	def start_level_feed(self):
+		""" Starts feeding the level meter from the streamer's PCM meter copy (capture process); None if disabled or unavailable. """
+		if not self.level_meter_port:
+			return None
+		feed = LiveLevelFeed(self.level_meter, self.streamer.meter_addr, self.level_meter_port,
+							 self.streamer.cfg.samplerate, self.streamer.cfg.channels)
+		try:
+			feed.start()
+		except OSError as exc:
+			self.my_logger.error(f"[start_level_feed]  Level meter disabled; cannot bind meter port {self.level_meter_port}: {exc}")
+			return None
+		return feed
+
+
+	def on_device_change(self, device_name, present, action):
+		""" DeviceDiscovery callback (capture process's hotplug thread): wakes the capture loop to re-point the streamer. """
+		self.m_device_events['added' if present else 'removed'].inc()
+		self.device_event.set()
+
+
+	def repoint_capture(self, kafka_q, monitor):
+		"""
+		Handles a Yeti hotplug in the capture process (the listener is already stopped): on removal raises an alert
+		&& pauses the stall watchdog; on (re)connection restarts the streamer on the device's current MRL. Returns
+		True if the device is present.
+		"""
+		present = self.device_discovery.present
+		mrl = self.stream_mrl
+		if not present:
+			self.update_state("Device removed")
+			self.my_logger.error(f"[repoint_capture]  Yeti removed; waiting for it to be reconnected (last MRL: {self.streamer.cfg.tx_mrl})")
+			kafka_q.put({'title': 'Microphone Device Removed', 'severity': 2,
+						 'text': f"Capture device {self.streamer.cfg.tx_mrl} disconnected", 'details': {"mrl": self.streamer.cfg.tx_mrl}})
+			return False
+		self.update_state("Re-pointing capture device")
+		self.streamer.stream_stop(redundant_kill=True)
+		self.streamer.update_audio_settings(dataclasses.replace(self.streamer.cfg, tx_mrl=mrl))
+		self.streamer.stream_start()
+		live = self.wait_for_stream_ready(kafka_q)
+		if monitor is not None:
+			monitor.reset()
+		self.my_logger.info(f"[repoint_capture]  Streamer re-pointed to {mrl} (live: {live})")
+		kafka_q.put({'title': 'Microphone Device Reconnected', 'severity': 5,
+					 'text': f"Capture device reconnected as {mrl}", 'details': {"mrl": mrl, "live": live}})
+		self.update_state("Recording")
+		return True
+
+
+	def recover_stalled_stream(self, kafka_q, monitor, stalled):
+		"""
+		Restarts an encoder that has sent nothing to the monitor port for the stall window && raises a
+		'Microphone Stream Stalled' alert; the listener is already stopped. Returns True if the stream is live again.
+		"""
+		self.m_stream_stalls.inc()
+		self.my_logger.error(f"[recover_stalled_stream]  No packets for {stalled['seconds_since_packet']} s; restarting the encoder ({stalled})")
+		diagnostics = self.streamer_output.diagnostics(n_lines=10)
+		self.update_state("Restarting stalled stream")
+		self.streamer.stream_stop(redundant_kill=True)
+		self.m_vlc_restarts.inc()
+		self.streamer.stream_start()
+		live = self.wait_for_stream_ready(kafka_q)
+		monitor.reset()
+		kafka_q.put({'title': 'Microphone Stream Stalled',
+					 'severity': 3,
+					 'text': f"No audio for {stalled['seconds_since_packet']} s; encoder restarted ({'live again' if live else 'still down'})",
+					 'details': {"monitor": stalled, "live": live, "vlcOutput": diagnostics}})
+		self.update_state("Recording")
+		return live
+
+
+	def report_stream_health(self, monitor, reported):
+		""" Adds the monitor's packets && RTP losses since 'reported' to the metrics; returns the new (packets, lost). """
+		packets, lost = monitor.packets, monitor.lost_packets
+		if packets > reported[0]:
+			self.m_stream_packets.inc(packets - reported[0])
+		if lost > reported[1]:
+			self.m_rtp_lost_packets.inc(lost - reported[1])
+		return packets, lost
+
+
+	def replace_stream(self, stream_control):
+		"""
+		Restarts the streamer with the control block's stream settings (capture process, between clips, so both
+		encoders' output never reaches a recording listener); returns their generation. VLCAudioStreamer.replace()
+		falls back to a restart by itself and reports which path it took; should VLC fail to launch, the stream is
+		only restarted here if it is no longer running. A synthetic source's FIFO can't be shared, so it is always
+		restarted (with its generator in the new format).
+		"""
+		generation, settings = stream_control.snapshot()
+		new_cfg = dataclasses.replace(self.streamer.cfg, codec=settings['codec'], bitrate=settings['bitrate'],
+									  channels=settings['channels'], samplerate=settings['samplerate'])
+		if new_cfg == self.streamer.cfg:
+			return generation
+		self.update_state("Changing stream settings")
+		started = time.monotonic()
+		path = REPLACED_BY_RESTART
+		if self.synth_source is not None:
+			self.restart_stream(new_cfg)
+		else:
+			try:
+				path = self.streamer.replace(new_cfg, ready_timeout=self.stream_ready_timeout)
+			except OSError as exc:
+				running = self.streamer.is_running
+				self.my_logger.error(f"[replace_stream]  Stream replacement failed ({exc}); "
+									 f"{'the old stream keeps running' if running else 'restarting the stream'}")
+				path = REPLACEMENT_FAILED
+				if not running:
+					self.restart_stream(new_cfg)
+					path = REPLACED_BY_RESTART
+		self.m_stream_replacements[path].inc()
+		if path == REPLACEMENT_FAILED:
+			self.my_logger.error(f"[replace_stream]  Stream settings #{generation} not applied; still streaming with {self.streamer.cfg}")
+		else:
+			self.my_logger.info(f"[replace_stream]  Stream settings #{generation} "
+								f"{'swapped in' if path == REPLACED_MAKE_BEFORE_BREAK else 'applied by restart'} "
+								f"in {time.monotonic() - started:.2f} s: {settings}")
+		if DEBUG:
+			self.streamer.display_stream_command()
+		self.update_state("Recording")
+		return generation
+
+
+	def restart_stream(self, new_cfg):
+		""" Break-before-make stream restart with 'new_cfg', rebuilding a synthetic source's generator to match it. """
+		self.streamer.stream_stop()
+		if self.synth_source is not None:
+			self.synth_source.stop()
+			self.synth_source = self.new_synth_source(new_cfg.samplerate, new_cfg.channels)
+			self.streamer.input_opts = self.synth_source.vlc_input_opts
+			self.synth_source.start()
+		self.streamer.update_audio_settings(new_cfg)
+		self.streamer.stream_start()
+		if self.probe_stream(self.stream_ready_timeout) is None:
+			self.my_logger.warning(f"[restart_stream]  No packets from the restarted stream within {self.stream_ready_timeout} s")
+
+
 	def constrain_vlc_instances(self):
 		"""	Ensures that there are never more than { MAX_VLC_INSTANCES } VLC jobs running at any given time. """
 		vlc_pids = VLCAudioBase.get_running_vlc_pid_list()
@@ -369,6 +1046,7 @@ class MicrophoneSensor(SensorBase):
 					self.my_logger.info(f"[constrain_vlc_instances]  Killing VLC process #{idx} with PID {pid}")
 					try:
 						os.kill(pid, SIGKILL)
+						self.m_vlc_restarts.inc()
 					except Exception as exc:
 						self.my_logger.error("[constrain_vlc_instances]  Error in constrain_vlc_instances: {}".format(exc))
 
@@ -377,152 +1055,520 @@ class MicrophoneSensor(SensorBase):
 		self.my_logger.info(f"\n[{self.__class__.__name__}]  Aborting: Terminating all VLC activities.")
 		self.listener.listen_stop()
 		self.streamer.stream_stop()
+		if self.synth_source is not None:
+			self.synth_source.stop()
 		if redundant_kill or len(VLCAudioBase.get_running_vlc_pid_list()) > 0:
 			os.system('pkill vlc')
 	
 
-	def hash_audio_for_post(self, hash_q, post_q):
-		""" Hashing / audio processing process. """
-		self.my_logger.info('[hash_audio_for_post]  Hash Process Successfully Started')
+	def run_process(self, target, *args):
+		"""
+		Entry point of every child process: runs 'target', then flushes the records this process still has queued in
+		the AsyncLogger -- children leave through os._exit(), which skips atexit. terminate() (SIGTERM, also sent to
+		the daemon children when the sensor exits) is turned into SystemExit so that the flush runs then too.
+		"""
+		signal(SIGTERM, lambda signum, frame: sys.exit(0))
+		try:
+			target(*args)
+		finally:
+			self.my_logger.close()
+
+
+	def manage_hash_workers(self, hash_q, post_q, active):
+		"""
+		Hash process: queues any residual recordings for the workers, then keeps one hash worker active per
+		HASH_BACKLOG_PER_WORKER clips waiting in hash_q (at least one, at most HASH_MAX_WORKERS).
+		"""
+		self.my_logger.info('[manage_hash_workers]  Hash Process Successfully Started')
+		try:
+			self.wav_check(hash_q, post_q)   ## Clean up ephemeral recordings from previous containers
+		except Exception as e:
+			self.my_logger.error(e)
 		while True:
-			while not hash_q.empty():
-				try:
-					unprocessed_data = hash_q.get()
-					temp_filename = unprocessed_data[0]
-					self.my_logger.info(f'[hash_audio_for_post]  Hash process received a new file ({temp_filename})')
-					## Need to do this to prevent self.start_time and end_time from being overwritten
-					self.start_time = unprocessed_data[1]
-					self.end_time = unprocessed_data[2]
-					calibration_flag = unprocessed_data[3]
-					## Rename recording && add it to the CDN post queue
-					self.hash_rename(post_q, audio_name=temp_filename, calibration_flag=calibration_flag)
-				except Exception as e:
-					self.my_logger.error("[hash_audio_for_post]  Exception in hash_audio_for_post: {}".format(e))
+			time.sleep(0.5)
+			try:
+				backlog = hash_q.qsize()
+			except NotImplementedError:   ## macOS
+				backlog = 0
+			target = max(1, min(len(self.hash_workers), 1 + backlog // self.hash_backlog_per_worker))
+			if target != active.value:
+				self.my_logger.info(f"[manage_hash_workers]  {backlog} clip(s) waiting; {active.value} --> {target} active hash worker(s)")
+				active.value = target
+
+
+	def hash_audio_for_post(self, index, hash_q, post_q, kafka_q, active):
+		""" Hash worker process (niced): analyses, hashes && renames clips while its index is below 'active'. """
+		os.nice(self.hash_worker_nice)
+		hash_buffer = bytearray(self.hash_chunk_size)   ## Reused for every clip so memory doesn't grow with clip length
+		self.my_logger.info(f'[hash_audio_for_post]  Hash Worker #{index} Successfully Started')
+		while True:
+			if index >= active.value:
+				time.sleep(0.5)
+				continue
+			try:
+				unprocessed_data = hash_q.get(timeout=0.5)
+			except queue.Empty:
+				continue
+			try:
+				temp_filename = unprocessed_data["filename"]
+				self.my_logger.info(f'[hash_audio_for_post]  Hash worker #{index} received a new file ({temp_filename})')
+				calibration_flag = unprocessed_data["calibration"]
+				activity, profile = None, None
+				if not unprocessed_data.get("residual"):   ## Residual clips lost their analysis sidecar
+					activity, profile = self.analyse_clip(temp_filename, unprocessed_data.get("analysis_file"), calibration_flag)
+				if activity is not None and not activity["active"] and not calibration_flag:
+					if self.handle_silent_clip(kafka_q, unprocessed_data, activity):
+						continue
+				## Rename recording && add it to the CDN post queue
+				self.hash_rename(post_q, unprocessed_data, activity=activity, profile=profile, buffer=hash_buffer)
+			except Exception as e:
+				self.my_logger.error("[hash_audio_for_post]  Exception in hash_audio_for_post: {}".format(e))
+
+
+	def analyse_clip(self, clip_name, analysis_name=None, calibration_flag=False):
+		"""
+		Decodes a clip's PCM analysis sidecar (deleted afterwards), or the clip itself if it was recorded as PCM, to
+		score its audio activity; calibration clips are also profiled (and the profile cached). Returns (activity,
+		profile); activity is None if the audio can't be decoded (the clip is then treated as active) and profile is
+		None for regular clips.
+
+		Regular clips are decoded one ANALYSIS_BLOCK_SECONDS block at a time, so a worker holds ~one block of float32
+		samples (plus one level per 30 ms frame) whatever the clip length; calibration clips (calibration_duration
+		seconds) are decoded whole, since their spectral profile needs every frame. The profile is taken from the clip
+		itself when it is PCM (full bandwidth), else from the sidecar (band-limited to ANALYSIS_SAMPLERATE / 2, as
+		its 'band_limit_hz' records); the VAD floor is always measured on what VAD scores.
+		"""
+		source = analysis_name if analysis_name and os.path.isfile(analysis_name) else clip_name
+		try:
+			profile = None
+			if calibration_flag:
+				if source != clip_name and read_wav_info(clip_name).is_pcm:
+					samples, samplerate = load_wav(clip_name)
+					profile = calibration_profile(samples, samplerate)
+				samples, samplerate = load_wav(source)
+				if profile is None:
+					profile = calibration_profile(samples, samplerate)
+				else:   ## VAD scores the sidecar, so its floor is measured at the analysis rate
+					profile["analysis"] = {"samplerate": samplerate,
+										   "noise_floor_db": score_activity(samples, samplerate)["noise_floor_db"]}
+				profile = self.calibration_store.save(profile)
+				self.apply_calibration_profile(profile)
+				self.my_logger.info(f"[analyse_clip]  Calibration profile cached at '{self.calibration_store.path}'")
+				activity = score_activity(samples, samplerate, threshold_db=self.vad_threshold_db, margin_db=self.vad_margin_db,
+										  noise_floor_db=self.vad_noise_floor_db if samplerate == self.analysis_samplerate else None,
+										  min_active_ratio=self.vad_min_active_ratio)
+				return activity, profile
+			activity, _ = score_activity_file(source, threshold_db=self.vad_threshold_db, margin_db=self.vad_margin_db,
+											  noise_floor_db=lambda samplerate: self.vad_noise_floor_db if samplerate == self.analysis_samplerate else None,
+											  min_active_ratio=self.vad_min_active_ratio)
+			return activity, profile
+		except (OSError, ValueError) as exc:
+			self.my_logger.warning(f"[analyse_clip]  Activity unavailable for '{clip_name}': {exc}", key='activity_unavailable')
+			return None, None
+		finally:
+			if analysis_name and os.path.isfile(analysis_name):
+				os.remove(analysis_name)
+
+
+	@property
+	def vad_noise_floor_db(self):
+		""" The calibrated VAD noise floor (dBFS), or None if there is none. """
+		value = self.__vad_noise_floor.value
+		return None if math.isnan(value) else value
+
+
+	def apply_calibration_profile(self, profile):
+		"""
+		Adopts a calibration profile's noise floor as the VAD floor (if it was measured at the analysis sample rate;
+		a full-rate profile carries the sidecar's floor under 'analysis') and derives the level meter's silence
+		(muted/disconnected) threshold from it.
+		"""
+		if not profile or profile.get("noise_floor_db") is None:
+			return
+		self.calibration_profile = profile
+		analysis = profile.get("analysis") or profile
+		if analysis.get("samplerate") == self.analysis_samplerate and analysis.get("noise_floor_db") is not None:
+			self.__vad_noise_floor.value = analysis["noise_floor_db"]
+		self.level_meter.silence_db = profile["noise_floor_db"] - self.level_silence_margin
+		self.my_logger.info(f"[apply_calibration_profile]  Noise floor {profile['noise_floor_db']} dBFS "
+							f"(calibrated {profile.get('created', 'now')}); hum: {[h['frequency_hz'] for h in profile.get('hum', [])]}")
+
+
+	def handle_silent_clip(self, kafka_q, clip, activity):
+		""" Applies SILENCE_POLICY to a silent clip; returns True if the clip was consumed (i.e., must not be uploaded). """
+		if self.silence_policy == 'all':
+			self.m_silent_clips['uploaded'].inc()
+			return False
+		filename = clip["filename"]
+		self.m_bytes_not_uploaded.inc(os.path.getsize(filename))
+		os.remove(filename)
+		if self.silence_policy == 'metadata':
+			self.m_silent_clips['metadata_only'].inc()
+			mark(clip.get("trace"), 'hashed')
+			kafka_q.put({'text': f'{clip["start_t"]} - {clip["end_t"]}',
+						 'details': {"startTime": str(clip["start_t"]),
+									 "endTime": str(clip["end_t"]),
+									 "Room": self.room,
+									 "microphone": self.microphone_number,
+									 "calibration_flag": False,
+									 "uploaded": False,
+									 "activity": activity},
+						 'trace': clip.get("trace")})
+			self.my_logger.info(f"[handle_silent_clip]  Silent clip '{filename}' sent as a metadata-only alert")
+		else:
+			self.m_silent_clips['dropped'].inc()
+			self.my_logger.info(f"[handle_silent_clip]  Silent clip '{filename}' dropped")
+		return True
 
 					
-	def hash_rename(self, post_q, audio_name="output0.wav", calibration_flag=False):
-		""" Rename the audio file specified by 'audio_name' from its temporary name to its SHA1 hash. """
+	def hash_rename(self, post_q, clip, activity=None, profile=None, buffer=None):
+		"""
+		Rename the clip's audio file from its temporary name to its SHA1 hash, then queue it for posting; the file is
+		hashed in chunks through 'buffer' (a reusable bytearray) rather than read whole.
+		"""
+		audio_name = clip["filename"]
 		try:
-			with open(audio_name, 'rb') as f:
-				audio_data = f.read()
-				h = hashlib.new('sha1', audio_data)
-				self.filename = h.hexdigest() + f".{self.recording_format}"
+			hash_start = time.monotonic()
+			filename = hash_file(audio_name, 'sha1', buffer=buffer, chunk_size=self.hash_chunk_size) + f".{self.recording_format}"
 			## Rename the audio file to its SHA
-			os.rename(audio_name, self.filename)
-			self.my_logger.info(f"[hash_rename]  Audio file '{audio_name}' has been renamed to '{self.filename}'")
-			self.add_to_post_q(post_q, self.filename, calibration_flag=calibration_flag)
+			os.rename(audio_name, filename)
+			self.m_hash_seconds.observe(time.monotonic() - hash_start)
+			self.my_logger.info(f"[hash_rename]  Audio file '{audio_name}' has been renamed to '{filename}'")
+			self.add_to_post_q(post_q, filename, clip["start_t"], clip["end_t"], calibration_flag=clip["calibration"],
+							   trace=clip.get("trace"), activity=activity, profile=profile)
 		except Exception as e:
 			self.my_logger.error("[hash_rename]  Exception in hash_rename: {}".format(e))
 				
 
-	def add_to_post_q(self, post_q, filename, calibration_flag=False):
+	def add_to_post_q(self, post_q, filename, start_time='', end_time='', calibration_flag=False, trace=None, activity=None, profile=None):
 		""" Add the new audio recording specified by 'filename' and its metadata to the CDN post queue. """
 		filesize = os.path.getsize(filename)
+		created = os.path.getmtime(filename)   ## When the clip's last sample was written (orders the upload backlog)
+		mark(trace, 'hashed')
 		## Put all the data into the posting queue as a dictionary for easy unpacking
 		post_q.put({
 			"filename": filename,
 			"file_size": filesize,
+			"created": created,
 			"sha": filename.split('.')[0],
-			"start_t": self.start_time,
-			"end_t": self.end_time,
-			"calibration": calibration_flag })
-		## Clear the start and end timestamps
-		self.start_time = ''
-		self.end_time = ''
+			"start_t": start_time,
+			"end_t": end_time,
+			"calibration": calibration_flag,
+			"trace": trace,
+			"activity": activity,
+			"profile": profile })
 
 
 	def post_cdn(self, post_q, kafka_q):
 		"""
-		Checks the post_queue, and parses the dictionary put there by the hash_rename/add_to_post_q functions;
-		posts the recorded .wav file to the CDN then runs several checks to ensure it was properly placed there.
-		:return:
+		Posting process: admits the messages put on the post_queue by hash_rename/add_to_post_q into the upload
+		scheduler, and uploads the most urgent clips it hands out on a pool of threads (per-class concurrency limits);
+		failed uploads go back to the scheduler to be retried after a backoff.
 		"""
 		self.my_logger.info('[post_cdn]  Posting Process Successfully Started')
+		scheduler = UploadScheduler(self.upload_limits, drain_order=self.upload_drain_order, retry_max=self.upload_retry_max)
+		pool = concurrent.futures.ThreadPoolExecutor(max_workers=sum(scheduler.limits.values()), thread_name_prefix='upload')
+		running = {}   ## Future --> message
+		shaper = None
+		if self.upload_shaping:
+			self.upload_bucket = TokenBucket()
+			egress = EgressMonitor(self.upload_interface, backlog_bytes=self.upload_egress_backlog)
+			if egress.interface is None:
+				self.my_logger.warning('[post_cdn]  No egress interface found; uploads are shaped without congestion feedback')
+			shaper = UploadRateController(self.upload_bucket, self.stream_bitrate_bps(), link_bps=self.upload_link_kbps * 1000,
+										  headroom=self.upload_headroom, min_bps=self.upload_min_kbps * 1000,
+										  probe_interval=self.upload_probe_interval, egress=egress)
+			throttled_reported, dropped_reported = 0.0, 0
 		while True:
-			while not post_q.empty():
-				## Get the associated info from the message
-				message = post_q.get()
-				filename = message["filename"]
-				self.my_logger.info(f'[post_cdn]  Posting process received a new file ({filename})')
-				calibration_flag = message["calibration"]
-				filesize = message["file_size"]
-				sha = message["sha"]
-				start_time = message["start_t"]
-				end_time = message["end_t"]
-
-				if DRY_RUN:
-					try:
-						self.my_logger.info(f"[MOCK-post_cdn]  Posting data to CDN: {message}")
-						time.sleep(1)
-						self.my_logger.info(f"[MOCK-post_cdn]  Post to CDN was successful --> removing file '{filename}'")
-						os.remove(filename)
-					except:
-						pass
-					continue
-				
-				try:
-					self.my_logger.info('[post_cdn]  Posting to the CDN ...')
-					files = {'files': open(filename, 'rb')}
-					response = requests.post(f'http://{cdn_url}:{cdn_port}/upload', files=files)
-					fileid = response.text.split()[-1]
-
-					## Ensure SHA posted matches the current file's SHA
-					if fileid != sha:
-						self.my_logger.error(f'[post_cdn]  SHA mismatch error!: file:{sha}, POST:{fileid}')
-					confirmation = requests.get(f'http://{cdn_url}:{cdn_port}/{fileid}')
-					if str(confirmation.status_code) != '200':
-						self.my_logger.error(f'[post_cdn]  Upload error: HTTP {confirmation.status_code}')
-						'''
-						If POST failed, need to alert if the recorder starts filling up with .wavs
-						The process will exit if the device runs out of space.
-						'''
-						usage = shutil.disk_usage('/')
-						percent_used = usage[1] / usage[0] * 100
-						self.my_logger.info('[post_cdn]  Recording not deleted. System storage used: %.2f%%' % percent_used)
-						if percent_used > 95:
-							self.my_logger.critical('[post_cdn]  Microphone crash imminent: Storage used: %.2f%%' % percent_used)
-						elif percent_used > 90:
-							self.my_logger.warning('[post_cdn]  System nearly full. Storage used: %.2f%%' % percent_used)
-					elif fileid == sha:   ## And str(confirmation.status_code) == '200' implied
-						os.remove(filename)
-						self.my_logger.info("[post_cdn]  Post to CDN was successful")
-						self.my_logger.info("[post_cdn]  Deleted file: {}".format(filename))
-
-						kafka_q.put({'text': f'{filename}', 'details': {"startTime": str(start_time),
-																		"endTime": str(end_time),
-																		"SHA1": f'{filename}',
-																		"fileSize": str(filesize),
-																		"Room": self.room,
-																		"microphone": self.microphone_number,
-																		"calibration_flag": calibration_flag}})
-				
-				except (NewConnectionError, Exception) as e:
-					self.my_logger.error(f'\n[post_cdn]  postCDN exception: {e}\n')
-					tb = traceback.format_exc()
-					self.my_logger.error(tb)
-
-					## Read file to the head of the post queue to attempt to POST again
-					temp_q = Queue()
-					temp_q.put(message)
-					while not self.post_queue.empty():
-						temp_q.put(self.post_queue.get())
-					self.post_queue = temp_q
-				
+			## Admit everything hashed so far (waiting briefly if idle), so the scheduler can pick the most urgent clip
+			try:
+				scheduler.add(post_q.get(timeout=0.25))
+				while True:
+					scheduler.add(post_q.get_nowait())
+			except queue.Empty:
+				pass
+			for future in [f for f in running if f.done()]:
+				message = running.pop(future)
+				scheduler.done(message)
+				if not future.result():
+					delay = scheduler.retry(message)
+					self.m_upload_retries.inc()
+					self.my_logger.warning(f"[post_cdn]  Retrying '{message['filename']}' in {delay:.0f} s (attempt {message['attempts'] + 1})",
+										   key='upload_retry')
+			while True:
+				message = scheduler.next()
+				if message is None:
+					break
+				running[pool.submit(self.upload_clip, kafka_q, message)] = message
+			for name in UPLOAD_CLASSES:
+				self.m_uploads_pending[name].set(scheduler.pending(name))
+				self.m_uploads_in_flight[name].set(scheduler.in_flight(name))
+			if shaper is not None:
+				shaper.update(bool(running), stream_bps=self.stream_bitrate_bps())
+				self.m_upload_rate.set(shaper.achieved_bps)
+				self.m_upload_rate_limit.set(shaper.limit_bps())
+				self.m_link_capacity.set(shaper.capacity_bps or 0)
+				self.m_upload_congestion_scale.set(shaper.congestion_scale)
+				self.m_upload_throttled.inc(self.upload_bucket.waited - throttled_reported)
+				throttled_reported = self.upload_bucket.waited
+				if egress.dropped > dropped_reported:
+					self.m_egress_dropped.inc(egress.dropped - dropped_reported)
+				dropped_reported = egress.dropped
+				self.m_egress_backlog.set(egress.backlog)
+
+
+	def stream_bitrate_bps(self):
+		""" The live multicast's bandwidth (bit/s): the streamer's codec bitrate plus packet overhead. """
+		return self.stream_control.snapshot()[1]['bitrate'] * 1000 * STREAM_OVERHEAD
+
+
+	def upload_clip(self, kafka_q, message):
+		"""
+		Posts one clip to the CDN then runs several checks to ensure it was properly placed there (upload thread).
+		Returns False if the upload should be retried (with backoff, keeping the file), i.e. it raised, the CDN's id
+		for it doesn't match its SHA or the CDN can't confirm it; a clip whose file has gone missing is dropped (True),
+		since no retry could ever succeed.
+		"""
+		filename = message["filename"]
+		self.my_logger.info(f'[upload_clip]  Uploading a new file ({filename})')
+		sha = message["sha"]
+		trace = message.get("trace")
+
+		upload_start = time.monotonic()
+		mark(trace, 'upload_start')
+		if DRY_RUN:
+			try:
+				self.my_logger.info(f"[MOCK-upload_clip]  Posting data to CDN: {message}")
+				time.sleep(1)
+				mark(trace, 'upload_end')
+				mark(trace, 'verified')
+				self.m_upload_seconds.observe(time.monotonic() - upload_start)
+				self.my_logger.info(f"[MOCK-upload_clip]  Post to CDN was successful --> removing file '{filename}'")
+				os.remove(filename)
+				self.queue_hash_alert(kafka_q, message)
+			except:
+				pass
+			return True
 
-	def wav_check(self, post_queue):
-		""" This function runs during __init__ to flush out and post any residual .wav files. """
+		try:
+			if not os.path.isfile(filename):
+				raise FileNotFoundError(f"No such file: '{filename}'")
+			cached = self.already_uploaded(sha)
+			if cached:
+				mark(trace, 'upload_end')
+				mark(trace, 'verified')
+				self.m_dedup_skips[cached].inc()
+				os.remove(filename)
+				self.my_logger.info(f"[upload_clip]  CDN already holds '{filename}' ({cached}); skipped upload && deleted file")
+				self.queue_hash_alert(kafka_q, message)
+				return True
+
+			self.my_logger.info('[upload_clip]  Posting to the CDN ...')
+			if self.upload_bucket is not None:   ## Streamed at the shaped rate
+				with ThrottledMultipart(filename, self.upload_bucket) as body:
+					response = requests.post(f'{self.cdn_base_url}/upload', data=body, headers={'Content-Type': body.content_type})
+			else:
+				with open(filename, 'rb') as f:
+					response = requests.post(f'{self.cdn_base_url}/upload', files={'files': f})
+			mark(trace, 'upload_end')
+			self.m_upload_bytes.inc(message["file_size"])
+			fileid = response.text.split()[-1]
+
+			## Ensure SHA posted matches the current file's SHA
+			if fileid != sha:
+				self.my_logger.error(f'[upload_clip]  SHA mismatch error!: file:{sha}, POST:{fileid}')
+			confirmation = requests.get(f'{self.cdn_base_url}/{fileid}')
+			self.m_upload_seconds.observe(time.monotonic() - upload_start)
+			if fileid != sha or str(confirmation.status_code) != '200':
+				self.m_upload_failures.inc()
+			if fileid != sha:   ## Whatever the CDN holds under 'fileid' isn't this clip --> keep the file && retry
+				self.my_logger.error(f"[upload_clip]  '{filename}' not confirmed (CDN id {fileid}, HTTP {confirmation.status_code}); "
+									 "recording not deleted, upload re-queued")
+				return False
+			if str(confirmation.status_code) != '200':
+				self.my_logger.error(f'[upload_clip]  Upload error: HTTP {confirmation.status_code}')
+				'''
+				If POST failed, need to alert if the recorder starts filling up with .wavs
+				The process will exit if the device runs out of space.
+				'''
+				usage = shutil.disk_usage('/')
+				percent_used = usage[1] / usage[0] * 100
+				self.my_logger.info('[upload_clip]  Recording not deleted. System storage used: %.2f%%' % percent_used)
+				if percent_used > 95:
+					self.my_logger.critical('[upload_clip]  Microphone crash imminent: Storage used: %.2f%%' % percent_used)
+				elif percent_used > 90:
+					self.my_logger.warning('[upload_clip]  System nearly full. Storage used: %.2f%%' % percent_used)
+				return False
+			mark(trace, 'verified')   ## fileid == sha && HTTP 200
+			with self.sha_cache_lock:
+				self.sha_cache.add(sha)   ## Recorded before the delete, so a crash in between can't cause a re-upload
+			os.remove(filename)
+			self.my_logger.info("[upload_clip]  Post to CDN was successful")
+			self.my_logger.info("[upload_clip]  Deleted file: {}".format(filename))
+			self.queue_hash_alert(kafka_q, message)
+			return True
+
+		except FileNotFoundError as e:
+			self.m_upload_missing.inc()
+			self.my_logger.error(f"[upload_clip]  Dropping '{filename}' from the upload queue: {e}")
+			return True
+
+		except (NewConnectionError, Exception) as e:
+			self.m_upload_failures.inc()
+			self.my_logger.error(f'\n[upload_clip]  Upload exception: {e}\n')
+			tb = traceback.format_exc()
+			self.my_logger.error(tb)
+			return False
+
+
+	def already_uploaded(self, sha):
+		"""
+		Returns CONFIRMED or PROBABLE if the CDN already holds the clip 'sha', else None; a Bloom-filter-only
+		(PROBABLE) hit is confirmed with a GET to the CDN before it is trusted.
+		"""
+		with self.sha_cache_lock:
+			cached = self.sha_cache.lookup(sha)
+		if cached == PROBABLE:
+			try:
+				confirmation = requests.get(f'{self.cdn_base_url}/{sha}')
+			except Exception as e:
+				self.my_logger.warning(f'[already_uploaded]  Could not confirm {sha} with the CDN: {e}')
+				return None
+			if confirmation.status_code != 200:
+				return None
+			with self.sha_cache_lock:
+				self.sha_cache.add(sha)
+		return cached
+
+
+	def queue_hash_alert(self, kafka_q, message):
+		""" Hands a successfully posted clip's alert (and its trace) to the main process for sending to Kafka. """
+		filename = message["filename"]
+		details = {"startTime": str(message["start_t"]),
+				   "endTime": str(message["end_t"]),
+				   "SHA1": f'{filename}',
+				   "fileSize": str(message["file_size"]),
+				   "Room": self.room,
+				   "microphone": self.microphone_number,
+				   "calibration_flag": message["calibration"],
+				   "activity": message.get("activity")}
+		if message.get("profile"):
+			details["calibrationProfile"] = message["profile"]
+		kafka_q.put({'text': f'{filename}', 'details': details, 'trace': message.get("trace")})
+
+
+	def send_hash_alert(self, data):
+		""" Sends a posted clip's CDN hash alert to Kafka, stamping its trace and attaching the rolling latency summary. """
+		trace = mark(data.get('trace'), 'alerted')
+		durations = self.latency_summary.add(trace)
+		if 'end_to_end' in durations:
+			self.m_clip_latency.observe(durations['end_to_end'])
+			data['details']['latencyMs'] = {name: round(1000.0 * sec, 1) for name, sec in durations.items()}
+			data['details']['latencySummaryMs'] = self.latency_summary.summary()
+		if data['details']['calibration_flag']:
+			self.update_state("Recording_")
+			self.apply_calibration_profile(data['details'].get('calibrationProfile'))   ## Profile was built in the hash process
+			title = 'Microphone Calibration CDN Hash'
+		elif data['details'].get('uploaded') is False:
+			title = 'Microphone Silent Clip'
+		else:
+			title = 'Microphone CDN Hash'
+		subtype = 'Status' if SEGREGATED_TEST_MODE else model.AlertMessageSubtypes.Status.value
+		self.send_alert(subtype, 5, 2, title, data['text'], data['details'])
+		self.my_logger.info(f"[send_hash_alert]  {'Calibration' if data['details']['calibration_flag'] else 'Hash'} Alert sent to Kafka: {data['text']}")
+		if durations and self.latency_log_every > 0 and self.latency_summary.clips % self.latency_log_every == 0:
+			self.my_logger.info(f"[send_hash_alert]  {self.latency_summary.format()}")
+
+
+	def dispatch_alert(self, data):
+		""" Main-process entry point for kafka_queue items: sensor status alerts (with a 'title') go out at once, clip alerts are batched. """
+		if 'title' in data:
+			self.send_status_alert(data)
+		else:
+			self.alert_batcher.add(data)
+
+
+	def send_status_alert(self, data):
+		""" Sends a sensor status alert queued by a child process ({'title', 'text', 'severity', 'details'}). """
+		details = dict(data.get('details') or {}, Room=self.room, microphone=self.microphone_number)
+		subtype = 'Status' if SEGREGATED_TEST_MODE else model.AlertMessageSubtypes.Status.value
+		self.send_alert(subtype, data.get('severity', 3), 2, data['title'], data['text'], details)
+		self.my_logger.warning(f"[send_status_alert]  {data['title']}: {data['text']}")
+
+
+	@staticmethod
+	def alert_bypasses_batch(data):
+		""" Calibration alerts are always sent on their own (silent-clip alerts are batched, see send_hash_alert_batch). """
+		return bool(data['details']['calibration_flag'])
+
+
+	def send_hash_alert_batch(self, batch):
+		"""
+		Sends several posted clips as one 'Microphone CDN Hash Batch' alert whose details hold one compact row per clip
+		(see 'fields'), instead of one alert per clip. Silent clips sent as metadata only (SILENCE_POLICY=metadata) are
+		rows with 'uploaded' false and no SHA1. The batch's time range spans the earliest start && latest end, as
+		clips can be posted out of order (parallel, newest-first uploads).
+		"""
+		fields = ["SHA1", "startTime", "endTime", "fileSize", "activeRatio", "latencyMs", "uploaded"]
+		rows = []
+		for data in batch:
+			details = data['details']
+			durations = self.latency_summary.add(mark(data.get('trace'), 'alerted'))
+			if 'end_to_end' in durations:
+				self.m_clip_latency.observe(durations['end_to_end'])
+			activity = details.get('activity') or {}
+			rows.append([details.get("SHA1"), details["startTime"], details["endTime"], int(details.get("fileSize", 0)),
+						 activity.get('active_ratio'),
+						 round(1000.0 * durations['end_to_end'], 1) if 'end_to_end' in durations else None,
+						 details.get('uploaded') is not False])
+		## ICD timestamps sort lexically; residual clips may have no start time ('')
+		start_time = min((row[1] for row in rows if row[1]), default='')
+		end_time = max((row[2] for row in rows if row[2]), default='')
+		details = {"Room": self.room,
+				   "microphone": self.microphone_number,
+				   "calibration_flag": False,
+				   "count": len(rows),
+				   "silentCount": sum(1 for row in rows if not row[6]),
+				   "startTime": start_time,
+				   "endTime": end_time,
+				   "totalBytes": sum(row[3] for row in rows),
+				   "fields": fields,
+				   "clips": rows,
+				   "latencySummaryMs": self.latency_summary.summary()}
+		text = f"{len(rows)} clips: {start_time} - {end_time}"
+		subtype = 'Status' if SEGREGATED_TEST_MODE else model.AlertMessageSubtypes.Status.value
+		self.send_alert(subtype, 5, 2, 'Microphone CDN Hash Batch', text, details)
+		self.my_logger.info(f"[send_hash_alert_batch]  Batched Hash Alert sent to Kafka: {text}")
+		if self.latency_log_every > 0:
+			self.my_logger.info(f"[send_hash_alert_batch]  {self.latency_summary.format()}")
+
+
+	def wav_check(self, hash_queue, post_queue):
+		"""
+		Runs when the hash process starts to flush out and post any residual .wav files: recordings that were never
+		renamed go to the hash workers (in parallel, rather than being hashed one by one here).
+		"""
 		notify = False   ## Send a single message instead of spamming for each .wav
 		for f in os.listdir():
+			if (f.endswith(".anl") or ".wav" in f) and os.stat(f).st_mtime >= self.residuals_before:
+				continue   ## Captured by this sensor instance
+			if f.endswith(".anl"):   ## Stale analysis sidecar from an interrupted capture
+				os.remove(f)
+				continue
 			if ".wav" in f and "calibration" not in f:
 				notify = True
-				self.end_time = dt.datetime.fromtimestamp(os.stat(f).st_mtime).strftime("%b %d, %Y @ %H:%M:%S.%f")[:-3]
-				## Low priority: TODO: rebuild start time using end time - sample rate * number of frames
+				## The file's mtime is when its last sample was written; its start is rebuilt from the audio duration
+				end_epoch = os.stat(f).st_mtime
+				end_time = format_icd_timestamp(end_epoch)
+				try:
+					start_time = format_icd_timestamp(end_epoch - read_wav_info(f).duration)
+				except (OSError, ValueError):
+					start_time = ''
 				if "output" in f:   ## Last recording not renamed to SHA1
-					if hasattr(f, 'closed') and not f.closed:
-						f.close()
-					self.hash_rename(post_queue, audio_name=f)
+					hash_queue.put({"filename": f, "start_t": start_time, "end_t": end_time, "calibration": False,
+									"trace": None, "analysis_file": None, "residual": True})
 				else:               ## Files already renamed to SHA1
-					self.add_to_post_q(post_queue, f)
+					self.add_to_post_q(post_queue, f, start_time, end_time)
 		if notify:
 			self.my_logger.warning("[wav_check]  Residual .wav(s) found! Files sent to the CDN posting queue...")
 
@@ -558,7 +1604,13 @@ class MicrophoneSensor(SensorBase):
 		self.kill_all_vlc()
 		self.posting_process.join(timeout=5)
 		self.hash_process.join(timeout=5)
+		for worker in self.hash_workers:
+			worker.join(timeout=5)
 		self.audio_process.join(timeout=5)
+		self.outbox_stop.set()
+		self.outbox_event.set()
+		if self.config_watcher is not None:
+			self.config_watcher.stop()
 		super(MicrophoneSensor, self).shutdown()
 
 
@@ -568,8 +1620,29 @@ class MicrophoneSensor(SensorBase):
 			command_details = validated_message['messageBody']['commandDetail']
 			command_message_id = validated_message['messageId']
 			command = command_details['command']
+			error = self.command_error(command)
+			if error is not None:
+				self.my_logger.warning(f'[do_parse_control_message]  Rejected {command}: {error}')
+				self.send_acknowledgement(command, command_message_id, error=error)
+				return
 			self.send_acknowledgement(command, command_message_id)
-			if command != 'calibrate':
+			## 'codec'/'bitrate'/... change the clips; 'stream_codec'/'stream_bitrate'/... change the live stream
+			setting = command[len('stream_'):] if command.startswith('stream_') else command
+			control = self.stream_control if setting != command else self.capture_control
+			if setting == 'codec':
+				codec = str(command_details['value']).lower()
+				if VALID_CODEC.match(codec):
+					self.update_audio_settings(control, codec=codec)
+				else:
+					self.my_logger.error(f'[do_parse_control_message]  Invalid codec: {codec}')
+			elif setting in AUDIO_SETTING_RANGES:
+				lo, hi = AUDIO_SETTING_RANGES[setting]
+				value = int(float(command_details['value']))
+				if lo <= value <= hi:
+					self.update_audio_settings(control, **{setting: value})
+				else:
+					self.my_logger.error(f'[do_parse_control_message]  {command} must be in [{lo}, {hi}] (got {value}).')
+			elif command != 'calibrate':
 				command_value = self.truncate(float(command_details['value']), 3)
 				if command == 'duration':
 					if command_value > 0:
@@ -594,14 +1667,53 @@ class MicrophoneSensor(SensorBase):
 			self.my_logger.warning(e)
 
 
-	def send_acknowledgement(self, command, message_reference):
-		if SEGREGATED_TEST_MODE:
-			self.send_alert('Acknowledgement', 6, 2, 'Command Acknowledgement', f"Acknowledgement of: {command}", None, [message_reference])
+	@staticmethod
+	def command_error(command):
+		""" Returns why a control command can't be applied, or None if it is known. """
+		if command.startswith('stream_'):
+			setting = command[len('stream_'):]
+			if setting in STREAM_COMMANDS:
+				return None
+			if setting in CLIP_COMMANDS:   ## e.g., 'stream_duration': the stream is continuous, only clips have a length
+				return f"the live stream has no '{setting}' setting; send '{setting}' to change the clips"
+		elif command in CLIP_COMMANDS:
+			return None
+		return 'unknown command'
+
+
+	def send_acknowledgement(self, command, message_reference, error=None):
+		""" Acknowledges a control command, or (with 'error') reports that it was rejected. """
+		subtype = 'Acknowledgement' if SEGREGATED_TEST_MODE else model.AlertMessageSubtypes.Acknowledgement.value
+		if error is None:
+			self.send_alert(subtype, 6, 2, 'Command Acknowledgement', f"Acknowledgement of: {command}", None, [message_reference])
 		else:
-			self.send_alert(model.AlertMessageSubtypes.Acknowledgement.value, 6, 2, 'Command Acknowledgement', f"Acknowledgement of: {command}", None, [message_reference])
+			self.send_alert(subtype, 4, 2, 'Command Rejected', f"Rejected: {command} ({error})", {"error": error}, [message_reference])
 		self.my_logger.info('[send_acknowledgement]  Acknowledgement Sent')
 
 
+	def apply_config_change(self, old_config, new_config, changed):
+		"""
+		ConfigWatcher callback (main process): applies the changed 'live' settings through the same paths as the control
+		messages; anything else is logged as taking effect on the next restart.
+		"""
+		self.config = new_config
+		audio = {name.split('.', 1)[1]: value for name, value in changed.items() if name.startswith('audio.')}
+		if audio:
+			self.update_audio_settings(self.capture_control, **audio)
+			self.update_audio_settings(self.stream_control, **audio)
+		if 'recording.duration' in changed:
+			self.update_file_duration(changed['recording.duration'])
+		if 'alerts.linger' in changed:
+			self.alert_batcher.linger = changed['alerts.linger']
+		if 'alerts.max_batch' in changed:
+			self.alert_batcher.max_batch = changed['alerts.max_batch']
+		if 'metrics.trace_log_every' in changed:
+			self.latency_log_every = changed['metrics.trace_log_every']
+		pending = sorted(name for name in changed if not SensorConfig.is_live(name))
+		if pending:
+			self.my_logger.warning(f"[apply_config_change]  Setting(s) {', '.join(pending)} take effect on the next restart")
+
+
 	def update_file_duration(self, next_duration):
 		"""
 		Safely update self.file_duration.
@@ -609,17 +1721,27 @@ class MicrophoneSensor(SensorBase):
 		This function should only ever be called when the recording length or multiplier have changed.
 		Input validation is performed in the do_parse_control_message() function.
 		"""
-		self.my_logger.info('update_file_duration: Acquiring recording duration lock...')
-		self.duration_lock.acquire()   ## Blocking
-		self.my_logger.info('update_file_duration: Recording duration lock acquired.\nUpdating recording duration...')
 		try:
 			self.file_duration = self.truncate(next_duration * self.sampling_multiplier, 3)
+			generation = self.capture_control.update(duration=self.file_duration)   ## Picked up by get_audio at the next clip boundary
+			self.my_logger.info(f'update_file_duration: New recording duration set ({self.file_duration} s, settings #{generation}).')
 		except Exception as e:
 			self.my_logger.error(f'update_file_duration: Duration failed to update:\n{e}')
-		finally:
-			self.duration_lock.release()
-			self.duration_update = True   ## Tells the get_audio Process to grab the new duration
-			self.my_logger.info('New recording duration set.')
+
+
+	def update_audio_settings(self, control, **changes):
+		"""
+		Live-updates the transcode settings (any of codec, bitrate, channels, samplerate) in 'control': the clip settings
+		(capture_control) are applied by get_audio at the next clip boundary without restarting the stream, the stream
+		settings (stream_control) by replacing the streamer. Input validation is performed in do_parse_control_message().
+		"""
+		generation, current = control.snapshot()
+		changes = {k: v for k, v in changes.items() if current.get(k) != v}
+		if not changes:
+			self.my_logger.warning('[update_audio_settings]  Audio settings already set to the requested value(s).')
+			return
+		generation = control.update(**changes)
+		self.my_logger.info(f'[update_audio_settings]  New audio settings {changes} queued (settings #{generation}).')
 
 
 ##=============================================================================
@@ -637,55 +1759,23 @@ if __name__ == "__main__":
 					raise Exception('Missing Dependency: VLC must be installed')
 			
 			sensor.start()
+			sensor.start_metrics_endpoint()
 			sensor.my_logger.info("[main]  Starting Audio Process ...")
 			sensor.audio_process.start()
 			sensor.my_logger.info("[main]  Starting Hash Process ...")
 			sensor.hash_process.start()
+			for worker in sensor.hash_workers:
+				worker.start()
 			sensor.my_logger.info("[main]  Starting Posting Process ...")
 			sensor.posting_process.start()
 
-			using_nohup = any([sensor.streamer.nohup, sensor.listener.nohup])
-			sensor.my_logger.info(f"[main]  VLC processes using 'nohup':  {using_nohup}")
-			nohup_file = os.path.join(os.getcwd(), 'nohup.out')
-			try:
-				nohup_out_size = os.stat(nohup_file).st_size
-			# if os.path.exists(nohup_file):
-			# 	nohup_out_size = os.path.getsize(nohup_file)
-			# else:
-			except:
-				nohup_out_size = 0
-
 			while True:
-				if not sensor.kafka_queue.empty():
-					data = sensor.kafka_hash_q.get()
-					if data['details']['calibration_flag']:
-						sensor.update_state("Recording_")
-						if SEGREGATED_TEST_MODE:
-							sensor.send_alert('Status', 5, 2, 'Microphone Calibration CDN Hash', data['text'], data['details'])
-						else:
-							sensor.send_alert(model.AlertMessageSubtypes.Status.value, 5, 2, 'Microphone Calibration CDN Hash', data['text'], data['details'])
-						sensor.my_logger.info(f"[main]  Calibration Alert sent to Kafka: {data['text']}")
-					else:
-						if SEGREGATED_TEST_MODE:
-							sensor.send_alert('Status', 5, 2, 'Microphone CDN Hash', data['text'], data['details'])
-						else:
-							sensor.send_alert(model.AlertMessageSubtypes.Status.value, 5, 2, 'Microphone CDN Hash', data['text'], data['details'])
-						sensor.my_logger.info(f"[main]  Hash Alert sent to Kafka: {data['text']}")
-
-				if using_nohup:
-					try:
-						new_nohup_out_size = os.stat(nohup_file).st_size
-						if new_nohup_out_size > nohup_out_size:
-							sensor.my_logger.info(f"[main]  New file size of '{nohup_file}':  {new_nohup_out_size} Bytes")
-							nohup_out_size = new_nohup_out_size
-						## If the 'nohup.out' file grows too large, cat /dev/null to it to clear the file contents without stopping the nohup process
-						if nohup_out_size > 20000:
-							os.system(f'cat /dev/null > {nohup_file}')
-					except (OSError, FileNotFoundError) as nohup_exc:
-						# sensor.my_logger.error("Error occurred in main loop regarding nohup.out file management: {}".format(nohup_exc))
-						pass  	## Ignore if 'nohup.out' does not yet exist
-
-				# time.sleep(0.1)
+				try:
+					wait = sensor.alert_batcher.time_to_flush()
+					sensor.dispatch_alert(sensor.kafka_queue.get(timeout=1 if wait is None else max(wait, 0.01)))
+				except queue.Empty:
+					pass
+				sensor.alert_batcher.poll()
 			## Do sensor.shutdown()?
 			## Break out of the container while loop / raise an exception to restart container?
 
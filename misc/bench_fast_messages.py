@@ -0,0 +1,122 @@
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import importlib.util
+import datetime as dt
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fast_messages
+
+"""
+Microbenchmark of per-message validation + (de)serialization cost for the messages the microphone handles:
+fast path (fast_messages) vs. stdlib json alone vs. the marshmallow-dataclass telem_message schema (if
+marshmallow and marshmallow_dataclass are installed; loaded from gitlab_copies/copyof-telem_message.py).
+
+	e.g.,
+			$  python3 bench_fast_messages.py
+			$  python3 bench_fast_messages.py --iterations 50000
+"""
+
+TELEM_MESSAGE_COPY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+								  'gitlab_copies', 'copyof-telem_message.py')
+
+##=============================================================================
+
+def envelope(message_type, subtype, body):
+	return {
+		'version': '0.1',
+		'componentId': 'b827eb123456',
+		'componentType': 'SENSOR' if message_type == 'ALERT' else 'COMMANDER',
+		'componentSite': 'Lab-1',
+		'componentFriendlyName': 'Blue Yeti Microphone - Lab-1',
+		'messageTimestamp': '{}Z'.format(dt.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3]),
+		'messageId': str(uuid.uuid4()),
+		'messageType': message_type,
+		'messageSubtype': subtype,
+		'messageBody': body,
+	}
+
+
+def sample_messages():
+	""" Representative messages: a Microphone control command, a heartbeat, a CDN hash alert and an acknowledgement. """
+	return {
+		'control': envelope('CONTROL', 'Microphone', {'target': 'b827eb123456', 'commandTitle': 'duration',
+													  'commandText': 'set duration', 'commandDetail': {'command': 'duration', 'value': 30}}),
+		'heartbeat': envelope('CONTROL', 'Heartbeat', {'target': 'commander', 'commandTitle': 'heartbeat', 'commandText': 'Recording',
+													   'commandDetail': {'levels': {'rms_db': -42.1, 'peak_db': -12.3, 'status': 'ok'}}}),
+		'hash_alert': envelope('ALERT', 'Status', {'severity': 5, 'confidence': 2, 'host': 'yeti-pi', 'messageRef': [],
+												   'alertTitle': 'Microphone CDN Hash', 'alertText': 'a' * 40 + '.wav',
+												   'alertDetail': {'startTime': '2020-01-01T00:00:00.000Z', 'endTime': '2020-01-01T00:00:30.000Z',
+																   'SHA1': 'a' * 40 + '.wav', 'fileSize': '960044', 'Room': 'Lab-1',
+																   'microphone': 1, 'calibration_flag': False}}),
+		'ack': envelope('ALERT', 'Acknowledgement', {'severity': 6, 'confidence': 2, 'host': 'yeti-pi', 'messageRef': [str(uuid.uuid4())],
+													 'alertTitle': 'Command Acknowledgement', 'alertText': 'Acknowledgement of: duration',
+													 'alertDetail': {}}),
+	}
+
+
+def load_telem_schema():
+	""" Returns the copied telem_message.Message schema instance, or None if its dependencies are missing. """
+	try:
+		spec = importlib.util.spec_from_file_location('copyof_telem_message', TELEM_MESSAGE_COPY)
+		module = importlib.util.module_from_spec(spec)
+		spec.loader.exec_module(module)
+		return module.Message.Schema()
+	except ImportError as exc:
+		print(f"[bench_fast_messages]  Skipping the marshmallow schema baseline: {exc}")
+		return None
+
+
+def time_per_call(fn, iterations):
+	""" Returns microseconds per call (best of 3 runs). """
+	best = float('inf')
+	for _ in range(3):
+		start = time.perf_counter()
+		for _ in range(iterations):
+			fn()
+		best = min(best, (time.perf_counter() - start) / iterations)
+	return best * 1e6
+
+
+def run(iterations):
+	serializer = fast_messages.FastJSONSerializer()
+	schema = load_telem_schema()
+	results = []
+	for name, message in sample_messages().items():
+		encoded = json.dumps(message).encode('utf-8')
+		row = {
+			'message': name,
+			'bytes': len(encoded),
+			'fast_out_us': time_per_call(lambda: serializer.serialize_to_utf_8(message), iterations),
+			'fast_in_us': time_per_call(lambda: serializer.deserialize_from_utf_8(encoded), iterations),
+			'json_out_us': time_per_call(lambda: json.dumps(message).encode('utf-8'), iterations),
+			'json_in_us': time_per_call(lambda: json.loads(encoded), iterations),
+		}
+		if schema is not None:
+			row['schema_in_us'] = time_per_call(lambda: schema.validate(json.loads(encoded)), max(1, iterations // 10))
+		results.append(row)
+	return results
+
+
+def print_report(results):
+	encoder = 'orjson' if fast_messages.orjson is not None else 'json (cached compact encoder)'
+	print(f"\nPer-message cost in microseconds (fast path encoder: {encoder})\n")
+	columns = ['message', 'bytes', 'fast_out_us', 'fast_in_us', 'json_out_us', 'json_in_us', 'schema_in_us']
+	columns = [c for c in columns if any(c in row for row in results)]
+	print(''.join(f"{c:>14}" for c in columns))
+	for row in results:
+		print(''.join(f"{row[c]:>14.2f}" if isinstance(row.get(c), float) else f"{str(row.get(c, '-')):>14}" for c in columns))
+	print("\n  fast_out = validate + encode,  fast_in = decode + validate,  json_* = stdlib json only (no validation),"
+		  "\n  schema_in = json.loads + marshmallow Message.Schema().validate()\n")
+
+
+##=============================================================================
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Benchmark fast-path message validation/serialization.")
+	parser.add_argument('--iterations', type=int, default=20000)
+	args = parser.parse_args()
+	print_report(run(args.iterations))
@@ -0,0 +1,101 @@
+import os
+import sys
+import time
+import hashlib
+import argparse
+import tempfile
+import resource
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import file_hashing
+
+"""
+Benchmark of clip hashing strategies across clip lengths: the old whole-file read (f.read() + sha1), chunked readinto()
+with a reused scratch buffer (file_hashing.hash_file) and a memory map (file_hashing.hash_file_mmap).
+
+Each strategy runs in a fresh child process so its peak RSS ('peak_mb', from getrusage) is attributable to it.
+Clip sizes assume the default 256 kbit/s mpga stream (~32 KB per second of audio).
+
+	e.g.,
+			$  python3 bench_hashing.py
+			$  python3 bench_hashing.py --seconds 30 600 3600 14400 --repeat 5
+"""
+
+BYTES_PER_SECOND = 256 * 1000 // 8
+
+##=============================================================================
+
+def read_all(path, buffer=None):
+	with open(path, 'rb') as f:
+		return hashlib.new('sha1', f.read()).hexdigest()
+
+
+STRATEGIES = {
+	'read_all': read_all,
+	'readinto': file_hashing.hash_file,
+	'mmap': lambda path, buffer=None: file_hashing.hash_file_mmap(path),
+}
+
+
+def peak_rss_mb():
+	peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	return peak / (1024.0 * 1024.0) if sys.platform == 'darwin' else peak / 1024.0   ## bytes on macOS, KiB on Linux
+
+
+def run_strategy(name, path, repeat, results):
+	fn = STRATEGIES[name]
+	buffer = bytearray(file_hashing.DEFAULT_CHUNK_SIZE)
+	baseline = peak_rss_mb()
+	best = float('inf')
+	for _ in range(repeat):
+		start = time.perf_counter()
+		fn(path, buffer=buffer) if name == 'readinto' else fn(path)
+		best = min(best, time.perf_counter() - start)
+	results.put((best, peak_rss_mb() - baseline))
+
+
+def make_clip(directory, seconds):
+	path = os.path.join(directory, f'clip_{seconds}s.wav')
+	size = seconds * BYTES_PER_SECOND
+	with open(path, 'wb') as f:
+		chunk = os.urandom(1 << 20)
+		while size > 0:
+			f.write(chunk[:size])
+			size -= len(chunk)
+	return path
+
+
+def run(seconds_list, repeat):
+	rows = []
+	with tempfile.TemporaryDirectory() as directory:
+		for seconds in seconds_list:
+			path = make_clip(directory, seconds)
+			size_mb = os.path.getsize(path) / 1e6
+			for name in STRATEGIES:
+				results = multiprocessing.Queue()
+				child = multiprocessing.Process(target=run_strategy, args=(name, path, repeat, results))
+				child.start()
+				best, peak = results.get()
+				child.join()
+				rows.append({'seconds': seconds, 'size_mb': size_mb, 'strategy': name,
+							 'ms': 1000.0 * best, 'mb_per_s': size_mb / best if best else float('inf'), 'peak_mb': peak})
+			os.remove(path)
+	return rows
+
+
+def print_report(rows):
+	print(f"\n{'seconds':>10}{'size_mb':>10}{'strategy':>12}{'ms':>12}{'MB/s':>10}{'peak_mb':>10}")
+	for row in rows:
+		print(f"{row['seconds']:>10}{row['size_mb']:>10.1f}{row['strategy']:>12}{row['ms']:>12.2f}{row['mb_per_s']:>10.1f}{row['peak_mb']:>10.1f}")
+	print("\n  peak_mb = growth of the child's peak RSS while hashing (the read_all strategy grows with the clip)\n")
+
+
+##=============================================================================
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Benchmark clip hashing strategies across clip lengths.")
+	parser.add_argument('--seconds', type=int, nargs='+', default=[10, 30, 300, 1800, 7200])
+	parser.add_argument('--repeat', type=int, default=3)
+	args = parser.parse_args()
+	print_report(run(args.seconds, args.repeat))
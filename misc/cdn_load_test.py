@@ -0,0 +1,176 @@
+import os
+import sys
+import time
+import json
+import shutil
+import hashlib
+import argparse
+import tempfile
+import threading
+import statistics as stat
+from queue import Queue, Empty
+import requests
+
+from cdn_server import CDNStandInState, make_server
+
+"""
+Load harness for the CDN upload path: builds a realistic backlog of SHA1-named clips and drains it with the same
+POST /upload --> SHA check --> GET /<sha> sequence that MicrophoneSensor.post_cdn() performs, then reports throughput,
+latency percentiles and failures.
+
+	e.g.,  ( against an embedded stand-in with 200 ms latency, a 4 Mbit/s cap and 5% upload errors )
+			$  python3 cdn_load_test.py --clips 200 --workers 2 --latency 0.2 --bandwidth 4000 --error-rate 0.05
+	or against an already-running server (misc/cdn_server.py or the real CDN):
+			$  python3 cdn_load_test.py --url 127.0.0.1:5000 --clips 500
+"""
+
+##=============================================================================
+
+def make_backlog(directory, n_clips, clip_bytes):
+	""" Writes 'n_clips' random clips of 'clip_bytes' each, named by SHA1 like the sensor does; returns their paths. """
+	paths = []
+	for _ in range(n_clips):
+		data = os.urandom(clip_bytes)
+		path = os.path.join(directory, hashlib.sha1(data).hexdigest() + ".wav")
+		with open(path, 'wb') as f:
+			f.write(data)
+		paths.append(path)
+	return paths
+
+
+def upload_clip(base_url, path, timeout=60):
+	""" Mirrors post_cdn(): returns (ok, reason, seconds). """
+	sha = os.path.basename(path).split('.')[0]
+	started = time.monotonic()
+	try:
+		with open(path, 'rb') as f:
+			response = requests.post(f'{base_url}/upload', files={'files': f}, timeout=timeout)
+		if response.status_code != 200:
+			return False, f'upload HTTP {response.status_code}', time.monotonic() - started
+		fileid = response.text.split()[-1]
+		if fileid != sha:
+			return False, 'sha mismatch', time.monotonic() - started
+		confirmation = requests.get(f'{base_url}/{fileid}', timeout=timeout)
+		if confirmation.status_code != 200:
+			return False, f'confirm HTTP {confirmation.status_code}', time.monotonic() - started
+		return True, 'ok', time.monotonic() - started
+	except requests.RequestException as exc:
+		return False, type(exc).__name__, time.monotonic() - started
+
+
+def run_load(base_url, paths, workers=1, max_attempts=3, arrival_interval=0.0):
+	"""
+	Drains the backlog with 'workers' concurrent uploaders (failed clips are retried up to 'max_attempts' times);
+	a non-zero 'arrival_interval' feeds clips in at the live capture cadence instead of all at once.
+	"""
+	work_q = Queue()
+	results = []
+	results_lock = threading.Lock()
+	done = threading.Event()
+
+	def worker():
+		while not (done.is_set() and work_q.empty()):
+			try:
+				path, attempt = work_q.get(timeout=0.1)
+			except Empty:
+				continue
+			ok, reason, seconds = upload_clip(base_url, path)
+			with results_lock:
+				results.append({"ok": ok, "reason": reason, "seconds": seconds,
+								"bytes": os.path.getsize(path), "attempt": attempt})
+			if ok:
+				os.remove(path)
+			elif attempt < max_attempts:
+				work_q.put((path, attempt + 1))   ## Re-queued before task_done() so that join() keeps waiting
+			work_q.task_done()
+
+	threads = [threading.Thread(target=worker, daemon=True) for _ in range(workers)]
+	started = time.monotonic()
+	for t in threads:
+		t.start()
+	for path in paths:
+		work_q.put((path, 1))
+		if arrival_interval:
+			time.sleep(arrival_interval)
+	work_q.join()
+	done.set()
+	for t in threads:
+		t.join()
+	return results, time.monotonic() - started
+
+
+def percentile(values, pct):
+	if not values:
+		return float('nan')
+	ordered = sorted(values)
+	return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def summarize(results, elapsed, n_clips):
+	ok = [r for r in results if r["ok"]]
+	failures = {}
+	for r in results:
+		if not r["ok"]:
+			failures[r["reason"]] = failures.get(r["reason"], 0) + 1
+	latencies = [r["seconds"] for r in ok]
+	uploaded_bytes = sum(r["bytes"] for r in ok)
+	return {
+		"clips": n_clips,
+		"uploaded": len(ok),
+		"attempts": len(results),
+		"failures": failures,
+		"elapsed_s": round(elapsed, 3),
+		"clips_per_s": round(len(ok) / elapsed, 3) if elapsed else 0.0,
+		"throughput_kbps": round(uploaded_bytes * 8 / 1000 / elapsed, 1) if elapsed else 0.0,
+		"latency_s": {
+			"mean": round(stat.mean(latencies), 4) if latencies else None,
+			"p50": round(percentile(latencies, 50), 4),
+			"p95": round(percentile(latencies, 95), 4),
+			"p99": round(percentile(latencies, 99), 4),
+		},
+	}
+
+
+##=============================================================================
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Drive a CDN (or the local stand-in) with a realistic clip backlog.")
+	parser.add_argument('--url', help="host:port of a running CDN; if omitted an embedded stand-in is started")
+	parser.add_argument('--clips', type=int, default=100, help="Number of clips in the backlog")
+	parser.add_argument('--clip-seconds', type=float, default=30 * 1.036, help="Clip duration (s)")
+	parser.add_argument('--clip-kbps', type=float, default=256, help="Encoded clip bitrate (kbit/s), used to size the clips")
+	parser.add_argument('--workers', type=int, default=1, help="Concurrent uploaders (post_cdn uses 1)")
+	parser.add_argument('--attempts', type=int, default=3, help="Max attempts per clip")
+	parser.add_argument('--arrival-interval', type=float, default=0.0, help="Seconds between clip arrivals (0 = backlog drain)")
+	## Fault injection for the embedded stand-in
+	parser.add_argument('--latency', type=float, default=0.0)
+	parser.add_argument('--jitter', type=float, default=0.0)
+	parser.add_argument('--bandwidth', type=float, default=0)
+	parser.add_argument('--error-rate', type=float, default=0.0)
+	parser.add_argument('--confirm-error-rate', type=float, default=0.0)
+	parser.add_argument('--mismatch-rate', type=float, default=0.0)
+	args = parser.parse_args()
+
+	server = None
+	if args.url:
+		base_url = f'http://{args.url}'
+	else:
+		state = CDNStandInState(args.latency, args.jitter, args.bandwidth, args.error_rate,
+								args.confirm_error_rate, args.mismatch_rate)
+		server = make_server('127.0.0.1', 0, state)
+		threading.Thread(target=server.serve_forever, daemon=True).start()
+		base_url = f'http://127.0.0.1:{server.server_address[1]}'
+
+	clip_bytes = int(args.clip_seconds * args.clip_kbps * 1000 / 8)
+	workdir = tempfile.mkdtemp(prefix='cdn_load_')
+	try:
+		print(f"[cdn_load_test]  Writing {args.clips} clips of {clip_bytes} bytes to {workdir} ...")
+		paths = make_backlog(workdir, args.clips, clip_bytes)
+		print(f"[cdn_load_test]  Draining backlog to {base_url} with {args.workers} worker(s) ...")
+		results, elapsed = run_load(base_url, paths, args.workers, args.attempts, args.arrival_interval)
+		print(json.dumps(summarize(results, elapsed, args.clips), indent=2))
+	finally:
+		shutil.rmtree(workdir, ignore_errors=True)
+		if server is not None:
+			server.shutdown()
+	sys.exit(0)
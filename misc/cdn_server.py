@@ -0,0 +1,188 @@
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from email import policy
+from email.parser import BytesParser
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+"""
+Local stand-in for the pipeline CDN, implementing the two endpoints that MicrophoneSensor.post_cdn() relies on:
+
+	POST /upload 	multipart form with a 'files' field; replies with text whose last token is the SHA1 of the upload
+	GET  /<sha> 	200 if the SHA1 is held by the CDN, else 404
+
+Latency, bandwidth caps, error rates and SHA-mismatch responses can all be injected for load testing, e.g.,
+
+			$  python3 cdn_server.py --port 5000 --latency 0.2 --jitter 0.1 --bandwidth 2000 --error-rate 0.05
+	then run the sensor against it with:
+			$  CDNURL=127.0.0.1 CDNPORT=5000 DRY_RUN=0 python3 microphone.py
+
+GET /stats returns the server's counters as JSON.
+"""
+
+##=============================================================================
+
+class CDNStandInState():
+	""" Fault-injection settings plus the (thread-safe) record of what the stand-in CDN holds. """
+	def __init__(self, latency=0.0, jitter=0.0, bandwidth_kbps=0, error_rate=0.0, confirm_error_rate=0.0,
+				mismatch_rate=0.0, store_dir=None, seed=None):
+		self.latency = latency
+		self.jitter = jitter
+		self.bandwidth_kbps = bandwidth_kbps
+		self.error_rate = error_rate
+		self.confirm_error_rate = confirm_error_rate
+		self.mismatch_rate = mismatch_rate
+		self.store_dir = store_dir
+		self.rng = random.Random(seed)
+		self.lock = threading.Lock()
+		self.held = {}   ## SHA1 --> size in bytes
+		self.stats = {"uploads": 0, "upload_errors": 0, "mismatches": 0, "confirms": 0,
+					  "confirm_errors": 0, "bytes_received": 0, "duplicates": 0}
+
+	def chance(self, rate):
+		with self.lock:
+			return self.rng.random() < rate
+
+	def delay(self):
+		""" Sleeps for the configured latency (+/- uniform jitter). """
+		if self.latency or self.jitter:
+			with self.lock:
+				jitter = self.rng.uniform(-self.jitter, self.jitter)
+			time.sleep(max(0.0, self.latency + jitter))
+
+	def count(self, key, n=1):
+		with self.lock:
+			self.stats[key] += n
+
+
+class CDNRequestHandler(BaseHTTPRequestHandler):
+	server_version = "CDNStandIn/0.1"
+	state = None 	## Set to a CDNStandInState instance by make_server()
+
+	def log_message(self, fmt, *args):
+		pass 	## Keep load tests quiet; see /stats instead
+
+	def reply(self, code, text, content_type='text/plain'):
+		body = text.encode()
+		self.send_response(code)
+		self.send_header('Content-Type', content_type)
+		self.send_header('Content-Length', str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def read_body(self):
+		""" Reads the request body, throttled to the configured bandwidth cap (if any). """
+		remaining = int(self.headers.get('Content-Length', 0))
+		chunks = []
+		chunk_size = 16384
+		rate = self.state.bandwidth_kbps * 1000 / 8   ## Bytes per second
+		started = time.monotonic()
+		received = 0
+		while remaining > 0:
+			chunk = self.rfile.read(min(chunk_size, remaining))
+			if not chunk:
+				break
+			chunks.append(chunk)
+			received += len(chunk)
+			remaining -= len(chunk)
+			if rate:
+				ahead = received / rate - (time.monotonic() - started)
+				if ahead > 0:
+					time.sleep(ahead)
+		return b''.join(chunks)
+
+	def do_POST(self):
+		if self.path.rstrip('/') != '/upload':
+			return self.reply(404, 'Not found')
+		body = self.read_body()
+		self.state.count('bytes_received', len(body))
+		self.state.delay()
+		if self.state.chance(self.state.error_rate):
+			self.state.count('upload_errors')
+			return self.reply(500, 'Injected upload failure')
+
+		header = f"Content-Type: {self.headers.get('Content-Type', '')}\r\n\r\n".encode()
+		msg = BytesParser(policy=policy.HTTP).parsebytes(header + body)
+		data = None
+		if msg.is_multipart():
+			for part in msg.iter_parts():
+				if part.get_param('name', header='content-disposition') == 'files':
+					data = part.get_payload(decode=True)
+					break
+		if data is None:
+			self.state.count('upload_errors')
+			return self.reply(400, "Missing 'files' form field")
+
+		sha = hashlib.sha1(data).hexdigest()
+		with self.state.lock:
+			if sha in self.state.held:
+				self.state.stats['duplicates'] += 1
+			self.state.held[sha] = len(data)
+			self.state.stats['uploads'] += 1
+		if self.state.store_dir:
+			with open(os.path.join(self.state.store_dir, sha), 'wb') as f:
+				f.write(data)
+		if self.state.chance(self.state.mismatch_rate):
+			self.state.count('mismatches')
+			sha = hashlib.sha1(sha.encode()).hexdigest()   ## Deliberately wrong SHA in the reply
+		self.reply(200, f'File uploaded successfully: {sha}')
+
+	def do_GET(self):
+		key = self.path.strip('/')
+		if key == 'stats':
+			with self.state.lock:
+				stats = dict(self.state.stats, held=len(self.state.held))
+			return self.reply(200, json.dumps(stats), content_type='application/json')
+		self.state.delay()
+		if self.state.chance(self.state.confirm_error_rate):
+			self.state.count('confirm_errors')
+			return self.reply(503, 'Injected confirmation failure')
+		self.state.count('confirms')
+		with self.state.lock:
+			held = key in self.state.held
+		if held:
+			self.reply(200, key)
+		else:
+			self.reply(404, 'Not found')
+
+
+def make_server(host='127.0.0.1', port=5000, state=None):
+	""" Returns a ThreadingHTTPServer serving the CDN stand-in (call serve_forever() on it). """
+	handler = type('BoundCDNRequestHandler', (CDNRequestHandler,), {'state': state or CDNStandInState()})
+	server = ThreadingHTTPServer((host, port), handler)
+	server.daemon_threads = True
+	return server
+
+
+##=============================================================================
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Local CDN stand-in with latency and failure injection.")
+	parser.add_argument('--host', default='127.0.0.1')
+	parser.add_argument('--port', type=int, default=5000)
+	parser.add_argument('--latency', type=float, default=0.0, help="Added latency per request (s)")
+	parser.add_argument('--jitter', type=float, default=0.0, help="Uniform +/- jitter on the latency (s)")
+	parser.add_argument('--bandwidth', type=float, default=0, help="Per-upload receive cap (kbit/s); 0 = uncapped")
+	parser.add_argument('--error-rate', type=float, default=0.0, help="Probability an upload returns HTTP 500")
+	parser.add_argument('--confirm-error-rate', type=float, default=0.0, help="Probability a GET /<sha> returns HTTP 503")
+	parser.add_argument('--mismatch-rate', type=float, default=0.0, help="Probability an upload replies with a wrong SHA")
+	parser.add_argument('--store', help="Directory to write uploaded files into (default: keep only their SHAs)")
+	parser.add_argument('--seed', type=int)
+	args = parser.parse_args()
+
+	if args.store:
+		os.makedirs(args.store, exist_ok=True)
+	state = CDNStandInState(args.latency, args.jitter, args.bandwidth, args.error_rate, args.confirm_error_rate,
+							args.mismatch_rate, args.store, args.seed)
+	server = make_server(args.host, args.port, state)
+	print(f"[cdn_server]  Serving CDN stand-in on http://{args.host}:{args.port}  (GET /stats for counters)")
+	try:
+		server.serve_forever()
+	except KeyboardInterrupt:
+		print(f"\n[cdn_server]  Final stats: {json.dumps(dict(state.stats, held=len(state.held)))}")
+		sys.exit(0)
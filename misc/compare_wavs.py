@@ -1,10 +1,40 @@
 import os
+import sys
+import shutil
+import argparse
+import tempfile
+import subprocess
 from time import sleep
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from audio_analysis import compare_clips, read_wav_info
+
+"""
+Objective comparison of encoded clips against a reference capture (replaces the old listen-and-judge loop).
+
+For each candidate clip, computes the time alignment (by cross-correlation), SNR, log-spectral distance and
+clipped-sample count versus the reference, then picks the cheapest (lowest bitrate x channels) setting
+that still meets the quality floor. Compressed clips (the pipeline's mpga-in-WAV, or bare .mp3/.mp2 files) are first
+decoded to s16l PCM in a temporary directory with ffmpeg, or VLC if ffmpeg is not installed.
+
+	e.g.,
+			$  python3 compare_wavs.py --reference reference_capture.wav
+			$  python3 compare_wavs.py --reference ref.wav --candidate clip_a.wav:mpga:128:2 --min-snr 25
+			$  python3 compare_wavs.py --listen     ## Old behavior: play each clip through omxplayer
+"""
+
+## Default quality floor
+MIN_SNR_DB = 20.0
+MAX_SPECTRAL_DISTANCE_DB = 3.0
+MAX_CLIPPED_SAMPLES = 0
+
+MPEG_FORMAT_TAGS = (0x0050, 0x0055)   ## WAVE_FORMAT_MPEG (layers 1/2) && WAVE_FORMAT_MPEGLAYER3
+
 class WAV():
 	def __init__(self, name, details_dict):
 		self.name = name 
 		self.details = details_dict
+		self.metrics = None
 		
 	def get_info(self):
 		print(f"{'='*40}\nFilename:\t{self.name}")
@@ -16,6 +46,26 @@ class WAV():
 		self.get_info()
 		os.system(f"omxplayer -o local {self.name}")
 		
+	@property
+	def cost(self):
+		""" Relative cost of the clip's encoder setting (kBit/s per channel x channels); unknown bitrates sort last. """
+		try:
+			return float(self.details['ab']) * int(self.details['chan'])
+		except (TypeError, ValueError):
+			return float('inf')
+
+	def evaluate(self, reference, decoded=None):
+		""" Compares the clip (or its PCM decode, 'decoded') against the (PCM) 'reference'. """
+		self.metrics = compare_clips(reference, decoded or self.name)
+		return self.metrics
+
+	def meets_floor(self, min_snr=MIN_SNR_DB, max_lsd=MAX_SPECTRAL_DISTANCE_DB, max_clipped=MAX_CLIPPED_SAMPLES):
+		if self.metrics is None:
+			return False
+		return (self.metrics['snr_db'] >= min_snr
+				and self.metrics['spectral_distance_db'] <= max_lsd
+				and self.metrics['clipped_samples'] <= max_clipped)
+
 
 wav_filenames = [
 	"noab_aencffmpeg_1channel_stream_capture0.wav",
@@ -26,15 +76,114 @@ wav_filenames = [
 	"ab256_aencffmpeg_2channels_stream_capture0.wav",
 ]
 		
-if __name__ == "__main__":
+
+
+def default_clips():
 	clips = [WAV(wav_filenames[0], {"ab":'(None/auto)', "chan":1})]
 	clips.append(WAV(wav_filenames[1], {"ab":'(None/auto)', "chan":2}))
 	clips.append(WAV(wav_filenames[2], {"ab":128, "chan":1}))
 	clips.append(WAV(wav_filenames[3], {"ab":128, "chan":2}))
 	clips.append(WAV(wav_filenames[4], {"ab":256, "chan":1}))
 	clips.append(WAV(wav_filenames[5], {"ab":256, "chan":2}))
-	
-	for i,clip in enumerate(clips):
-		c = input(f"Press enter to sample clip #{i}:\n")
-		clips[i].play()
-		sleep(1)
+	return clips
+
+
+def decode_to_pcm(path, directory):
+	"""
+	Returns 'path' if it is a PCM WAV, else the path of its s16l PCM decode written into 'directory'. The MPEG payload
+	of an mpga-in-WAV clip is extracted first: VLC is killed mid-capture, so the clip's RIFF sizes are left as 0 and
+	decoders would otherwise read it as empty. Raises OSError or subprocess.SubprocessError if decoding fails.
+	"""
+	source = path
+	try:
+		info = read_wav_info(path)
+		if info.is_pcm:
+			return path
+		if info.format_tag in MPEG_FORMAT_TAGS:
+			source = os.path.join(directory, f"{os.path.basename(path)}.mpa")
+			with open(path, 'rb') as src, open(source, 'wb') as dst:
+				src.seek(info.data_offset)
+				dst.write(src.read(info.data_size))
+	except ValueError:
+		pass   ## Not a RIFF/WAVE file at all (e.g., a bare .mp3): let the decoder probe it
+	decoded = os.path.join(directory, f"{os.path.basename(path)}.s16l.wav")
+	if shutil.which('ffmpeg'):
+		cmd = ['ffmpeg', '-v', 'error', '-y', '-i', source, '-acodec', 'pcm_s16le', '-f', 'wav', decoded]
+	elif shutil.which('cvlc'):
+		cmd = ['cvlc', '-q', '--play-and-exit', source,
+			   '--sout', f'#transcode{{acodec=s16l}}:std{{access=file,mux=wav,dst={decoded}}}', 'vlc://quit']
+	else:
+		raise OSError(f"'{path}' is compressed and neither ffmpeg nor cvlc is installed to decode it")
+	subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=600, check=True)
+	if not os.path.isfile(decoded) or os.path.getsize(decoded) <= 44:
+		raise OSError(f"Decoding '{path}' produced no audio")
+	return decoded
+
+
+def parse_candidate(spec):
+	""" Parses a '<file>[:<codec>:<bitrate>:<channels>]' candidate specification. """
+	parts = spec.split(':')
+	details = {"codec": parts[1] if len(parts) > 1 else '?',
+			   "ab": parts[2] if len(parts) > 2 else '(None/auto)',
+			   "chan": parts[3] if len(parts) > 3 else '?'}
+	return WAV(parts[0], details)
+
+
+def select_lowest_cost(clips, min_snr=MIN_SNR_DB, max_lsd=MAX_SPECTRAL_DISTANCE_DB, max_clipped=MAX_CLIPPED_SAMPLES):
+	""" Returns the cheapest evaluated clip that meets the quality floor, or None if none qualify. """
+	passing = [c for c in clips if c.meets_floor(min_snr, max_lsd, max_clipped)]
+	return min(passing, key=lambda c: c.cost) if passing else None
+
+
+def print_report(clips, min_snr, max_lsd, max_clipped):
+	header = f"{'clip':<48} {'ab':>10} {'ch':>3} {'lag(s)':>8} {'SNR(dB)':>8} {'LSD(dB)':>8} {'clip#':>6}  pass"
+	print(f"{header}\n{'-'*len(header)}")
+	for c in clips:
+		if c.metrics is None:
+			print(f"{c.name:<48} {str(c.details['ab']):>10} {str(c.details['chan']):>3}   (not evaluated)")
+			continue
+		m = c.metrics
+		ok = 'yes' if c.meets_floor(min_snr, max_lsd, max_clipped) else 'no'
+		print(f"{c.name:<48} {str(c.details['ab']):>10} {str(c.details['chan']):>3} {m['lag_seconds']:>8.3f} "
+			  f"{m['snr_db']:>8.2f} {m['spectral_distance_db']:>8.2f} {m['clipped_samples']:>6}  {ok}")
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Objectively compare encoded WAV clips against a reference capture.")
+	parser.add_argument('--reference', help="Reference (e.g., uncompressed s16l) capture of the same audio")
+	parser.add_argument('--candidate', action='append', default=[], help="'<file>[:<codec>:<bitrate>:<channels>]' (repeatable)")
+	parser.add_argument('--min-snr', type=float, default=MIN_SNR_DB)
+	parser.add_argument('--max-lsd', type=float, default=MAX_SPECTRAL_DISTANCE_DB)
+	parser.add_argument('--max-clipped', type=int, default=MAX_CLIPPED_SAMPLES)
+	parser.add_argument('--listen', action='store_true', help="Play each clip through omxplayer instead")
+	args = parser.parse_args()
+
+	clips = [parse_candidate(spec) for spec in args.candidate] if args.candidate else default_clips()
+
+	if args.listen:
+		for i,clip in enumerate(clips):
+			c = input(f"Press enter to sample clip #{i}:\n")
+			clips[i].play()
+			sleep(1)
+		sys.exit(0)
+
+	if not args.reference:
+		parser.error("--reference is required unless --listen is given")
+
+	with tempfile.TemporaryDirectory(prefix='compare_wavs_') as workdir:
+		try:
+			reference = decode_to_pcm(args.reference, workdir)
+		except (OSError, subprocess.SubprocessError) as exc:
+			sys.exit(f"[compare_wavs]  Cannot decode the reference '{args.reference}': {exc}")
+		for clip in clips:
+			try:
+				clip.evaluate(reference, decode_to_pcm(clip.name, workdir))
+			except (OSError, ValueError, subprocess.SubprocessError) as exc:
+				print(f"[compare_wavs]  Skipping '{clip.name}': {exc}")
+
+	print_report(clips, args.min_snr, args.max_lsd, args.max_clipped)
+	best = select_lowest_cost(clips, args.min_snr, args.max_lsd, args.max_clipped)
+	if best is None:
+		print("\nNo candidate meets the quality floor.")
+		sys.exit(1)
+	print(f"\nLowest-cost setting meeting the floor:  {best.name}  (ab={best.details['ab']}, channels={best.details['chan']})")
@@ -0,0 +1,420 @@
+import os
+import re
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import threading
+from dataclasses import dataclass
+
+try:
+	import yaml
+except ImportError:
+	yaml = None
+
+"""
+Declarative microphone sensor configuration: a validated schema of every tunable, loaded from a YAML file
+(see mic_config.yaml) with environment variable overrides, i.e. for each setting:
+
+			environment variable  >  YAML file  >  schema default
+
+The YAML file is organised by section ('stream', 'audio', 'recording', ...); unknown sections or keys and
+out-of-range values are rejected with one ConfigError listing every problem. get_config() parses once and caches
+the result, so the environment is read in one place. ConfigWatcher watches the file (through inotify on Linux, by
+polling its mtime elsewhere) and reports which settings changed; settings marked 'live' can be applied without a
+restart.
+
+PyYAML is optional (pip3 install pyyaml): without it the file is ignored (with a warning) and only the defaults
+and environment apply.
+"""
+
+TRUE_STRINGS = ('1', 'true', 'yes', 'on')
+FALSE_STRINGS = ('0', 'false', 'no', 'off')
+
+##=============================================================================
+
+class ConfigError(ValueError):
+	""" Raised when the configuration file or environment holds invalid settings. """
+
+
+@dataclass(frozen=True)
+class Setting:
+	## Environment variable overriding the file
+	env: str
+	default: object
+	## One of bool, int, float, str
+	kind: type = str
+	## Allowed values (after lower-casing strings), or None
+	choices: tuple = None
+	## Inclusive (min, max) for numbers, either may be None
+	bounds: tuple = None
+	## True if the sensor can apply a change without restarting
+	live: bool = False
+	## Lower-case string values (e.g., codecs, policies)
+	lower: bool = False
+	## Regular expression a string value must match, or None
+	pattern: str = None
+
+
+SCHEMA = {
+	'logging': {
+		'rate_period': Setting('LOG_RATE_PERIOD', 10.0, float, bounds=(0, None)),
+	},
+	'recording': {
+		'duration': Setting('RECORDING_DURATION', 30.0, float, bounds=(0.5, 3600), live=True),
+		'format': Setting('RECORDING_FORMAT', 'wav', str, choices=('wav',), lower=True),
+		'clock_anchor_refresh': Setting('CLOCK_ANCHOR_REFRESH', 300.0, float, bounds=(1, None)),
+		'capture_latency_offset': Setting('CAPTURE_LATENCY_OFFSET', None, float, bounds=(0, 10)),
+	},
+	'stream': {
+		'rtp_addr': Setting('STREAM_RTP_ADDR', '239.255.12.42'),
+		'rtp_port': Setting('STREAM_RTP_PORT', 1234, int, bounds=(1, 65535)),
+		'loop_addr': Setting('STREAM_LOOP_ADDR', '127.0.0.1'),
+		'loop_port': Setting('STREAM_LOOP_PORT', 1234, int, bounds=(1, 65535)),
+		'protocol': Setting('STREAM_PROTOCOL', 'rtp', str, choices=('rtp',), lower=True),
+		'verbose_level': Setting('STREAM_VERBOSE_LEVEL', 0, int, bounds=(0, 3)),
+		'shared_capture': Setting('ALSA_SHARED_CAPTURE', False, bool),
+		'ready_timeout': Setting('STREAM_READY_TIMEOUT', 10.0, float, bounds=(0.5, 120)),
+		'ready_attempts': Setting('STREAM_READY_ATTEMPTS', 3, int, bounds=(1, 10)),
+		'monitor_port': Setting('STREAM_MONITOR_PORT', 1236, int, bounds=(0, 65535)),
+		'stall_window': Setting('STREAM_STALL_WINDOW', 5.0, float, bounds=(0.5, 300)),
+	},
+	'audio': {
+		'codec': Setting('STREAM_ACODEC', 'mpga', str, live=True, lower=True, pattern=r'^[a-z0-9]{3,4}$'),   ## VLC fourcc
+		'channels': Setting('STREAM_CHANNELS', 2, int, bounds=(1, 2), live=True),
+		'samplerate': Setting('STREAM_SAMPLERATE', 44100, int, bounds=(8000, 48000), live=True),
+		'bitrate': Setting('STREAM_BITRATE', 256, int, bounds=(8, 512), live=True),
+	},
+	'source': {
+		'kind': Setting('AUDIO_SOURCE', 'alsa', str, choices=('alsa', 'tone', 'noise', 'file'), lower=True),
+		'synth_frequency': Setting('SYNTH_FREQUENCY', 440.0, float, bounds=(1, 20000)),
+		'synth_amplitude': Setting('SYNTH_AMPLITUDE', 0.25, float, bounds=(0, 1)),
+		'synth_file': Setting('SYNTH_FILE', None, str),
+	},
+	'analysis': {
+		'samplerate': Setting('ANALYSIS_SAMPLERATE', 16000, int, bounds=(0, 48000)),
+		'silence_policy': Setting('SILENCE_POLICY', 'all', str, choices=('all', 'active', 'metadata'), lower=True),
+		'vad_threshold_db': Setting('VAD_THRESHOLD_DB', -50.0, float, bounds=(-120, 0)),
+		'vad_margin_db': Setting('VAD_MARGIN_DB', 10.0, float, bounds=(0, 60)),
+		'vad_min_active_ratio': Setting('VAD_MIN_ACTIVE_RATIO', 0.02, float, bounds=(0, 1)),
+	},
+	'levels': {
+		'max_blocks': Setting('LEVEL_METER_MAX_BLOCKS', 400, int, bounds=(1, None)),
+		'silence_db': Setting('LEVEL_SILENCE_DB', -70.0, float, bounds=(-120, 0)),
+		'meter_port': Setting('LEVEL_METER_PORT', 1238, int, bounds=(0, 65535)),
+	},
+	'calibration': {
+		'dir': Setting('CALIBRATION_DIR', 'calibration_profiles'),
+		'level_silence_margin_db': Setting('LEVEL_SILENCE_MARGIN_DB', 20.0, float, bounds=(0, 60)),
+	},
+	'hashing': {
+		'max_workers': Setting('HASH_MAX_WORKERS', 4, int, bounds=(1, 16)),
+		'backlog_per_worker': Setting('HASH_BACKLOG_PER_WORKER', 4, int, bounds=(1, None)),
+		'nice': Setting('HASH_WORKER_NICE', 10, int, bounds=(0, 19)),
+		'chunk_kib': Setting('HASH_CHUNK_KIB', 1024, int, bounds=(4, 65536)),
+	},
+	'cdn': {
+		'url': Setting('CDNURL', 'pipeline-cdn.telemetry.svc.kube.local'),
+		'port': Setting('CDNPORT', 5000, int, bounds=(1, 65535)),
+		'sha_cache_file': Setting('SHA_CACHE_FILE', 'uploaded_shas.log'),
+		'sha_cache_size': Setting('SHA_CACHE_SIZE', 10000, int, bounds=(1, None)),
+		'sha_bloom_capacity': Setting('SHA_BLOOM_CAPACITY', 100000, int, bounds=(0, None)),
+	},
+	'uploads': {
+		'drain_order': Setting('UPLOAD_DRAIN_ORDER', 'oldest', choices=('oldest', 'newest'), lower=True),
+		'calibration_concurrency': Setting('UPLOAD_CALIBRATION_CONCURRENCY', 1, int, bounds=(1, 4)),
+		'clip_concurrency': Setting('UPLOAD_CLIP_CONCURRENCY', 2, int, bounds=(1, 16)),
+		'retry_max': Setting('UPLOAD_RETRY_MAX', 60.0, float, bounds=(1, None)),
+		'shaping': Setting('UPLOAD_SHAPING', True, bool),
+		'link_kbps': Setting('UPLOAD_LINK_KBPS', 0, int, bounds=(0, None)),
+		'headroom': Setting('UPLOAD_HEADROOM', 0.2, float, bounds=(0, 0.9)),
+		'min_kbps': Setting('UPLOAD_MIN_KBPS', 64, int, bounds=(8, None)),
+		'probe_interval': Setting('UPLOAD_PROBE_INTERVAL', 300.0, float, bounds=(10, None)),
+		'interface': Setting('UPLOAD_INTERFACE', None),
+		'egress_backlog_kib': Setting('UPLOAD_EGRESS_BACKLOG_KIB', 32, int, bounds=(1, None)),
+	},
+	'alerts': {
+		'linger': Setting('ALERT_LINGER', 1.0, float, bounds=(0, 60), live=True),
+		'max_batch': Setting('ALERT_MAX_BATCH', 100, int, bounds=(1, 10000), live=True),
+	},
+	'outbox': {
+		'path': Setting('OUTBOX_PATH', 'kafka_outbox.sqlite3'),
+		'max_rows': Setting('OUTBOX_MAX_ROWS', 100000, int, bounds=(1, None)),
+		'retry_max': Setting('OUTBOX_RETRY_MAX', 60.0, float, bounds=(1, None)),
+	},
+	'metrics': {
+		'port': Setting('METRICS_PORT', 9101, int, bounds=(0, 65535)),
+		'trace_window': Setting('TRACE_WINDOW', 200, int, bounds=(1, None)),
+		'trace_log_every': Setting('TRACE_LOG_EVERY', 10, int, bounds=(0, None), live=True),
+	},
+}
+
+##=============================================================================
+
+def coerce(name, setting, value):
+	""" Converts a raw (file or environment) value to the setting's type && checks it; raises ConfigError. """
+	if value is None or (isinstance(value, str) and value == '' and setting.kind is not str):
+		if setting.default is None:
+			return None
+		raise ConfigError(f"{name}: a value is required")
+	try:
+		if setting.kind is bool:
+			if isinstance(value, bool):
+				result = value
+			elif str(value).strip().lower() in TRUE_STRINGS:
+				result = True
+			elif str(value).strip().lower() in FALSE_STRINGS:
+				result = False
+			else:
+				raise ValueError(f"not a boolean: {value!r}")
+		elif setting.kind is int:
+			number = float(value) if isinstance(value, str) else value
+			if isinstance(number, bool) or (isinstance(number, float) and not number.is_integer()):
+				raise ValueError(f"not an integer: {value!r}")
+			result = int(number)
+		elif setting.kind is float:
+			if isinstance(value, bool):
+				raise ValueError(f"not a number: {value!r}")
+			result = float(value)
+		else:
+			result = str(value).strip()
+			if setting.lower:
+				result = result.lower()
+	except (TypeError, ValueError) as exc:
+		raise ConfigError(f"{name}: {exc}")
+	if setting.pattern is not None and not re.match(setting.pattern, result):
+		raise ConfigError(f"{name}: {result!r} does not match {setting.pattern}")
+	if setting.choices is not None and result not in setting.choices:
+		raise ConfigError(f"{name}: {result!r} is not one of {', '.join(map(str, setting.choices))}")
+	if setting.bounds is not None:
+		lo, hi = setting.bounds
+		if (lo is not None and result < lo) or (hi is not None and result > hi):
+			raise ConfigError(f"{name}: {result} is outside [{lo}, {hi}]")
+	return result
+
+
+def read_file(path):
+	""" Returns the YAML file's contents as {section: {key: value}} ({} if there is no file); raises ConfigError. """
+	if not path or not os.path.isfile(path):
+		return {}
+	if yaml is None:
+		raise ImportError(f"PyYAML is not installed; ignoring '{path}'")
+	try:
+		with open(path) as f:
+			data = yaml.safe_load(f)
+	except (OSError, yaml.YAMLError) as exc:
+		raise ConfigError(f"{path}: {exc}")
+	if data is None:
+		return {}
+	if not isinstance(data, dict) or not all(isinstance(v, dict) or v is None for v in data.values()):
+		raise ConfigError(f"{path}: expected a mapping of sections to mappings of settings")
+	return {section: (values or {}) for section, values in data.items()}
+
+
+class SensorConfig():
+	"""
+	Immutable, validated settings; look them up as config['section.key'].
+	"""
+	def __init__(self, values, path=None, warnings=()):
+		self.__values = dict(values)
+		self.path = path
+		self.warnings = tuple(warnings)
+
+	def __getitem__(self, name):
+		return self.__values[name]
+
+	def __iter__(self):
+		return iter(self.__values)
+
+	def as_dict(self):
+		""" Returns the settings nested as {section: {key: value}}. """
+		nested = {}
+		for name, value in self.__values.items():
+			section, key = name.split('.', 1)
+			nested.setdefault(section, {})[key] = value
+		return nested
+
+	def diff(self, other):
+		""" Returns {'section.key': new value} for every setting that differs in 'other'. """
+		return {name: other[name] for name in self.__values if other[name] != self.__values[name]}
+
+	@staticmethod
+	def is_live(name):
+		section, key = name.split('.', 1)
+		return SCHEMA[section][key].live
+
+
+def load_config(path=None, environ=None):
+	""" Parses && validates the file (if any) plus environment overrides; raises ConfigError listing every problem. """
+	environ = os.environ if environ is None else environ
+	errors, warnings = [], []
+	try:
+		file_values = read_file(path)
+	except ImportError as exc:
+		warnings.append(str(exc))
+		file_values = {}
+	except ConfigError as exc:
+		errors.append(str(exc))
+		file_values = {}
+	for section, values in file_values.items():
+		if section not in SCHEMA:
+			errors.append(f"Unknown section '{section}'")
+			continue
+		for key in values:
+			if key not in SCHEMA[section]:
+				errors.append(f"Unknown setting '{section}.{key}'")
+	values = {}
+	for section, settings in SCHEMA.items():
+		for key, setting in settings.items():
+			name = f"{section}.{key}"
+			if setting.env in environ:
+				raw, origin = environ[setting.env], f"{name} (${setting.env})"
+			elif key in file_values.get(section, {}):
+				raw, origin = file_values[section][key], name
+			else:
+				values[name] = setting.default
+				continue
+			try:
+				values[name] = coerce(origin, setting, raw)
+			except ConfigError as exc:
+				errors.append(str(exc))
+	if errors:
+		raise ConfigError(f"Invalid configuration{f' in {path}' if path else ''}:\n  " + '\n  '.join(errors))
+	return SensorConfig(values, path, warnings)
+
+
+_CONFIG_CACHE = {}
+
+def get_config(path=None, refresh=False):
+	""" Returns the cached configuration for 'path', parsing it (&& reading the environment) on first use. """
+	key = os.path.abspath(path) if path else None
+	if refresh or key not in _CONFIG_CACHE:
+		_CONFIG_CACHE[key] = load_config(path)
+	return _CONFIG_CACHE[key]
+
+
+##=============================================================================
+## Hot reload
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+INOTIFY_EVENT = struct.Struct('iIII')   ## wd, mask, cookie, len (followed by a NUL-padded name)
+
+
+class ConfigWatcher():
+	"""
+	Watches the config file's directory (so editors that replace the file are seen too) && calls
+	on_change(old config, new config, changed {'section.key': value}) whenever the file's settings change. Invalid
+	files are logged and ignored, keeping the previous configuration. Falls back to polling the file's mtime every
+	'poll_period' seconds where inotify is unavailable.
+	"""
+	def __init__(self, config, on_change, logger=None, debounce=0.25, poll_period=2.0):
+		self.config = config
+		self.path = os.path.abspath(config.path)
+		self.on_change = on_change
+		self.logger = logger
+		self.debounce = debounce
+		self.poll_period = poll_period
+		self.__stop = threading.Event()
+		self.__thread = None
+
+	def start(self):
+		self.__thread = threading.Thread(target=self.__run, name='config_watcher', daemon=True)
+		self.__thread.start()
+
+	def stop(self):
+		self.__stop.set()
+
+	def __log(self, level, msg):
+		if self.logger:
+			getattr(self.logger, level)(f"[ConfigWatcher]  {msg}")
+		else:
+			print(f"[ConfigWatcher]  {msg}")
+
+	def reload(self):
+		""" Re-reads the file; returns the changed settings (empty if none, or if the new file is invalid). """
+		try:
+			new_config = get_config(self.config.path, refresh=True)
+		except ConfigError as exc:
+			self.__log('error', f"Keeping the current configuration: {exc}")
+			return {}
+		changed = self.config.diff(new_config)
+		old_config, self.config = self.config, new_config
+		if changed:
+			self.__log('info', f"'{self.path}' changed: {changed}")
+			try:
+				self.on_change(old_config, new_config, changed)
+			except Exception as exc:
+				self.__log('error', f"Applying the new configuration failed: {exc}")
+		return changed
+
+	@staticmethod
+	def inotify_fd(directory):
+		""" Returns a non-blocking inotify descriptor watching 'directory', or None if inotify is unavailable. """
+		try:
+			libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+			fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+		except (OSError, AttributeError):
+			return None
+		if fd < 0:
+			return None
+		if libc.inotify_add_watch(fd, directory.encode(), IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_MODIFY) < 0:
+			os.close(fd)
+			return None
+		return fd
+
+	def __events_for_file(self, fd):
+		""" Drains pending inotify events; returns True if any concerned the config file. """
+		name = os.path.basename(self.path).encode()
+		touched = False
+		while True:
+			try:
+				data = os.read(fd, 4096)
+			except OSError as exc:
+				if exc.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+					return touched
+				raise
+			offset = 0
+			while offset + INOTIFY_EVENT.size <= len(data):
+				_, _, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+				start = offset + INOTIFY_EVENT.size
+				if data[start:start + length].rstrip(b'\0') == name:
+					touched = True
+				offset = start + length
+
+	def __run(self):
+		fd = self.inotify_fd(os.path.dirname(self.path))
+		if fd is None:
+			self.__log('info', f"inotify unavailable; polling '{self.path}' every {self.poll_period} s")
+			return self.__poll()
+		try:
+			while not self.__stop.is_set():
+				readable, _, _ = select.select([fd], [], [], 1.0)
+				if readable and self.__events_for_file(fd):
+					time.sleep(self.debounce)   ## Let the writer finish (e.g., editors writing in several steps)
+					self.__events_for_file(fd)
+					self.reload()
+		finally:
+			os.close(fd)
+
+	def __poll(self):
+		def mtime():
+			try:
+				return os.stat(self.path).st_mtime_ns
+			except OSError:
+				return None
+		last = mtime()
+		while not self.__stop.wait(self.poll_period):
+			current = mtime()
+			if current != last:
+				last = current
+				self.reload()
+
+
+##=============================================================================
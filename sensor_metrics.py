@@ -0,0 +1,204 @@
+import json
+import threading
+from bisect import bisect_left
+from multiprocessing import Value, Array
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+"""
+Minimal Prometheus-style metrics (counters, gauges, histograms) that can be shared across the sensor's processes.
+
+Every metric is backed by multiprocessing shared memory, so it must be created in the parent process *before* the
+audio/hash/posting processes are forked; updates from any process are then visible to the HTTP endpoint that
+MetricsRegistry.serve() runs in the parent. Each update costs one shared-memory lock acquisition (~1 us on a Pi).
+
+			$  curl http://<sensor IP>:9101/metrics
+"""
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+##=============================================================================
+
+def _format_labels(labels):
+	if not labels:
+		return ''
+	return '{' + ','.join(f'{k}="{str(v)}"' for k, v in sorted(labels.items())) + '}'
+
+
+def _format_value(value):
+	if value != value:
+		return 'NaN'
+	if value in (float('inf'), float('-inf')):
+		return '+Inf' if value > 0 else '-Inf'
+	return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter():
+	""" Monotonically increasing value. """
+	kind = 'counter'
+
+	def __init__(self, name, documentation, labels=None):
+		self.name = name
+		self.documentation = documentation
+		self.labels = labels or {}
+		self.__value = Value('d', 0.0)
+
+	def inc(self, amount=1.0):
+		with self.__value.get_lock():
+			self.__value.value += amount
+
+	@property
+	def value(self):
+		return self.__value.value
+
+	def samples(self):
+		yield self.name, self.labels, self.value
+
+
+class Gauge():
+	""" Value that can go up and down; optionally computed by a callback at scrape time (in the serving process). """
+	kind = 'gauge'
+
+	def __init__(self, name, documentation, labels=None, callback=None):
+		self.name = name
+		self.documentation = documentation
+		self.labels = labels or {}
+		self.callback = callback
+		self.__value = Value('d', 0.0)
+
+	def set(self, value):
+		self.__value.value = value
+
+	def inc(self, amount=1.0):
+		with self.__value.get_lock():
+			self.__value.value += amount
+
+	@property
+	def value(self):
+		if self.callback is not None:
+			try:
+				return float(self.callback())
+			except Exception:
+				return float('nan')
+		return self.__value.value
+
+	def samples(self):
+		yield self.name, self.labels, self.value
+
+
+class Histogram():
+	""" Cumulative-bucket histogram (with _sum and _count series). """
+	kind = 'histogram'
+
+	def __init__(self, name, documentation, labels=None, buckets=DEFAULT_BUCKETS):
+		self.name = name
+		self.documentation = documentation
+		self.labels = labels or {}
+		self.buckets = tuple(sorted(buckets))
+		self.__counts = Array('d', len(self.buckets) + 1)   ## Last slot is the +Inf bucket
+		self.__sum = Value('d', 0.0, lock=False)
+
+	def observe(self, value):
+		idx = bisect_left(self.buckets, value)
+		with self.__counts.get_lock():
+			self.__counts[idx] += 1
+			self.__sum.value += value
+
+	@property
+	def count(self):
+		return sum(self.__counts[:])
+
+	def samples(self):
+		with self.__counts.get_lock():
+			counts = self.__counts[:]
+			total = self.__sum.value
+		cumulative = 0
+		for bound, n in zip(self.buckets + (float('inf'),), counts):
+			cumulative += n
+			yield f'{self.name}_bucket', dict(self.labels, le=_format_value(bound)), cumulative
+		yield f'{self.name}_sum', self.labels, total
+		yield f'{self.name}_count', self.labels, cumulative
+
+
+##=============================================================================
+
+class MetricsRegistry():
+	"""
+	Creates and renders metrics; 'prefix' is prepended to every metric name and 'const_labels' (e.g., room and
+	microphone number) are attached to every series.
+	"""
+	def __init__(self, prefix='', const_labels=None):
+		self.prefix = prefix
+		self.const_labels = const_labels or {}
+		self.__metrics = []
+		self.__server = None
+
+	def __full_name(self, name):
+		return f'{self.prefix}_{name}' if self.prefix else name
+
+	def __register(self, metric):
+		self.__metrics.append(metric)
+		return metric
+
+	def counter(self, name, documentation, labels=None):
+		return self.__register(Counter(self.__full_name(name), documentation, dict(self.const_labels, **(labels or {}))))
+
+	def gauge(self, name, documentation, labels=None, callback=None):
+		return self.__register(Gauge(self.__full_name(name), documentation, dict(self.const_labels, **(labels or {})), callback))
+
+	def histogram(self, name, documentation, labels=None, buckets=DEFAULT_BUCKETS):
+		return self.__register(Histogram(self.__full_name(name), documentation, dict(self.const_labels, **(labels or {})), buckets))
+
+	def render(self):
+		""" Returns all metrics in the Prometheus text exposition format (version 0.0.4). """
+		lines = []
+		seen = set()
+		for metric in self.__metrics:
+			if metric.name not in seen:
+				seen.add(metric.name)
+				lines.append(f'# HELP {metric.name} {metric.documentation}')
+				lines.append(f'# TYPE {metric.name} {metric.kind}')
+			for name, labels, value in metric.samples():
+				lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+		return '\n'.join(lines) + '\n'
+
+	def serve(self, port, addr='0.0.0.0', json_routes=None):
+		"""
+		Starts a daemon thread serving GET /metrics; 'json_routes' may map extra paths (e.g., '/diagnostics')
+		to callables returning JSON-serializable objects. Returns the HTTP server instance.
+		"""
+		registry = self
+		json_routes = json_routes or {}
+
+		class MetricsHandler(BaseHTTPRequestHandler):
+			def log_message(self, fmt, *args):
+				pass
+
+			def do_GET(self):
+				path = self.path.split('?')[0]
+				if path in json_routes:
+					body = json.dumps(json_routes[path](), default=str).encode()
+					content_type = 'application/json'
+				elif path in ('/', '/metrics'):
+					body = registry.render().encode()
+					content_type = 'text/plain; version=0.0.4; charset=utf-8'
+				else:
+					self.send_error(404)
+					return
+				self.send_response(200)
+				self.send_header('Content-Type', content_type)
+				self.send_header('Content-Length', str(len(body)))
+				self.end_headers()
+				self.wfile.write(body)
+
+		self.__server = ThreadingHTTPServer((addr, port), MetricsHandler)
+		self.__server.daemon_threads = True
+		threading.Thread(target=self.__server.serve_forever, name='metrics_http', daemon=True).start()
+		return self.__server
+
+	def shutdown(self):
+		if self.__server is not None:
+			self.__server.shutdown()
+			self.__server = None
+
+
+##=============================================================================
@@ -0,0 +1,151 @@
+import os
+import math
+import hashlib
+import tempfile
+from collections import OrderedDict
+
+"""
+Persistent record of the clip SHA-1s the CDN has already confirmed, so that a clip re-queued after a crash (e.g.,
+between a confirmed upload and its os.remove()) is not uploaded again.
+
+	- An LRU of the most recent 'capacity' SHAs, persisted as an append-only log (one SHA per line) that is compacted
+	  whenever it grows to twice the capacity. A hit means "definitely uploaded".
+	- An optional Bloom filter remembering every SHA ever added (including those evicted from the LRU), persisted
+	  every 'bloom_save_every' additions. A hit only means "probably uploaded" --> confirm with the CDN first.
+
+Only the posting process writes to the cache.
+"""
+
+CONFIRMED = 'confirmed'
+PROBABLE = 'probable'
+
+##=============================================================================
+
+class BloomFilter():
+	""" Fixed-size Bloom filter over hex digests (or any string), sized for 'capacity' items at 'error_rate'. """
+	def __init__(self, capacity, error_rate=0.001):
+		self.capacity = capacity
+		self.error_rate = error_rate
+		self.num_bits = max(8, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))))
+		self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+		self.bits = bytearray((self.num_bits + 7) // 8)
+
+	def __indexes(self, key):
+		## Double hashing (Kirsch-Mitzenmacher); SHA-1 hex digests already are uniformly distributed
+		try:
+			h1, h2 = int(key[:16], 16), int(key[16:32], 16) | 1
+		except ValueError:
+			digest = hashlib.sha1(key.encode()).hexdigest()
+			h1, h2 = int(digest[:16], 16), int(digest[16:32], 16) | 1
+		return ((h1 + i * h2) % self.num_bits for i in range(self.num_hashes))
+
+	def add(self, key):
+		for idx in self.__indexes(key):
+			self.bits[idx >> 3] |= 1 << (idx & 7)
+
+	def __contains__(self, key):
+		return all(self.bits[idx >> 3] & (1 << (idx & 7)) for idx in self.__indexes(key))
+
+
+class ShaCache():
+	"""
+	Bounded, persistent set of CDN-confirmed SHAs; lookup() returns CONFIRMED, PROBABLE (Bloom filter only) or None.
+	"""
+	def __init__(self, path, capacity=10000, bloom_capacity=0, bloom_error_rate=0.001, bloom_save_every=100, fsync=True):
+		self.path = path
+		self.capacity = capacity
+		self.bloom_save_every = bloom_save_every
+		self.fsync = fsync
+		self.bloom = BloomFilter(bloom_capacity, bloom_error_rate) if bloom_capacity > 0 else None
+		self.__lru = OrderedDict()
+		self.__log_lines = 0
+		self.__unsaved = 0
+		self.__load()
+
+	@property
+	def bloom_path(self):
+		return f"{self.path}.bloom"
+
+	def __len__(self):
+		return len(self.__lru)
+
+	def __load(self):
+		if self.bloom is not None:
+			try:
+				with open(self.bloom_path, 'rb') as f:
+					bits = f.read()
+				if len(bits) == len(self.bloom.bits):   ## Otherwise the filter was resized --> rebuilt from the log only
+					self.bloom.bits[:] = bits
+			except OSError:
+				pass
+		try:
+			with open(self.path) as f:
+				for line in f:
+					sha = line.strip()
+					if sha:
+						self.__remember(sha)
+						self.__log_lines += 1
+		except OSError:
+			pass
+
+	def __remember(self, sha):
+		self.__lru[sha] = None
+		self.__lru.move_to_end(sha)
+		while len(self.__lru) > self.capacity:
+			self.__lru.popitem(last=False)
+		if self.bloom is not None:
+			self.bloom.add(sha)
+
+	def lookup(self, sha):
+		if sha in self.__lru:
+			self.__lru.move_to_end(sha)
+			return CONFIRMED
+		if self.bloom is not None and sha in self.bloom:
+			return PROBABLE
+		return None
+
+	def add(self, sha):
+		""" Records a CDN-confirmed SHA (durably, before returning). """
+		self.__remember(sha)
+		directory = os.path.dirname(self.path)
+		if directory:
+			os.makedirs(directory, exist_ok=True)
+		with open(self.path, 'a') as f:
+			f.write(f"{sha}\n")
+			f.flush()
+			if self.fsync:
+				os.fsync(f.fileno())
+		self.__log_lines += 1
+		self.__unsaved += 1
+		if self.__log_lines >= 2 * self.capacity:
+			self.compact()
+		elif self.bloom is not None and self.__unsaved >= self.bloom_save_every:
+			self.save_bloom()
+
+	def __write_atomic(self, path, data):
+		fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix='.sha_cache.', suffix='.tmp')
+		try:
+			with os.fdopen(fd, 'wb') as f:
+				f.write(data)
+				f.flush()
+				if self.fsync:
+					os.fsync(f.fileno())
+			os.replace(tmp_path, path)
+		except BaseException:
+			if os.path.exists(tmp_path):
+				os.remove(tmp_path)
+			raise
+
+	def save_bloom(self):
+		if self.bloom is not None:
+			self.__write_atomic(self.bloom_path, bytes(self.bloom.bits))
+		self.__unsaved = 0
+
+	def compact(self):
+		""" Rewrites the log with only the SHAs currently in the LRU (oldest first). """
+		self.save_bloom()   ## Evicted SHAs must be in the saved filter before they leave the log
+		self.__write_atomic(self.path, ''.join(f"{sha}\n" for sha in self.__lru).encode())
+		self.__log_lines = len(self.__lru)
+
+
+##=============================================================================
@@ -0,0 +1,174 @@
+import os
+import stat
+import time
+import errno
+import tempfile
+import threading
+import numpy as np
+
+"""
+Synthetic, ALSA-free audio source for running (and benchmarking) the full capture pipeline without a Yeti attached.
+
+A background thread generates 16-bit little-endian PCM (a sine tone, white noise, or a looped WAV file) at real-time
+pace and writes it into a named pipe; VLCAudioStreamer reads that pipe as its input via VLC's 'rawaud' demuxer:
+
+			$  cvlc --demux=rawaud --rawaud-channels=2 --rawaud-samplerate=44100 --rawaud-fourcc=s16l file:///tmp/yeti_synth_0.pcm ...
+"""
+
+SYNTHETIC_KINDS = ('tone', 'noise', 'file')
+
+##=============================================================================
+
+class SyntheticAudioSource():
+	"""
+	Real-time PCM generator feeding a FIFO; exposes the MRL and demuxer options needed for VLC to read it.
+	"""
+	def __init__(self, name, kind='tone', samplerate=44100, channels=2, frequency=440.0, amplitude=0.25,
+				source_file=None, fifo_path=None, block_seconds=0.02, logger=None):
+		if kind not in SYNTHETIC_KINDS:
+			raise ValueError(f"Unknown synthetic source kind '{kind}' (expected one of {SYNTHETIC_KINDS})")
+		if kind == 'file' and not source_file:
+			raise ValueError("A 'file' synthetic source requires a source_file")
+		self.name = name
+		self.kind = kind
+		self.samplerate = int(samplerate)
+		self.channels = int(channels)
+		self.frequency = float(frequency)
+		self.amplitude = float(amplitude)
+		self.source_file = source_file
+		self.fifo_path = fifo_path or os.path.join(tempfile.gettempdir(), f"{name}.pcm")
+		self.block_frames = max(1, int(self.samplerate * block_seconds))
+		self.synth_log = logger
+		self.frames_written = 0
+		self.__loop_data = None
+		self.__loop_pos = 0
+		self.__rng = np.random.default_rng()
+		self.__stop_event = threading.Event()
+		self.__thread = None
+
+
+	@property
+	def mrl(self):
+		""" The MRL VLC should open as its audio input. """
+		return f"file://{self.fifo_path}"
+
+
+	@property
+	def vlc_input_opts(self):
+		""" VLC demuxer options describing the raw PCM written to the FIFO. """
+		return (f"--demux=rawaud --rawaud-channels={self.channels} "
+				f"--rawaud-samplerate={self.samplerate} --rawaud-fourcc=s16l")
+
+
+	@property
+	def is_running(self):
+		return self.__thread is not None and self.__thread.is_alive()
+
+
+	def log(self, msg, level='info'):
+		if self.synth_log:
+			getattr(self.synth_log, level)(msg)
+		else:
+			print(msg)
+
+
+	def start(self):
+		""" Creates the FIFO (if needed) and starts the generator thread; safe to call repeatedly. """
+		if self.is_running:
+			return
+		if os.path.exists(self.fifo_path) and not stat.S_ISFIFO(os.stat(self.fifo_path).st_mode):
+			os.remove(self.fifo_path)
+		if not os.path.exists(self.fifo_path):
+			os.mkfifo(self.fifo_path)
+		self.__stop_event.clear()
+		self.__thread = threading.Thread(target=self.__run, name=f"{self.name}_generator", daemon=True)
+		self.__thread.start()
+		self.log(f"[{self.name}]  Synthetic '{self.kind}' source started ({self.samplerate} Hz, {self.channels} ch) --> {self.fifo_path}")
+
+
+	def stop(self):
+		self.__stop_event.set()
+		if self.__thread is not None:
+			self.__thread.join(timeout=2)
+		self.__thread = None
+
+
+	def generate(self, n_frames):
+		""" Returns the next 'n_frames' of audio as an int16 array of shape (n_frames, channels). """
+		if self.kind == 'tone':
+			t = (self.frames_written + np.arange(n_frames)) / self.samplerate
+			mono = self.amplitude * np.sin(2.0 * np.pi * self.frequency * t)
+			block = np.repeat(mono[:, None], self.channels, axis=1)
+		elif self.kind == 'noise':
+			block = self.amplitude * self.__rng.standard_normal((n_frames, self.channels))
+		else:
+			data = self.__get_loop_data()
+			idx = (self.__loop_pos + np.arange(n_frames)) % len(data)
+			self.__loop_pos = (self.__loop_pos + n_frames) % len(data)
+			block = data[idx]
+		return (np.clip(block, -1.0, 1.0) * 32767.0).astype('<i2')
+
+
+	def __get_loop_data(self):
+		""" Lazily loads the source WAV file, resampled and channel-mapped to this source's format. """
+		if self.__loop_data is None:
+			from audio_analysis import load_wav, resample_linear
+			samples, rate = load_wav(self.source_file)
+			cols = [resample_linear(samples[:, ch % samples.shape[1]], rate, self.samplerate) for ch in range(self.channels)]
+			self.__loop_data = np.stack(cols, axis=1)
+			if len(self.__loop_data) == 0:
+				raise ValueError(f"Synthetic source file '{self.source_file}' contains no audio")
+		return self.__loop_data
+
+
+	def __open_fifo(self):
+		""" Waits (without blocking forever) for a reader to open the FIFO; returns a write fd, or None if stopped. """
+		while not self.__stop_event.is_set():
+			try:
+				fd = os.open(self.fifo_path, os.O_WRONLY | os.O_NONBLOCK)
+			except OSError as exc:
+				if exc.errno != errno.ENXIO:    ## ENXIO --> no reader yet
+					raise
+				time.sleep(0.05)
+				continue
+			os.set_blocking(fd, True)
+			return fd
+		return None
+
+
+	def __run(self):
+		""" Generator thread: any failure (other than the reader going away) is logged and stops the source. """
+		try:
+			self.__feed_fifo()
+		except Exception as exc:
+			self.log(f"[{self.name}]  Synthetic source failed, stopping it: {exc!r}", level='error')
+		finally:
+			self.__stop_event.set()
+
+
+	def __feed_fifo(self):
+		block_period = self.block_frames / self.samplerate
+		while not self.__stop_event.is_set():
+			fd = self.__open_fifo()
+			if fd is None:
+				break
+			next_deadline = time.monotonic()
+			try:
+				while not self.__stop_event.is_set():
+					block = self.generate(self.block_frames).tobytes()   ## Generation errors (e.g., a bad source_file) are fatal
+					os.write(fd, block)
+					self.frames_written += self.block_frames
+					## Pace output at real time so downstream timing behaves like a live device
+					next_deadline += block_period
+					delay = next_deadline - time.monotonic()
+					if delay > 0:
+						time.sleep(delay)
+					elif delay < -1.0:
+						next_deadline = time.monotonic()   ## Fell badly behind (e.g., reader stalled); resync
+			except BrokenPipeError:
+				self.log(f"[{self.name}]  FIFO reader went away; waiting for it to reopen...")
+			finally:
+				os.close(fd)
+
+
+##=============================================================================
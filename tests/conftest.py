@@ -0,0 +1,79 @@
+import os
+import sys
+import struct
+import pytest
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import alert_batcher
+import upload_shaper
+import upload_scheduler
+
+"""
+Shared fixtures: the sensor's modules are imported from the repository root, and 'clock' replaces the 'time'
+module of the timing-dependent modules with a manually advanced clock, so linger windows, retry backoff and
+token bucket waits are tested without sleeping. 'make_wav' writes WAV files the way the capture pipeline does.
+"""
+
+##=============================================================================
+
+def write_wav(path, samples, samplerate, format_tag=1, bits=16, data_size=None):
+	"""
+	Writes a (frames, channels) or 1-D float array as a 16-bit PCM (or, with format_tag 3 && bits 32, float) WAV;
+	'data_size' overrides the data chunk's recorded size (e.g., 0 for a clip whose VLC writer was killed).
+	'samples' may also be raw payload bytes (with any format_tag, e.g., 0x0050 for mpga).
+	"""
+	if isinstance(samples, bytes):
+		payload, channels, block_align = samples, 2, 0
+	else:
+		samples = np.asarray(samples, dtype=np.float64)
+		if samples.ndim == 1:
+			samples = samples[:, None]
+		channels = samples.shape[1]
+		if format_tag == 3:
+			payload = samples.astype('<f4').tobytes()
+		else:
+			payload = (np.clip(samples, -1.0, 1.0) * 32767.0).round().astype('<i2').tobytes()
+		block_align = channels * bits // 8
+	byte_rate = block_align * samplerate if block_align else 32000
+	size = len(payload) if data_size is None else data_size
+	header = struct.pack('<4sI4s4sIHHIIHH4sI', b'RIFF', 36 + size, b'WAVE', b'fmt ', 16, format_tag, channels,
+						 samplerate, byte_rate, block_align, bits, b'data', size)
+	with open(path, 'wb') as f:
+		f.write(header + payload)
+	return str(path)
+
+
+@pytest.fixture
+def make_wav(tmp_path):
+	def make(name, samples, samplerate=16000, **kwargs):
+		return write_wav(tmp_path / name, samples, samplerate, **kwargs)
+	return make
+
+
+class FakeClock():
+	""" Stand-in for the 'time' module: monotonic() only moves on advance() or sleep(). """
+	def __init__(self, start=1000.0):
+		self.now = start
+		self.slept = 0.0
+
+	def monotonic(self):
+		return self.now
+
+	def sleep(self, seconds):
+		self.now += seconds
+		self.slept += seconds
+
+	def advance(self, seconds):
+		self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+	fake = FakeClock()
+	for module in (alert_batcher, upload_scheduler, upload_shaper):
+		monkeypatch.setattr(module, 'time', fake)
+	return fake
+
+
+##=============================================================================
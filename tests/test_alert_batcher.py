@@ -0,0 +1,79 @@
+import pytest
+from alert_batcher import AlertBatcher
+
+##=============================================================================
+
+class Recorder():
+	""" Collects what the batcher sends, as ('one', item) or ('many', [items]). """
+	def __init__(self):
+		self.sent = []
+
+	def one(self, item):
+		self.sent.append(('one', item))
+
+	def many(self, items):
+		self.sent.append(('many', list(items)))
+
+
+@pytest.fixture
+def recorder():
+	return Recorder()
+
+
+def test_single_item_is_sent_unbatched_after_the_linger(clock, recorder):
+	batcher = AlertBatcher(recorder.one, recorder.many, linger=1.0)
+	batcher.add('a')
+	batcher.poll()
+	assert recorder.sent == [] and len(batcher) == 1
+	assert batcher.time_to_flush() == pytest.approx(1.0)
+
+	clock.advance(1.0)
+	batcher.poll()
+	assert recorder.sent == [('one', 'a')]
+	assert len(batcher) == 0 and batcher.time_to_flush() is None
+
+
+def test_linger_window_starts_at_the_first_item(clock, recorder):
+	batcher = AlertBatcher(recorder.one, recorder.many, linger=1.0)
+	batcher.add('a')
+	clock.advance(0.6)
+	batcher.add('b')
+	assert batcher.time_to_flush() == pytest.approx(0.4)
+	clock.advance(0.4)
+	batcher.poll()
+	assert recorder.sent == [('many', ['a', 'b'])]
+
+
+def test_full_batch_is_sent_at_once(clock, recorder):
+	batcher = AlertBatcher(recorder.one, recorder.many, linger=60.0, max_batch=3)
+	for item in 'abcd':
+		batcher.add(item)
+	assert recorder.sent == [('many', ['a', 'b', 'c'])]
+	assert len(batcher) == 1
+
+
+def test_zero_linger_disables_batching(clock, recorder):
+	batcher = AlertBatcher(recorder.one, recorder.many, linger=0)
+	batcher.add('a')
+	batcher.add('b')
+	assert recorder.sent == [('one', 'a'), ('one', 'b')]
+
+
+def test_bypass_flushes_pending_first(clock, recorder):
+	batcher = AlertBatcher(recorder.one, recorder.many, linger=60.0,
+						   bypass=lambda item: item.startswith('calibration'))
+	batcher.add('a')
+	batcher.add('b')
+	batcher.add('calibration')
+	assert recorder.sent == [('many', ['a', 'b']), ('one', 'calibration')]
+	assert len(batcher) == 0
+
+
+def test_flush_when_empty_sends_nothing(clock, recorder):
+	batcher = AlertBatcher(recorder.one, recorder.many)
+	batcher.flush()
+	batcher.poll()
+	assert recorder.sent == []
+
+
+##=============================================================================
@@ -0,0 +1,201 @@
+import sqlite3
+import threading
+import multiprocessing
+from alert_outbox import AlertOutbox
+from microphone import MicrophoneSensor
+
+##=============================================================================
+
+def put_in_child(outbox):
+	outbox.put('commander', {"title": 'from child'})
+
+
+class Counter():
+	def __init__(self):
+		self.value = 0
+
+	def inc(self, amount=1):
+		self.value += amount
+
+
+class Logger():
+	def __init__(self):
+		self.lines = []
+
+	def error(self, msg, **fields):
+		self.lines.append(msg)
+
+	def warning(self, msg, **fields):
+		self.lines.append(msg)
+
+
+class Stop():
+	""" outbox_stop stand-in: records the backoff waits instead of sleeping. """
+	def __init__(self):
+		self.waits = []
+		self.stopped = False
+
+	def is_set(self):
+		return self.stopped
+
+	def wait(self, seconds):
+		self.waits.append(seconds)
+
+
+class Idle():
+	""" outbox_event stand-in: the drain loop stops once the outbox is empty. """
+	def __init__(self, stop):
+		self.stop = stop
+
+	def clear(self):
+		pass
+
+	def wait(self, timeout=None):
+		self.stop.stopped = True
+
+
+class Presentation():
+	""" Fails the first 'failures' sends; rejects messages titled 'invalid' like the serializer's validation. """
+	def __init__(self, sent, failures=0):
+		self.sent = sent
+		self.failures = failures
+
+	def send_message(self, msg, recipient):
+		if msg.get("title") == 'invalid':
+			raise ValueError('messageId is required')
+		if self.failures:
+			self.failures -= 1
+			raise RuntimeError('broker unavailable')
+		self.sent.append(msg["title"])
+
+	def shutdown(self):
+		pass
+
+
+class Drainer():
+	""" The attributes MicrophoneSensor.drain_outbox() uses, with connects failing 'connect_failures' times. """
+	def __init__(self, outbox, connect_failures=0, send_failures=0, retry_max=60.0):
+		self.alert_outbox = outbox
+		self.outbox_stop = Stop()
+		self.outbox_event = Idle(self.outbox_stop)
+		self.outbox_retry_max = retry_max
+		self.presentation_layer = None
+		self.presentation_lock = threading.Lock()
+		self.my_logger = Logger()
+		self.m_kafka_dead_letters = Counter()
+		self.m_kafka_send_failures = Counter()
+		self.sent = []
+		self.connect_failures = connect_failures
+		self.send_failures = send_failures
+
+	def connect_to_presentation(self):
+		if self.connect_failures:
+			self.connect_failures -= 1
+			return False
+		self.presentation_layer = Presentation(self.sent, self.send_failures)
+		self.send_failures = 0
+		return True
+
+	def disconnect_presentation(self):
+		self.presentation_layer = None
+
+	def drain(self):
+		MicrophoneSensor.drain_outbox(self)
+
+
+def make_outbox(tmp_path, **kwargs):
+	return AlertOutbox(str(tmp_path / 'outbox' / 'kafka.sqlite3'), **kwargs)
+
+
+def test_fifo_order_and_persistence(tmp_path):
+	outbox = make_outbox(tmp_path)
+	for title in 'abc':
+		outbox.put('commander', {"title": title})
+	assert [msg["title"] for _, _, msg in outbox.peek()] == ['a', 'b', 'c']
+	reopened = make_outbox(tmp_path)
+	assert [(recipient, msg) for _, recipient, msg in reopened.peek(limit=2)] == [('commander', {"title": 'a'}), ('commander', {"title": 'b'})]
+
+
+def test_heartbeats_are_coalesced(tmp_path):
+	outbox = make_outbox(tmp_path)
+	outbox.put('commander', {"title": 'alert'})
+	for idx in range(5):
+		outbox.put('commander', {"title": 'heartbeat', "n": idx}, coalesce_key='heartbeat')
+	outbox.put('commander', {"title": 'alert 2'})
+	assert [msg.get("n") for _, _, msg in outbox.peek()] == [None, 4, None]
+
+
+def test_oldest_messages_are_trimmed_and_counted(tmp_path):
+	outbox = make_outbox(tmp_path, max_rows=3)
+	for idx in range(5):
+		outbox.put('commander', {"n": idx})
+	assert [msg["n"] for _, _, msg in outbox.peek()] == [2, 3, 4]
+	assert outbox.dropped == 2 and len(outbox) == 3
+
+
+def test_delete_many(tmp_path):
+	outbox = make_outbox(tmp_path)
+	for idx in range(4):
+		outbox.put('commander', {"n": idx})
+	ids = [row_id for row_id, _, _ in outbox.peek()]
+	outbox.delete_many(ids[:3])
+	outbox.delete_many([])
+	assert [msg["n"] for _, _, msg in outbox.peek()] == [3]
+
+
+def test_dead_letter_moves_the_message(tmp_path):
+	outbox = make_outbox(tmp_path)
+	outbox.put('commander', {"title": 'bad'})
+	outbox.put('commander', {"title": 'good'})
+	bad_id = outbox.peek()[0][0]
+	outbox.dead_letter(bad_id, ValueError('missing messageId'))
+	assert [msg["title"] for _, _, msg in outbox.peek()] == ['good']
+	with sqlite3.connect(outbox.path) as db:
+		assert db.execute('SELECT id, reason FROM dead_letter').fetchall() == [(bad_id, 'missing messageId')]
+
+
+def test_outbox_created_before_fork(tmp_path):
+	outbox = make_outbox(tmp_path)
+	outbox.put('commander', {"title": 'from parent'})
+	child = multiprocessing.Process(target=put_in_child, args=(outbox,))
+	child.start()
+	child.join(timeout=10)
+	assert [msg["title"] for _, _, msg in outbox.peek()] == ['from parent', 'from child']
+
+
+def test_drain_backs_off_exponentially_up_to_the_cap(tmp_path):
+	outbox = make_outbox(tmp_path)
+	outbox.put('commander', {"title": 'a'})
+	drainer = Drainer(outbox, connect_failures=4, send_failures=1, retry_max=5.0)
+	drainer.drain()
+	assert drainer.outbox_stop.waits == [1.0, 2.0, 4.0, 5.0, 5.0]   ## 4 failed connects, then a failed send
+	assert drainer.sent == ['a'] and len(outbox) == 0
+	assert drainer.m_kafka_send_failures.value == 1
+
+
+def test_drain_resets_the_backoff_after_a_delivery(tmp_path):
+	outbox = make_outbox(tmp_path)
+	outbox.put('commander', {"title": 'a'})
+	drainer = Drainer(outbox, connect_failures=2)
+	drainer.drain()
+	outbox.put('commander', {"title": 'b'})
+	drainer.outbox_stop.stopped = False
+	drainer.presentation_layer.failures = 1
+	drainer.drain()
+	assert drainer.outbox_stop.waits == [1.0, 2.0, 1.0]
+	assert drainer.sent == ['a', 'b']
+
+
+def test_drain_dead_letters_rejected_messages_without_blocking(tmp_path):
+	outbox = make_outbox(tmp_path)
+	for title in ('a', 'invalid', 'b'):
+		outbox.put('commander', {"title": title})
+	drainer = Drainer(outbox)
+	drainer.drain()
+	assert drainer.sent == ['a', 'b'] and len(outbox) == 0
+	assert drainer.m_kafka_dead_letters.value == 1 and drainer.outbox_stop.waits == []
+	with sqlite3.connect(outbox.path) as db:
+		assert db.execute('SELECT COUNT(*) FROM dead_letter').fetchone()[0] == 1
+
+
+##=============================================================================
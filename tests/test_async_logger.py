@@ -0,0 +1,111 @@
+import gc
+import re
+import threading
+import multiprocessing
+import async_logger
+from async_logger import AsyncLogger
+
+##=============================================================================
+
+class ListTarget():
+	""" Logger stand-in recording (level, message); 'gate' (if set) holds the writer back until it is opened. """
+	def __init__(self, gate=None):
+		self.records = []
+		self.gate = gate
+
+	def __write(self, level, msg):
+		if self.gate is not None:
+			self.gate.wait()
+		self.records.append((level, msg))
+
+	def info(self, msg):
+		self.__write('info', msg)
+
+	def warning(self, msg):
+		self.__write('warning', msg)
+
+	def error(self, msg):
+		self.__write('error', msg)
+
+
+class FileTarget():
+	def __init__(self, path):
+		self.path = path
+
+	def info(self, msg):
+		with open(self.path, 'a') as f:
+			f.write(msg + '\n')
+
+
+def log_in_child(logger, count):
+	for idx in range(count):
+		logger.info(f'child record {idx}')
+	logger.close()   ## As MicrophoneSensor.run_process() does: os._exit() skips atexit
+
+
+def test_records_and_fields_reach_the_target():
+	target = ListTarget()
+	logger = AsyncLogger(target)
+	logger.info('Waiting for VLC to exit', pid=1234)
+	logger.error('boom')
+	logger.debug('no debug on the target --> info')
+	logger.close()
+	assert target.records == [('info', 'Waiting for VLC to exit | pid=1234'), ('error', 'boom'),
+							  ('info', 'no debug on the target --> info')]
+
+
+def test_rate_limiting_per_key(monkeypatch):
+	now = [100.0]
+	monkeypatch.setattr(async_logger.time, 'monotonic', lambda: now[0])
+	target = ListTarget()
+	logger = AsyncLogger(target, period=10.0, burst=2)
+	for _ in range(5):
+		logger.warning('waiting', key='wait')
+	logger.warning('other key', key='other')
+	now[0] += 10.0
+	logger.warning('waiting', key='wait')
+	logger.close()
+	assert [msg for _, msg in target.records] == ['waiting', 'waiting', 'other key', 'waiting (+3 suppressed)']
+
+
+def test_dropped_records_are_all_counted():
+	gate = threading.Event()
+	target = ListTarget(gate)
+	logger = AsyncLogger(target, max_queue=1)
+	threads = [threading.Thread(target=lambda: [logger.info('x') for _ in range(200)]) for _ in range(8)]
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+	gate.set()
+	logger.flush()
+	logger.info('last')
+	logger.close()
+	dropped = sum(int(n) for _, msg in target.records for n in re.findall(r'\[(\d+) log records dropped\]', msg))
+	assert len(target.records) - 1 + dropped == 8 * 200
+	assert target.records[-1][1].startswith('last')
+
+
+def test_records_queued_in_a_child_are_flushed(tmp_path):
+	path = tmp_path / 'log.txt'
+	logger = AsyncLogger(FileTarget(str(path)))
+	logger.info('parent record')
+	child = multiprocessing.Process(target=log_in_child, args=(logger, 50))
+	child.start()
+	child.join(timeout=10)
+	logger.close()
+	lines = path.read_text().splitlines()
+	assert lines.count('parent record') == 1
+	assert [line for line in lines if line.startswith('child')] == [f'child record {idx}' for idx in range(50)]
+
+
+def test_loggers_are_not_kept_alive_by_the_fork_and_exit_hooks():
+	logger = AsyncLogger(ListTarget())
+	assert logger in async_logger._instances
+	count = len(async_logger._instances)
+	del logger
+	gc.collect()
+	assert len(async_logger._instances) == count - 1
+
+
+##=============================================================================
@@ -0,0 +1,258 @@
+import os
+import sys
+import numpy as np
+import pytest
+from audio_analysis import WAVE_FORMAT_IEEE_FLOAT, read_wav_info, load_wav, iter_wav_blocks, compare_clips, \
+						   frame_levels_db, score_activity, score_activity_file, frame_spectra, band_noise_floor_db, find_hum, \
+						   channel_balance, calibration_profile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'misc'))
+import compare_wavs
+
+SAMPLERATE = 16000
+
+##=============================================================================
+
+def tone(seconds, frequency=440.0, amplitude=0.5, samplerate=SAMPLERATE):
+	t = np.arange(int(seconds * samplerate)) / samplerate
+	return amplitude * np.sin(2.0 * np.pi * frequency * t)
+
+
+def noise(seconds, amplitude=0.1, seed=0, samplerate=SAMPLERATE):
+	return amplitude * np.random.default_rng(seed).standard_normal(int(seconds * samplerate))
+
+
+##=============================================================================
+## WAV parsing
+
+def test_read_wav_info(make_wav):
+	info = read_wav_info(make_wav('a.wav', np.zeros((1600, 2)), 16000))
+	assert (info.format_tag, info.channels, info.samplerate, info.bits_per_sample) == (1, 2, 16000, 16)
+	assert info.is_pcm and info.frame_count == 1600 and info.duration == pytest.approx(0.1)
+
+
+def test_unfinalized_header_uses_the_file_size(make_wav):
+	path = make_wav('killed.wav', np.zeros(800), data_size=0)
+	assert read_wav_info(path).frame_count == 800
+
+
+def test_partial_trailing_frame_is_dropped(make_wav):
+	path = make_wav('a.wav', np.zeros((10, 2)))
+	with open(path, 'ab') as f:
+		f.write(b'\x01\x00')
+	assert read_wav_info(path).frame_count == 10
+
+
+def test_not_a_wav(tmp_path):
+	path = tmp_path / 'clip.mp3'
+	path.write_bytes(b'ID3' + bytes(100))
+	with pytest.raises(ValueError, match='not a RIFF/WAVE'):
+		read_wav_info(str(path))
+
+
+def test_load_wav_int16_and_float(make_wav):
+	signal = np.stack([tone(0.1), -tone(0.1)], axis=1)
+	samples, rate = load_wav(make_wav('pcm.wav', signal))
+	assert rate == SAMPLERATE and samples.shape == signal.shape and samples.dtype == np.float32
+	assert np.allclose(samples, signal, atol=1.0 / 32767)
+
+	samples, _ = load_wav(make_wav('float.wav', signal, format_tag=WAVE_FORMAT_IEEE_FLOAT, bits=32))
+	assert np.allclose(samples, signal, atol=1e-6)
+
+	samples, _ = load_wav(make_wav('pcm.wav', signal), max_seconds=0.05)
+	assert len(samples) == 800
+
+
+def test_load_wav_rejects_compressed_payloads(make_wav):
+	with pytest.raises(ValueError, match='PCM is required'):
+		load_wav(make_wav('mpga.wav', b'\xff\xfd' * 500, format_tag=0x0050))
+
+
+##=============================================================================
+## Clip comparison
+
+def test_identical_clips(make_wav):
+	reference = make_wav('ref.wav', noise(1.0))
+	result = compare_clips(reference, reference)
+	assert result["lag_seconds"] == 0.0
+	assert result["snr_db"] > 60
+	assert result["spectral_distance_db"] < 0.1
+	assert result["clipped_samples"] == 0
+
+
+def test_delayed_noisy_copy(make_wav):
+	signal = noise(1.5)
+	delayed = np.concatenate([np.zeros(800), signal])[:len(signal)] + noise(1.5, amplitude=0.001, seed=1)
+	result = compare_clips(make_wav('ref.wav', signal), make_wav('test.wav', delayed))
+	assert result["lag_seconds"] == pytest.approx(0.05, abs=1.0 / SAMPLERATE)
+	assert 30 < result["snr_db"] < 50
+	assert result["overlap_seconds"] == pytest.approx(1.45, abs=0.01)
+
+
+def test_clipping_is_counted(make_wav):
+	signal = noise(0.5)
+	clipped = signal.copy()
+	clipped[:100] = 1.0
+	assert compare_clips(make_wav('ref.wav', signal), make_wav('test.wav', clipped))["clipped_samples"] == 100
+
+
+##=============================================================================
+## Activity detection
+
+def test_frame_levels_db():
+	levels = frame_levels_db(np.concatenate((np.full(100, 0.5), np.zeros(100), np.full(50, 0.5))), 100)
+	assert len(levels) == 2   ## The partial frame is dropped
+	assert levels[0] == pytest.approx(-6.02, abs=0.01) and levels[1] < -200
+
+
+def test_silence_is_inactive():
+	activity = score_activity(np.zeros((SAMPLERATE, 2)), SAMPLERATE)
+	assert not activity["active"] and activity["active_ratio"] == 0.0
+
+
+def test_steady_noise_is_inactive_relative_to_its_floor():
+	activity = score_activity(noise(2.0, amplitude=0.05)[:, None], SAMPLERATE)
+	assert not activity["active"]
+	assert activity["threshold_db"] == pytest.approx(activity["noise_floor_db"] + 10.0)
+
+
+def test_tone_burst_over_noise_is_active():
+	signal = noise(4.0, amplitude=0.001)
+	signal[SAMPLERATE:2 * SAMPLERATE] += tone(1.0)
+	activity = score_activity(signal[:, None], SAMPLERATE)
+	assert activity["active"]
+	assert activity["active_seconds"] == pytest.approx(1.0, abs=0.06)
+	assert activity["peak_db"] == pytest.approx(-6.0, abs=0.2)
+
+
+def test_calibrated_noise_floor_raises_the_threshold():
+	signal = tone(1.0, amplitude=0.01)[:, None]   ## About -43 dBFS
+	assert score_activity(signal, SAMPLERATE, noise_floor_db=-80.0)["active"]
+	assert not score_activity(signal, SAMPLERATE, noise_floor_db=-45.0)["active"]
+
+
+def test_empty_clip():
+	activity = score_activity(np.zeros((0, 2)), SAMPLERATE)
+	assert not activity["active"] and activity["rms_db"] is None and activity["peak_db"] is None
+
+
+def test_blocks_cover_the_whole_file(make_wav):
+	path = make_wav('a.wav', noise(2.3), SAMPLERATE)
+	blocks = list(iter_wav_blocks(path, block_seconds=0.5))
+	assert [len(block) for block in blocks] == [8000, 8000, 8000, 8000, 4800]
+	assert np.array_equal(np.concatenate(blocks), load_wav(path)[0])
+
+
+def test_file_score_matches_the_in_memory_score(make_wav):
+	signal = noise(6.0, amplitude=0.002, seed=3)
+	signal[2 * SAMPLERATE:3 * SAMPLERATE] += tone(1.0)
+	path = make_wav('a.wav', np.stack((signal, signal), axis=1), SAMPLERATE)
+	seen = []
+	activity, samplerate = score_activity_file(path, block_seconds=1.0, on_block=lambda block, rate: seen.append(len(block)))
+	samples, _ = load_wav(path)
+	assert samplerate == SAMPLERATE and sum(seen) == len(samples)
+	assert activity == score_activity(samples, SAMPLERATE)
+
+
+def test_file_noise_floor_may_depend_on_the_samplerate(make_wav):
+	path = make_wav('a.wav', tone(1.0, amplitude=0.01), SAMPLERATE)
+	activity, _ = score_activity_file(path, noise_floor_db=lambda rate: -80.0 if rate == SAMPLERATE else 0.0)
+	assert activity["active"] and activity["noise_floor_db"] == -80.0
+
+
+##=============================================================================
+## Calibration profile
+
+def test_frame_spectra_hold_the_mean_square_power():
+	signal = noise(2.0, amplitude=0.1).astype(np.float32)
+	spectra = frame_spectra(signal, nfft=1024)
+	assert spectra.shape == (1 + (len(signal) - 1024) // 512, 513)
+	assert float(spectra.sum(axis=1).mean()) == pytest.approx(float(np.mean(signal * signal)), rel=0.1)
+
+
+def test_bands_are_limited_to_those_below_nyquist():
+	spectra = frame_spectra(noise(1.0).astype(np.float32))
+	assert list(band_noise_floor_db(spectra, SAMPLERATE)) == ['63', '125', '250', '500', '1000', '2000', '4000']
+	full_rate = frame_spectra(noise(1.0, samplerate=44100).astype(np.float32))
+	assert list(band_noise_floor_db(full_rate, 44100))[-1] == '8000'   ## The 16 kHz band reaches past 22.05 kHz
+
+
+def test_white_noise_band_floors_rise_3_db_per_octave():
+	bands = band_noise_floor_db(frame_spectra(noise(4.0).astype(np.float32)), SAMPLERATE)
+	assert bands['2000'] - bands['1000'] == pytest.approx(3.0, abs=1.0)
+	assert bands['4000'] - bands['2000'] == pytest.approx(3.0, abs=1.0)
+
+
+def test_mains_hum_is_found():
+	signal = noise(4.0, amplitude=0.001) + tone(4.0, frequency=50.0, amplitude=0.05) + tone(4.0, frequency=150.0, amplitude=0.02)
+	spectrum = frame_spectra(signal.astype(np.float32)).mean(axis=0)
+	hum = find_hum(spectrum, SAMPLERATE)
+	assert [round(peak["frequency_hz"] / 10) * 10 for peak in hum][:2] == [50, 150]
+	assert all(peak["prominence_db"] >= 10.0 for peak in hum)
+	assert find_hum(frame_spectra(noise(4.0).astype(np.float32)).mean(axis=0), SAMPLERATE) == []
+
+
+def test_channel_balance():
+	left = tone(1.0, amplitude=0.5)
+	balance = channel_balance(np.stack((left, left * 0.5), axis=1))
+	assert balance["imbalance_db"] == pytest.approx(6.02, abs=0.05)
+	assert balance["correlation"] == pytest.approx(1.0)
+	assert channel_balance(left[:, None])["correlation"] is None
+
+
+def test_profile_fields():
+	samples = np.stack((noise(3.0, amplitude=0.01, seed=1), noise(3.0, amplitude=0.01, seed=2)), axis=1)
+	profile = calibration_profile(samples, SAMPLERATE)
+	assert (profile["samplerate"], profile["band_limit_hz"], profile["channels"], profile["seconds"]) == (SAMPLERATE, 8000.0, 2, 3.0)
+	assert profile["noise_floor_db"] == pytest.approx(-43.0, abs=1.5)
+	assert profile["clipped_samples"] == 0 and profile["peak_db"] < -20
+	assert abs(profile["balance"]["correlation"]) < 0.1
+
+
+##=============================================================================
+## compare_wavs decoding
+
+def test_pcm_candidates_are_used_as_they_are(make_wav, tmp_path):
+	path = make_wav('pcm.wav', tone(0.1))
+	assert compare_wavs.decode_to_pcm(path, str(tmp_path)) == path
+
+
+def test_mpga_payload_is_extracted_before_decoding(make_wav, tmp_path, monkeypatch):
+	payload = b'\xff\xfd\x94\x00' * 250
+	path = make_wav('mpga.wav', payload, format_tag=0x0050, data_size=0)
+	workdir = tmp_path / 'work'
+	workdir.mkdir()
+	commands = []
+
+	def fake_run(cmd, **kwargs):
+		commands.append(cmd)
+		with open(cmd[-1], 'wb') as f:   ## ffmpeg's output path comes last
+			f.write(open(make_wav('decoded.wav', tone(0.1)), 'rb').read())
+
+	monkeypatch.setattr(compare_wavs.shutil, 'which', lambda name: f'/usr/bin/{name}' if name == 'ffmpeg' else None)
+	monkeypatch.setattr(compare_wavs.subprocess, 'run', fake_run)
+	decoded = compare_wavs.decode_to_pcm(path, str(workdir))
+	assert commands[0][0] == 'ffmpeg' and commands[0][-1] == decoded
+	source = commands[0][commands[0].index('-i') + 1]
+	assert open(source, 'rb').read() == payload
+	assert load_wav(decoded)[1] == SAMPLERATE
+
+
+def test_decoding_needs_a_decoder(make_wav, tmp_path, monkeypatch):
+	monkeypatch.setattr(compare_wavs.shutil, 'which', lambda name: None)
+	with pytest.raises(OSError, match='neither ffmpeg nor cvlc'):
+		compare_wavs.decode_to_pcm(make_wav('mpga.wav', b'\xff\xfd' * 10, format_tag=0x0050), str(tmp_path))
+
+
+def test_lowest_cost_candidate_meeting_the_floor():
+	clips = [compare_wavs.WAV('a', {"ab": 256, "chan": 2}), compare_wavs.WAV('b', {"ab": 128, "chan": 1}),
+			 compare_wavs.WAV('c', {"ab": 64, "chan": 1})]
+	clips[0].metrics = {"snr_db": 40.0, "spectral_distance_db": 0.5, "clipped_samples": 0}
+	clips[1].metrics = {"snr_db": 25.0, "spectral_distance_db": 2.0, "clipped_samples": 0}
+	clips[2].metrics = {"snr_db": 12.0, "spectral_distance_db": 6.0, "clipped_samples": 0}
+	assert compare_wavs.select_lowest_cost(clips) is clips[1]
+	assert compare_wavs.select_lowest_cost(clips, min_snr=30) is clips[0]
+	assert compare_wavs.select_lowest_cost(clips, min_snr=50) is None
+
+
+##=============================================================================
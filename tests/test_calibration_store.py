@@ -0,0 +1,28 @@
+import os
+from calibration_store import CalibrationStore
+
+##=============================================================================
+
+def test_device_key_is_sanitized(tmp_path):
+	store = CalibrationStore(str(tmp_path), 'alsa_hw:Microphone,0 / 1')
+	assert store.device_key == 'alsa_hw_Microphone_0_1'
+	assert CalibrationStore(str(tmp_path), '//').device_key == 'default'
+
+
+def test_round_trip(tmp_path):
+	store = CalibrationStore(str(tmp_path / 'profiles'), 'alsa_Microphone_1')
+	assert store.load() is None
+	saved = store.save({"noise_floor_db": -62.5, "band_limit_hz": 22050.0})
+	assert saved["device"] == 'alsa_Microphone_1' and saved["created"].endswith('Z')
+	assert store.load() == saved
+	assert os.listdir(tmp_path / 'profiles') == ['alsa_Microphone_1.json']   ## No temporary file left behind
+
+
+def test_unreadable_profile(tmp_path):
+	store = CalibrationStore(str(tmp_path), 'dev')
+	with open(store.path, 'w') as f:
+		f.write('{"noise_floor_db": ')
+	assert store.load() is None
+
+
+##=============================================================================
@@ -0,0 +1,110 @@
+import multiprocessing
+import pytest
+from capture_control import CaptureControl, CODEC_BYTES
+from microphone import MicrophoneSensor
+
+##=============================================================================
+
+def make_control():
+	return CaptureControl(duration=30.0, codec='mpga', bitrate=256, channels=2, samplerate=44100)
+
+
+def update_in_child(control):
+	control.update(bitrate=128, codec='mp3')
+
+
+class Logger():
+	def __init__(self):
+		self.lines = []
+
+	def info(self, msg):
+		pass
+
+	def warning(self, msg):
+		self.lines.append(msg)
+
+	def error(self, msg):
+		self.lines.append(msg)
+
+
+class Sensor():
+	""" The parts of MicrophoneSensor that control messages go through, with alerts recorded. """
+	command_error = staticmethod(MicrophoneSensor.command_error)
+	truncate = staticmethod(MicrophoneSensor.truncate)
+	do_parse_control_message = MicrophoneSensor.do_parse_control_message
+	send_acknowledgement = MicrophoneSensor.send_acknowledgement
+	update_file_duration = MicrophoneSensor.update_file_duration
+	update_audio_settings = MicrophoneSensor.update_audio_settings
+
+	def __init__(self):
+		self.my_logger = Logger()
+		self.alerts = []
+		self.sampling_multiplier = 1.0
+		self.file_duration = 30.0
+		self.capture_control = make_control()
+		self.stream_control = make_control()
+
+	def send_alert(self, subtype, severity, confidence, title, text, details, refs):
+		self.alerts.append((title, text))
+
+	def command(self, command, value=None):
+		self.do_parse_control_message({"messageId": 'cmd-1', "messageBody": {"commandDetail": {"command": command, "value": value}}})
+
+
+def test_initial_snapshot():
+	assert make_control().snapshot() == (0, {'duration': 30.0, 'codec': 'mpga', 'bitrate': 256,
+											 'channels': 2, 'samplerate': 44100})
+
+
+def test_update_bumps_the_generation():
+	control = make_control()
+	assert control.update(duration=10) == 1
+	assert control.update(channels=1, samplerate=16000) == 2
+	generation, settings = control.snapshot()
+	assert generation == control.generation == 2
+	assert settings == {'duration': 10.0, 'codec': 'mpga', 'bitrate': 256, 'channels': 1, 'samplerate': 16000}
+
+
+def test_unknown_setting_changes_nothing():
+	control = make_control()
+	with pytest.raises(KeyError, match='volume'):
+		control.update(volume=11, bitrate=64)
+	assert control.snapshot() == make_control().snapshot()
+
+
+def test_codec_is_truncated_to_fit():
+	control = make_control()
+	control.update(codec='x' * 40)
+	assert control.snapshot()[1]['codec'] == 'x' * (CODEC_BYTES - 1)
+
+
+def test_updates_are_shared_across_processes():
+	control = make_control()
+	child = multiprocessing.Process(target=update_in_child, args=(control,))
+	child.start()
+	child.join(timeout=10)
+	assert child.exitcode == 0
+	generation, settings = control.snapshot()
+	assert generation == 1
+	assert (settings['bitrate'], settings['codec']) == (128, 'mp3')
+
+
+def test_clip_and_stream_commands_update_their_control_block():
+	sensor = Sensor()
+	sensor.command('duration', 10)
+	sensor.command('stream_bitrate', 128)
+	assert sensor.capture_control.snapshot() == (1, {'duration': 10.0, 'codec': 'mpga', 'bitrate': 256, 'channels': 2, 'samplerate': 44100})
+	assert sensor.stream_control.snapshot()[1]['bitrate'] == 128
+	assert [title for title, _ in sensor.alerts] == ['Command Acknowledgement'] * 2
+
+
+@pytest.mark.parametrize('command', ['stream_duration', 'stream_multiplier', 'stream_calibrate', 'volume'])
+def test_commands_that_cannot_be_applied_are_rejected(command):
+	sensor = Sensor()
+	sensor.command(command, 10)
+	assert sensor.alerts == [('Command Rejected', f"Rejected: {command} ({MicrophoneSensor.command_error(command)})")]
+	assert sensor.my_logger.lines == [f"[do_parse_control_message]  Rejected {command}: {MicrophoneSensor.command_error(command)}"]
+	assert sensor.capture_control.generation == sensor.stream_control.generation == 0
+
+
+##=============================================================================
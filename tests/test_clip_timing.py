@@ -0,0 +1,76 @@
+import datetime as dt
+import numpy as np
+import pytest
+import clip_timing
+from clip_timing import ClockAnchor, CaptureLatency, clip_bounds, format_icd_timestamp
+
+##=============================================================================
+
+class FrozenClock():
+	""" Stand-in for the 'time' module with a fixed UTC - monotonic offset. """
+	def __init__(self, utc=1700000000.0, mono=500.0):
+		self.offset = utc - mono
+		self.mono = mono
+
+	def monotonic(self):
+		return self.mono
+
+	def time(self):
+		return self.mono + self.offset
+
+
+@pytest.fixture
+def frozen(monkeypatch):
+	fake = FrozenClock()
+	monkeypatch.setattr(clip_timing, 'time', fake)
+	return fake
+
+
+def test_format_icd_timestamp_is_utc_with_milliseconds():
+	assert format_icd_timestamp(0) == '1970-01-01T00:00:00.000Z'
+	assert format_icd_timestamp(1700000000.1234) == '2023-11-14T22:13:20.123Z'
+	epoch = dt.datetime(2024, 2, 29, 23, 59, 59, 999000, tzinfo=dt.timezone.utc).timestamp()
+	assert format_icd_timestamp(epoch) == '2024-02-29T23:59:59.999Z'
+
+
+def test_clock_anchor_maps_monotonic_onto_utc(frozen):
+	anchor = ClockAnchor(refresh_period=300.0)
+	assert anchor.to_utc(frozen.mono) == pytest.approx(frozen.time())
+	assert anchor.to_utc(frozen.mono - 2.5) == pytest.approx(frozen.time() - 2.5)
+
+
+def test_clock_anchor_refreshes_after_its_period(frozen):
+	anchor = ClockAnchor(refresh_period=300.0)
+	frozen.offset += 0.75   ## NTP stepped the wall clock
+	frozen.mono += 100.0
+	assert anchor.to_utc(frozen.mono) == pytest.approx(frozen.time() - 0.75)   ## Not yet re-anchored
+	frozen.mono += 201.0
+	assert anchor.to_utc(frozen.mono) == pytest.approx(frozen.time())
+
+
+def test_capture_latency_keeps_the_smallest_measurement():
+	latency = CaptureLatency()
+	assert latency.value == 0.0
+	assert latency.observe(1.4) == 1.4
+	assert latency.observe(0.9) == 0.9
+	assert latency.observe(2.0) == 0.9   ## A slow VLC startup doesn't raise it
+	assert latency.observe(-0.1) == 0.9
+
+
+def test_configured_capture_latency_overrides_the_measurement():
+	latency = CaptureLatency(configured=1.25)
+	assert latency.observe(0.4) == 1.25
+	assert latency.measured == 0.4
+	assert CaptureLatency(configured=0.0).observe(0.4) == 0.0
+
+
+def test_clip_bounds_from_samples_and_latency(frozen, make_wav):
+	path = make_wav('clip.wav', np.zeros((16000 * 3, 2)), samplerate=16000)
+	anchor = ClockAnchor()
+	start, end, duration = clip_bounds(path, frozen.mono, anchor, capture_latency=0.5)
+	assert duration == pytest.approx(3.0)
+	assert end == format_icd_timestamp(frozen.time() - 0.5)
+	assert start == format_icd_timestamp(frozen.time() - 3.5)
+
+
+##=============================================================================
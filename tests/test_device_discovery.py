@@ -0,0 +1,54 @@
+from device_discovery import SoundCard, DeviceDiscovery, parse_cards, parse_uevent
+
+CARDS = (" 0 [PCH            ]: HDA-Intel - HDA Intel PCH\n"
+		 "                      HDA Intel PCH at 0xf7f10000 irq 30\n"
+		 " 1 [Microphone     ]: USB-Audio - Yeti Stereo Microphone\n"
+		 "                      Blue Microphones Yeti Stereo Microphone at usb-0000:00:14.0-2, full speed\n")
+
+##=============================================================================
+
+def test_parse_cards():
+	assert parse_cards(CARDS) == [SoundCard(0, 'PCH', 'HDA-Intel', 'HDA Intel PCH'),
+								  SoundCard(1, 'Microphone', 'USB-Audio', 'Yeti Stereo Microphone')]
+
+
+def test_parse_cards_without_cards():
+	assert parse_cards("--- no soundcards ---\n") == []
+	assert parse_cards('') == []
+
+
+def test_parse_uevent():
+	data = (b'add@/devices/pci0000:00/0000:00:14.0/usb1/1-2/1-2:1.0/sound/card1\0'
+			b'ACTION=add\0DEVPATH=/devices/pci0000:00/0000:00:14.0/usb1/1-2/1-2:1.0/sound/card1\0'
+			b'SUBSYSTEM=sound\0SEQNUM=4242\0')
+	event = parse_uevent(data)
+	assert event['ACTION'] == 'add'
+	assert event['SUBSYSTEM'] == 'sound'
+	assert event['SEQNUM'] == '4242'
+	assert event['DEVPATH'].endswith('/sound/card1')
+
+
+def test_parse_uevent_header_only():
+	assert parse_uevent(b'remove@/devices/virtual/sound/card1') == {'ACTION': 'remove', 'DEVPATH': '/devices/virtual/sound/card1'}
+	assert parse_uevent(b'libudev\0\xfe\xed') == {}
+
+
+def test_device_selection_and_refresh(tmp_path):
+	cards_path = tmp_path / 'cards'
+	cards_path.write_text(CARDS)
+	changes = []
+	discovery = DeviceDiscovery(match='Yeti', on_change=lambda *change: changes.append(change), cards_path=str(cards_path))
+	assert discovery.device_name == 'Microphone' and discovery.present
+
+	cards_path.write_text(CARDS.split('\n', 2)[0] + '\n')   ## The Yeti is unplugged
+	assert discovery.refresh('remove')
+	assert discovery.device_name == 'PCH' and not discovery.present
+	assert not discovery.refresh('change')   ## Nothing changed
+
+	cards_path.unlink()
+	assert discovery.refresh('remove')
+	assert discovery.device_name == 'Microphone' and not discovery.present   ## The default
+	assert changes == [('PCH', False, 'remove'), ('Microphone', False, 'remove')]
+
+
+##=============================================================================
@@ -0,0 +1,123 @@
+import copy
+import json
+import pytest
+import fast_messages
+from fast_messages import FastJSONSerializer, ValidationError, dumps, loads, validate_message
+
+##=============================================================================
+
+def envelope(message_type, subtype, body):
+	return {"version": '0.1', "componentId": 'mic-1', "componentType": 'SENSOR', "componentSite": 'site-a',
+			"componentFriendlyName": 'Yeti 1', "messageTimestamp": '2026-10-18T12:34:56.789Z', "messageId": 'abc-123',
+			"messageType": message_type, "messageSubtype": subtype, "messageBody": body}
+
+
+def heartbeat():
+	return envelope('CONTROL', 'Heartbeat', {"target": 'commander', "commandTitle": 'heartbeat',
+											 "commandText": 'Recording', "commandDetail": {"levels": {"rms_db": -30.5}}})
+
+
+def status_alert():
+	return envelope('ALERT', 'Status', {"severity": 5, "confidence": 6, "host": None, "messageRef": [],
+										"alertTitle": 'Microphone Stream Ready', "alertText": 'Live',
+										"alertDetail": {"mrl": 'alsa://hw:Microphone'}})
+
+
+class Fallback():
+	def __init__(self):
+		self.calls = []
+
+	def serialize_to_utf_8(self, message):
+		self.calls.append('serialize')
+		return b'fallback'
+
+	def deserialize_from_utf_8(self, data):
+		self.calls.append('deserialize')
+		return 'fallback'
+
+
+@pytest.mark.parametrize('message', [heartbeat(), status_alert()])
+def test_round_trip(message):
+	serializer = FastJSONSerializer()
+	data = serializer.serialize_to_utf_8(copy.deepcopy(message))
+	assert isinstance(data, bytes) and json.loads(data) == message
+	assert serializer.deserialize_from_utf_8(data) == message
+
+
+@pytest.mark.parametrize('field, value, error', [
+	('version', '0.2', 'version must be 0.1'),
+	('messageId', '', 'must not be empty'),
+	('componentId', None, 'componentId must be a string'),
+	('componentType', 'ROBOT', 'Invalid componentType'),
+	('componentSite', 'site a', 'Invalid componentSite'),
+	('messageTimestamp', '2026-10-18 12:34:56', 'Invalid messageTimestamp'),
+	('messageTimestamp', '2026-13-18T12:34:56.789Z', 'Invalid messageTimestamp'),
+])
+def test_bad_envelopes_are_rejected(field, value, error):
+	message = status_alert()
+	message[field] = value
+	with pytest.raises(ValidationError, match=error):
+		FastJSONSerializer().serialize_to_utf_8(message)
+
+
+@pytest.mark.parametrize('field, value, error', [
+	('severity', 8, 'severity must be one of 0-7'),
+	('severity', True, 'severity must be one of 0-7'),
+	('confidence', 0, r'confidence must be in \[1, 6\]'),
+	('host', 3, 'host must be a string or null'),
+	('messageRef', [1], 'messageRef must be a list of strings'),
+	('alertTitle', 'x' * 51, 'at most 50 characters'),
+	('alertDetail', [], 'alertDetail must be an object'),
+])
+def test_bad_alert_bodies_are_rejected(field, value, error):
+	message = status_alert()
+	message["messageBody"][field] = value
+	with pytest.raises(ValidationError, match=error):
+		validate_message(message)
+
+
+def test_bad_control_body_is_rejected():
+	message = heartbeat()
+	del message["messageBody"]["commandText"]
+	with pytest.raises(ValidationError, match='commandText must be a string'):
+		validate_message(message)
+	message["messageBody"] = 'heartbeat'
+	with pytest.raises(ValidationError, match='messageBody must be an object'):
+		validate_message(message)
+
+
+def test_validation_error_is_a_value_error():
+	assert issubclass(ValidationError, ValueError)   ## drain_outbox() dead-letters ValueErrors
+
+
+def test_incoming_messages_are_validated():
+	message = heartbeat()
+	message["componentType"] = 'ROBOT'
+	with pytest.raises(ValidationError):
+		FastJSONSerializer().deserialize_from_utf_8(json.dumps(message).encode())
+
+
+def test_other_messages_go_to_the_fallback():
+	fallback = Fallback()
+	serializer = FastJSONSerializer(fallback)
+	raw = envelope('RAW', 'Audio', {"anything": 1})
+	assert serializer.serialize_to_utf_8(raw) == b'fallback'
+	assert serializer.deserialize_from_utf_8(json.dumps(raw).encode()) == 'fallback'
+	assert serializer.serialize_to_utf_8(heartbeat()) != b'fallback'
+	assert fallback.calls == ['serialize', 'deserialize']
+
+
+def test_other_messages_pass_through_without_a_fallback():
+	raw = envelope('RAW', 'Audio', {"anything": 1})
+	assert FastJSONSerializer().deserialize_from_utf_8(json.dumps(raw).encode()) == raw
+
+
+@pytest.mark.parametrize('use_orjson', [True, False])
+def test_dumps_is_compact_and_falls_back_to_the_stdlib(monkeypatch, use_orjson):
+	if not use_orjson:
+		monkeypatch.setattr(fast_messages, 'orjson', None)
+	assert dumps({"a": [1, 2], "b": 'é'}) == '{"a":[1,2],"b":"é"}'.encode('utf-8')
+	assert loads(dumps({1: 2 ** 70})) == {"1": 2 ** 70}   ## Beyond orjson: non-string keys && big ints
+
+
+##=============================================================================
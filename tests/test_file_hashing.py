@@ -0,0 +1,45 @@
+import os
+import hashlib
+import pytest
+from file_hashing import hash_file, hash_file_mmap
+
+##=============================================================================
+
+@pytest.fixture(params=[0, 1, 4095, 4096, 4097, 3 * 4096 + 17])
+def data_file(request, tmp_path):
+	data = os.urandom(request.param)
+	path = tmp_path / f'clip_{request.param}.wav'
+	path.write_bytes(data)
+	return str(path), data
+
+
+@pytest.mark.parametrize('algorithm', ['sha1', 'sha256'])
+def test_readinto_digest_matches_hashlib(data_file, algorithm):
+	path, data = data_file
+	assert hash_file(path, algorithm, chunk_size=4096) == hashlib.new(algorithm, data).hexdigest()
+
+
+@pytest.mark.parametrize('algorithm', ['sha1', 'sha256'])
+def test_mmap_digest_matches_hashlib(data_file, algorithm):
+	path, data = data_file
+	assert hash_file_mmap(path, algorithm) == hashlib.new(algorithm, data).hexdigest()
+
+
+def test_reused_buffer_is_not_resized(tmp_path):
+	buffer = bytearray(1000)
+	for idx, size in enumerate((2500, 10, 999, 1001)):   ## Stale bytes from the previous file must not leak into the digest
+		data = os.urandom(size)
+		path = tmp_path / f'{idx}.wav'
+		path.write_bytes(data)
+		assert hash_file(str(path), buffer=buffer) == hashlib.sha1(data).hexdigest()
+	assert len(buffer) == 1000
+
+
+def test_missing_file(tmp_path):
+	with pytest.raises(FileNotFoundError):
+		hash_file(str(tmp_path / 'gone.wav'))
+	with pytest.raises(FileNotFoundError):
+		hash_file_mmap(str(tmp_path / 'gone.wav'))
+
+
+##=============================================================================
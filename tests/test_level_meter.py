@@ -0,0 +1,129 @@
+import socket
+import time
+import multiprocessing
+import numpy as np
+import pytest
+from level_meter import LevelMeter, LiveLevelFeed
+from vlc_audio_util import VLCAudioStreamer, VLCAudioSettings
+
+SAMPLERATE = 16000
+
+##=============================================================================
+
+def tone(seconds, amplitude=0.5, frequency=440.0, channels=2):
+	t = np.arange(int(seconds * SAMPLERATE)) / SAMPLERATE
+	return np.repeat((amplitude * np.sin(2.0 * np.pi * frequency * t))[:, None], channels, axis=1)
+
+
+def pcm_bytes(samples):
+	return (np.clip(samples, -1.0, 1.0) * 32767.0).round().astype('<i2').tobytes()
+
+
+def free_udp_port():
+	with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+		sock.bind(('127.0.0.1', 0))
+		return sock.getsockname()[1]
+
+
+def set_silence_in_child(meter):
+	meter.silence_db = -40.0
+
+
+def test_tone_levels():
+	meter = LevelMeter()
+	meter.update(tone(1.0), SAMPLERATE)
+	levels = meter.snapshot()
+	assert levels["rms_db"] == pytest.approx(-9.03, abs=0.05)
+	assert levels["peak_db"] == pytest.approx(-6.02, abs=0.05)
+	assert levels["clipped_samples"] == 0 and levels["samplerate"] == SAMPLERATE
+	assert levels["metered_seconds"] == 1.0
+	assert levels["status"] == 'ok' and levels["fresh"]
+
+
+def test_clipping_and_silence():
+	meter = LevelMeter()
+	meter.update(np.clip(tone(1.0, amplitude=2.0), -1.0, 1.0), SAMPLERATE)
+	levels = meter.snapshot()
+	assert levels["status"] == 'clipping' and levels["clipped_samples"] > 0
+
+	meter.update(tone(1.0, amplitude=1e-5), SAMPLERATE)
+	assert meter.snapshot()["status"] == 'silent'
+
+
+def test_snapshot_without_new_data_repeats_the_last_summary():
+	meter = LevelMeter()
+	assert meter.snapshot()["status"] == 'no_data'
+	meter.update(tone(0.5), SAMPLERATE)
+	first = meter.snapshot()
+	again = meter.snapshot()
+	assert not again["fresh"] and again["rms_db"] == first["rms_db"]
+
+
+def test_block_budget_strides_and_scales_the_clip_count():
+	meter = LevelMeter(block_seconds=0.1, max_blocks=5)
+	samples = tone(2.0)   ## 20 blocks --> every 4th is measured
+	samples[::100] = 1.0
+	meter.update(samples, SAMPLERATE)
+	levels = meter.snapshot()
+	assert levels["clipped_samples"] == pytest.approx(np.count_nonzero(samples >= 0.999), rel=0.1)
+
+
+def test_silence_threshold_is_shared_across_processes():
+	meter = LevelMeter(silence_db=-70.0)
+	child = multiprocessing.Process(target=set_silence_in_child, args=(meter,))
+	child.start()
+	child.join(timeout=10)
+	assert meter.silence_db == -40.0
+	meter.update(tone(0.5, amplitude=0.005), SAMPLERATE)   ## About -49 dBFS
+	assert meter.snapshot()["status"] == 'silent'
+
+
+def test_feed_meters_each_period_and_carries_partial_frames():
+	meter = LevelMeter()
+	feed = LiveLevelFeed(meter, '127.0.0.1', 0, SAMPLERATE, 2, period=0.5)
+	data = pcm_bytes(tone(1.25))
+	for offset in range(0, len(data), 1001):   ## Datagram boundaries split frames
+		feed.feed(data[offset:offset + 1001])
+	levels = meter.snapshot()
+	assert feed.bytes_received == len(data)
+	assert levels["metered_seconds"] == 1.0   ## Two whole periods; the rest waits for the next datagrams
+	assert levels["rms_db"] == pytest.approx(-9.03, abs=0.05)
+
+
+def test_format_change_discards_buffered_samples():
+	meter = LevelMeter()
+	feed = LiveLevelFeed(meter, '127.0.0.1', 0, SAMPLERATE, 2, period=0.5)
+	feed.feed(pcm_bytes(tone(0.4)))
+	feed.set_format(SAMPLERATE, 1)
+	feed.feed(pcm_bytes(tone(0.5, channels=1)))
+	levels = meter.snapshot()
+	assert levels["metered_seconds"] == 0.5 and levels["rms_db"] == pytest.approx(-9.03, abs=0.05)
+
+
+def test_feed_receives_the_meter_copy_over_udp():
+	port = free_udp_port()
+	meter = LevelMeter()
+	feed = LiveLevelFeed(meter, '127.0.0.1', port, SAMPLERATE, 2, period=0.1)
+	feed.start()
+	try:
+		data = pcm_bytes(tone(0.5))
+		with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+			for offset in range(0, len(data), 1400):   ## VLC's default UDP MTU
+				sock.sendto(data[offset:offset + 1400], ('127.0.0.1', port))
+		deadline = time.monotonic() + 5
+		while feed.bytes_received < len(data) and time.monotonic() < deadline:
+			time.sleep(0.01)
+		assert meter.snapshot()["metered_seconds"] == 0.5
+	finally:
+		feed.stop()
+
+
+def test_streamer_sends_the_meter_copy_before_the_lossy_transcode():
+	settings = VLCAudioSettings(codec='mpga', channels=2, samplerate=44100, bitrate=128)
+	plain = VLCAudioStreamer('s', settings, '239.255.12.42', monitor_port=1236)
+	metered = VLCAudioStreamer('s', settings, '239.255.12.42', monitor_port=1236, meter_port=1238)
+	assert metered.sout == (f"#duplicate{{dst={plain.sout[1:]},dst=transcode{{acodec=s16l,channels=2,samplerate=44100}}"
+							":std{access=udp,mux=raw,dst=127.0.0.1:1238}}")
+
+
+##=============================================================================
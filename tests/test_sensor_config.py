@@ -0,0 +1,122 @@
+import os
+import pytest
+from sensor_config import SCHEMA, Setting, ConfigError, coerce, load_config
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+##=============================================================================
+
+def write_yaml(tmp_path, text):
+	path = tmp_path / 'mic_config.yaml'
+	path.write_text(text)
+	return str(path)
+
+
+def test_coerce_bool_strings():
+	setting = Setting('X', False, bool)
+	assert coerce('x', setting, 'Yes') is True
+	assert coerce('x', setting, ' off ') is False
+	assert coerce('x', setting, True) is True
+	with pytest.raises(ConfigError, match='not a boolean'):
+		coerce('x', setting, 'maybe')
+
+
+def test_coerce_int_accepts_integral_values_only():
+	setting = Setting('X', 0, int, bounds=(0, 10))
+	assert coerce('x', setting, '3') == 3
+	assert coerce('x', setting, '3.0') == 3
+	assert coerce('x', setting, 4.0) == 4
+	with pytest.raises(ConfigError, match='not an integer'):
+		coerce('x', setting, '3.5')
+	with pytest.raises(ConfigError, match='not an integer'):
+		coerce('x', setting, True)
+
+
+def test_coerce_float_rejects_bool():
+	setting = Setting('X', 0.0, float)
+	assert coerce('x', setting, '0.25') == 0.25
+	with pytest.raises(ConfigError, match='not a number'):
+		coerce('x', setting, False)
+
+
+def test_coerce_bounds_choices_and_pattern():
+	with pytest.raises(ConfigError, match=r'outside \[0, 10\]'):
+		coerce('x', Setting('X', 0, int, bounds=(0, 10)), 11)
+	assert coerce('x', Setting('X', 0, int, bounds=(0, None)), 10 ** 9) == 10 ** 9
+	assert coerce('x', Setting('X', 'a', choices=('all', 'active'), lower=True), ' ALL ') == 'all'
+	with pytest.raises(ConfigError, match='is not one of'):
+		coerce('x', Setting('X', 'a', choices=('all', 'active')), 'none')
+	with pytest.raises(ConfigError, match='does not match'):
+		coerce('x', Setting('X', 'mpga', pattern=r'^[a-z0-9]{3,4}$'), 'mpeg-audio')
+
+
+def test_coerce_empty_values():
+	assert coerce('x', Setting('X', None, str), None) is None
+	assert coerce('x', Setting('X', None, int), '') is None
+	with pytest.raises(ConfigError, match='a value is required'):
+		coerce('x', Setting('X', 1, int), '')
+	with pytest.raises(ConfigError, match='a value is required'):
+		coerce('x', Setting('X', 'wav', str), None)
+
+
+def test_defaults_without_file_or_environment():
+	config = load_config(None, environ={})
+	for section, settings in SCHEMA.items():
+		for key, setting in settings.items():
+			assert config[f'{section}.{key}'] == setting.default
+
+
+def test_shipped_file_is_valid():
+	config = load_config(os.path.join(REPO_DIR, 'mic_config.yaml'), environ={})
+	assert set(config) == {f'{section}.{key}' for section, settings in SCHEMA.items() for key in settings}
+
+
+def test_precedence_environment_over_file_over_default(tmp_path):
+	path = write_yaml(tmp_path, "recording:\n  duration: 12\n  clock_anchor_refresh: 60\n")
+	config = load_config(path, environ={'RECORDING_DURATION': '45.5'})
+	assert config['recording.duration'] == 45.5 				## Environment
+	assert config['recording.clock_anchor_refresh'] == 60.0 		## File
+	assert config['recording.capture_latency_offset'] is None 	## Default
+
+
+def test_environment_values_are_coerced_and_lowered(tmp_path):
+	config = load_config(None, environ={'ALSA_SHARED_CAPTURE': 'TRUE', 'STREAM_ACODEC': 'MP3', 'STREAM_RTP_PORT': '5004'})
+	assert config['stream.shared_capture'] is True
+	assert config['audio.codec'] == 'mp3'
+	assert config['stream.rtp_port'] == 5004
+
+
+def test_errors_are_aggregated(tmp_path):
+	path = write_yaml(tmp_path, "bogus:\n  a: 1\nrecording:\n  duration: 0\n  colour: red\naudio:\n  channels: 3\n")
+	with pytest.raises(ConfigError) as exc:
+		load_config(path, environ={'STREAM_RTP_PORT': 'http'})
+	message = str(exc.value)
+	assert message.startswith(f'Invalid configuration in {path}:')
+	for problem in ("Unknown section 'bogus'", "Unknown setting 'recording.colour'", 'recording.duration: 0.0 is outside',
+					'audio.channels: 3 is outside', 'stream.rtp_port ($STREAM_RTP_PORT)'):
+		assert problem in message
+
+
+def test_malformed_file(tmp_path):
+	with pytest.raises(ConfigError, match='expected a mapping'):
+		load_config(write_yaml(tmp_path, "- just\n- a list\n"), environ={})
+	with pytest.raises(ConfigError, match='Invalid configuration'):
+		load_config(write_yaml(tmp_path, "recording: [unclosed\n"), environ={})
+
+
+def test_empty_sections_and_nullable_settings(tmp_path):
+	config = load_config(write_yaml(tmp_path, "logging:\nuploads:\n  interface:\n"), environ={})
+	assert config['logging.rate_period'] == SCHEMA['logging']['rate_period'].default
+	assert config['uploads.interface'] is None
+
+
+def test_diff_and_live_settings(tmp_path):
+	old = load_config(None, environ={})
+	new = load_config(None, environ={'RECORDING_DURATION': '10', 'STREAM_RTP_PORT': '5004'})
+	assert old.diff(new) == {'recording.duration': 10.0, 'stream.rtp_port': 5004}
+	assert old.is_live('recording.duration')
+	assert not old.is_live('stream.rtp_port')
+	assert new.as_dict()['recording']['duration'] == 10.0
+
+
+##=============================================================================
@@ -0,0 +1,80 @@
+import json
+import urllib.error
+import urllib.request
+import multiprocessing
+import pytest
+from sensor_metrics import MetricsRegistry
+
+##=============================================================================
+
+def count_in_child(counter, histogram):
+	for _ in range(100):
+		counter.inc()
+	histogram.observe(0.3)
+
+
+def test_rendering():
+	registry = MetricsRegistry(prefix='mic', const_labels={'room': 'A1'})
+	clips = registry.counter('clips_total', 'Clips captured')
+	for name in ('ok', 'silent'):
+		registry.counter('uploads_total', 'Uploads by outcome', labels={'outcome': name}).inc(2 if name == 'ok' else 1)
+	registry.gauge('queue_depth', 'Queued clips').set(3.5)
+	registry.gauge('disk_free', 'Free bytes', callback=lambda: 1024)
+	registry.gauge('broken', 'Callback raising', callback=lambda: 1 / 0)
+	clips.inc()
+	clips.inc(2)
+
+	lines = registry.render().splitlines()
+	assert lines[:3] == ['# HELP mic_clips_total Clips captured', '# TYPE mic_clips_total counter', 'mic_clips_total{room="A1"} 3']
+	assert lines.count('# TYPE mic_uploads_total counter') == 1 	## HELP/TYPE once per metric name
+	assert 'mic_uploads_total{outcome="ok",room="A1"} 2' in lines
+	assert 'mic_uploads_total{outcome="silent",room="A1"} 1' in lines
+	assert 'mic_queue_depth{room="A1"} 3.5' in lines
+	assert 'mic_disk_free{room="A1"} 1024' in lines
+	assert 'mic_broken{room="A1"} NaN' in lines
+
+
+def test_histogram_buckets_are_cumulative():
+	registry = MetricsRegistry()
+	histogram = registry.histogram('latency_seconds', 'Latency', buckets=(0.5, 0.1, 1.0))
+	for value in (0.05, 0.1, 0.3, 2.0):
+		histogram.observe(value)
+	assert histogram.count == 4
+	lines = registry.render().splitlines()
+	assert lines[2:] == ['latency_seconds_bucket{le="0.1"} 2', 'latency_seconds_bucket{le="0.5"} 3',
+						 'latency_seconds_bucket{le="1"} 3', 'latency_seconds_bucket{le="+Inf"} 4',
+						 'latency_seconds_sum 2.45', 'latency_seconds_count 4']
+
+
+def test_updates_from_forked_processes_are_visible():
+	registry = MetricsRegistry()
+	counter = registry.counter('clips_total', 'Clips')
+	histogram = registry.histogram('latency_seconds', 'Latency')
+	children = [multiprocessing.Process(target=count_in_child, args=(counter, histogram)) for _ in range(4)]
+	for child in children:
+		child.start()
+	for child in children:
+		child.join(timeout=10)
+	assert counter.value == 400
+	assert histogram.count == 4
+
+
+def test_http_endpoint():
+	registry = MetricsRegistry()
+	registry.counter('clips_total', 'Clips').inc()
+	server = registry.serve(0, addr='127.0.0.1', json_routes={'/diagnostics': lambda: {'state': 'Recording'}})
+	base = f'http://127.0.0.1:{server.server_address[1]}'
+	try:
+		with urllib.request.urlopen(f'{base}/metrics') as response:
+			assert response.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+			assert 'clips_total 1' in response.read().decode()
+		with urllib.request.urlopen(f'{base}/diagnostics') as response:
+			assert json.loads(response.read()) == {'state': 'Recording'}
+		with pytest.raises(urllib.error.HTTPError) as exc:
+			urllib.request.urlopen(f'{base}/missing')
+		assert exc.value.code == 404
+	finally:
+		registry.shutdown()
+
+
+##=============================================================================
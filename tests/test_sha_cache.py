@@ -0,0 +1,70 @@
+import hashlib
+from sha_cache import BloomFilter, ShaCache, CONFIRMED, PROBABLE
+
+##=============================================================================
+
+def sha(idx):
+	return hashlib.sha1(str(idx).encode()).hexdigest()
+
+
+def test_bloom_filter_has_no_false_negatives():
+	bloom = BloomFilter(1000, error_rate=0.01)
+	for idx in range(1000):
+		bloom.add(sha(idx))
+	assert all(sha(idx) in bloom for idx in range(1000))
+	false_positives = sum(sha(idx) in bloom for idx in range(1000, 11000))
+	assert false_positives < 300   ## ~1% expected
+	bloom.add('not-a-hex-digest')
+	assert 'not-a-hex-digest' in bloom
+
+
+def test_lookup_and_persistence(tmp_path):
+	path = str(tmp_path / 'cache' / 'uploaded.sha')
+	cache = ShaCache(path, capacity=10, fsync=False)
+	assert cache.lookup(sha(1)) is None
+	cache.add(sha(1))
+	assert cache.lookup(sha(1)) == CONFIRMED
+	assert ShaCache(path, capacity=10, fsync=False).lookup(sha(1)) == CONFIRMED   ## Reloaded from the log
+
+
+def test_lru_eviction_and_log_compaction(tmp_path):
+	path = str(tmp_path / 'uploaded.sha')
+	cache = ShaCache(path, capacity=3, fsync=False)
+	for idx in range(5):
+		cache.add(sha(idx))
+	assert len(cache) == 3
+	assert cache.lookup(sha(0)) is None and cache.lookup(sha(4)) == CONFIRMED
+	assert len(open(path).read().split()) == 5
+	cache.add(sha(5))   ## The log reaches twice the capacity --> compacted to the LRU
+	assert open(path).read().split() == [sha(3), sha(4), sha(5)]
+
+
+def test_lookup_refreshes_recency(tmp_path):
+	cache = ShaCache(str(tmp_path / 'uploaded.sha'), capacity=2, fsync=False)
+	cache.add(sha(0))
+	cache.add(sha(1))
+	cache.lookup(sha(0))
+	cache.add(sha(2))
+	assert cache.lookup(sha(0)) == CONFIRMED and cache.lookup(sha(1)) is None
+
+
+def test_evicted_shas_are_probable_with_a_bloom_filter(tmp_path):
+	path = str(tmp_path / 'uploaded.sha')
+	cache = ShaCache(path, capacity=2, bloom_capacity=100, bloom_save_every=1000, fsync=False)
+	for idx in range(4):   ## Compacts, which saves the filter first
+		cache.add(sha(idx))
+	assert cache.lookup(sha(0)) == PROBABLE and cache.lookup(sha(3)) == CONFIRMED
+	reloaded = ShaCache(path, capacity=2, bloom_capacity=100, fsync=False)
+	assert reloaded.lookup(sha(0)) == PROBABLE
+	assert reloaded.lookup(sha(99)) is None
+
+
+def test_resized_bloom_filter_is_rebuilt_from_the_log(tmp_path):
+	path = str(tmp_path / 'uploaded.sha')
+	cache = ShaCache(path, capacity=10, bloom_capacity=100, bloom_save_every=1, fsync=False)
+	cache.add(sha(0))
+	resized = ShaCache(path, capacity=10, bloom_capacity=5000, fsync=False)
+	assert resized.lookup(sha(0)) == CONFIRMED and sha(0) in resized.bloom
+
+
+##=============================================================================
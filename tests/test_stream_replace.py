@@ -0,0 +1,228 @@
+import dataclasses
+import pytest
+import vlc_audio_util
+from capture_control import CaptureControl
+from microphone import MicrophoneSensor
+from vlc_audio_util import (VLCAudioStreamer, VLCAudioSettings, REPLACED_MAKE_BEFORE_BREAK, REPLACED_BY_RESTART,
+							REPLACEMENT_FAILED)
+
+OLD = VLCAudioSettings(tx_mrl='alsa://dsnoop:CARD=Microphone,DEV=0', bitrate=256)
+NEW = dataclasses.replace(OLD, bitrate=128)
+
+
+class Counter():
+	def __init__(self):
+		self.value = 0
+
+	def inc(self, amount=1):
+		self.value += amount
+
+
+class Sensor():
+	""" The parts of MicrophoneSensor that replace_stream() uses; restart_stream() is only counted. """
+	replace_stream = MicrophoneSensor.replace_stream
+
+	def __init__(self, streamer):
+		self.streamer = streamer
+		self.synth_source = None
+		self.stream_ready_timeout = 1.0
+		self.my_logger = streamer.stream_log
+		self.my_logger.error = self.my_logger.warning
+		self.m_stream_replacements = {path: Counter() for path in (REPLACED_MAKE_BEFORE_BREAK, REPLACED_BY_RESTART, REPLACEMENT_FAILED)}
+		self.restarts = []
+
+	def update_state(self, state):
+		pass
+
+	def restart_stream(self, new_cfg):
+		self.restarts.append(new_cfg)
+
+
+def replace_via_sensor(streamer, dies=False):
+	def failing_replace(new_cfg, ready_timeout):
+		if dies:
+			streamer.process.kill()
+		raise OSError('cvlc: not found')
+	streamer.replace = failing_replace
+	sensor = Sensor(streamer)
+	control = CaptureControl(0, OLD.codec, OLD.bitrate, OLD.channels, OLD.samplerate)
+	control.update(bitrate=NEW.bitrate)
+	assert sensor.replace_stream(control) == 1
+	return sensor
+
+
+def test_failed_replacement_of_a_running_stream_is_not_restarted(streamer):
+	sensor = replace_via_sensor(streamer)
+	assert sensor.restarts == [] and sensor.m_stream_replacements[REPLACEMENT_FAILED].value == 1
+
+
+def test_failed_replacement_of_a_dead_stream_is_restarted_once(streamer):
+	sensor = replace_via_sensor(streamer, dies=True)
+	assert sensor.restarts == [NEW] and sensor.m_stream_replacements[REPLACED_BY_RESTART].value == 1
+
+
+##=============================================================================
+
+class FakeProcess():
+	def __init__(self, settings):
+		self.settings = settings
+		self.pid = None
+		self.returncode = None
+
+	def poll(self):
+		return self.returncode
+
+	def kill(self):
+		self.returncode = -9
+
+	def wait(self):
+		return self.returncode
+
+
+class FakeProbe():
+	""" StreamPacketProbe stand-in: the old encoder is heard in the survey; the new one only if 'new_source' is set. """
+	def __init__(self, new_source):
+		self.new_source = new_source
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		pass
+
+	def sources(self, duration):
+		return {'rtp:00000001'}
+
+	def wait_for_source(self, timeout, exclude=()):
+		return self.new_source
+
+
+class Logger():
+	def __init__(self):
+		self.lines = []
+
+	def info(self, msg):
+		self.lines.append(msg)
+
+	def warning(self, msg):
+		self.lines.append(msg)
+
+
+@pytest.fixture
+def streamer(monkeypatch):
+	streamer = VLCAudioStreamer('s', OLD, '239.255.12.42', logger=Logger(), use_nohup=False)
+	streamer.launches = []
+
+	def launch(cmd, use_shell=False):
+		if getattr(streamer, 'launch_error', None):
+			raise streamer.launch_error
+		process = FakeProcess(streamer.cfg)
+		streamer.launches.append(process)
+		return process
+
+	monkeypatch.setattr(streamer, 'launch', launch)
+	monkeypatch.setattr(vlc_audio_util, 'sleep', lambda seconds: None)
+	monkeypatch.setattr(vlc_audio_util, 'wait_for_stream_packets', lambda *args: 'rtp:00000002')
+	streamer.stream_start()
+	return streamer
+
+
+def test_make_before_break(streamer, monkeypatch):
+	monkeypatch.setattr(vlc_audio_util, 'StreamPacketProbe', lambda *args: FakeProbe('rtp:00000002'))
+	old_process = streamer.process
+	assert streamer.replace(NEW) == REPLACED_MAKE_BEFORE_BREAK
+	assert old_process.returncode == -9 and streamer.process.settings == NEW and streamer.is_running
+
+
+def test_silent_new_encoder_keeps_the_old_stream(streamer, monkeypatch):
+	monkeypatch.setattr(vlc_audio_util, 'StreamPacketProbe', lambda *args: FakeProbe(None))
+	old_process = streamer.process
+	assert streamer.replace(NEW) == REPLACEMENT_FAILED
+	assert streamer.process is old_process and streamer.is_running and streamer.cfg == OLD
+	assert streamer.launches[-1].returncode == -9
+
+
+def test_unwatchable_group_falls_back_to_one_restart(streamer, monkeypatch):
+	def unbindable(*args):
+		raise OSError('Address already in use')
+	monkeypatch.setattr(vlc_audio_util, 'StreamPacketProbe', unbindable)
+	monkeypatch.setattr(vlc_audio_util, 'wait_for_stream_packets', unbindable)
+	assert streamer.replace(NEW) == REPLACED_BY_RESTART
+	assert len(streamer.launches) == 2 and streamer.process.settings == NEW and streamer.is_running
+	assert any('Cannot verify the restarted stream' in line for line in streamer.stream_log.lines)
+
+
+def test_exclusive_input_is_restarted(streamer):
+	streamer.cfg = dataclasses.replace(OLD, tx_mrl='alsa://hw:Microphone')
+	assert streamer.replace(dataclasses.replace(NEW, tx_mrl='alsa://hw:Microphone')) == REPLACED_BY_RESTART
+	assert len(streamer.launches) == 2 and streamer.launches[0].returncode == -9
+
+
+def test_stopped_stream_is_started(streamer):
+	streamer.stream_stop()
+	assert streamer.replace(NEW) == REPLACED_BY_RESTART
+	assert streamer.is_running and streamer.process.settings == NEW
+
+
+def test_launch_failure_leaves_the_old_stream_and_settings(streamer, monkeypatch):
+	monkeypatch.setattr(vlc_audio_util, 'StreamPacketProbe', lambda *args: FakeProbe('rtp:00000002'))
+	old_process = streamer.process
+	streamer.launch_error = OSError('cvlc: not found')
+	with pytest.raises(OSError):
+		streamer.replace(NEW)
+	assert streamer.process is old_process and streamer.is_running and streamer.cfg == OLD
+
+
+
+class Counter():
+	def __init__(self):
+		self.value = 0
+
+	def inc(self, amount=1):
+		self.value += amount
+
+
+class Sensor():
+	""" The parts of MicrophoneSensor that replace_stream() uses; restart_stream() is only counted. """
+	replace_stream = MicrophoneSensor.replace_stream
+
+	def __init__(self, streamer):
+		self.streamer = streamer
+		self.synth_source = None
+		self.stream_ready_timeout = 1.0
+		self.my_logger = streamer.stream_log
+		self.my_logger.error = self.my_logger.warning
+		self.m_stream_replacements = {path: Counter() for path in (REPLACED_MAKE_BEFORE_BREAK, REPLACED_BY_RESTART, REPLACEMENT_FAILED)}
+		self.restarts = []
+
+	def update_state(self, state):
+		pass
+
+	def restart_stream(self, new_cfg):
+		self.restarts.append(new_cfg)
+
+
+def replace_via_sensor(streamer, dies=False):
+	def failing_replace(new_cfg, ready_timeout):
+		if dies:
+			streamer.process.kill()
+		raise OSError('cvlc: not found')
+	streamer.replace = failing_replace
+	sensor = Sensor(streamer)
+	control = CaptureControl(0, OLD.codec, OLD.bitrate, OLD.channels, OLD.samplerate)
+	control.update(bitrate=NEW.bitrate)
+	assert sensor.replace_stream(control) == 1
+	return sensor
+
+
+def test_failed_replacement_of_a_running_stream_is_not_restarted(streamer):
+	sensor = replace_via_sensor(streamer)
+	assert sensor.restarts == [] and sensor.m_stream_replacements[REPLACEMENT_FAILED].value == 1
+
+
+def test_failed_replacement_of_a_dead_stream_is_restarted_once(streamer):
+	sensor = replace_via_sensor(streamer, dies=True)
+	assert sensor.restarts == [NEW] and sensor.m_stream_replacements[REPLACED_BY_RESTART].value == 1
+
+
+##=============================================================================
@@ -0,0 +1,96 @@
+import os
+import time
+import numpy as np
+import pytest
+from synthetic_audio import SyntheticAudioSource
+
+##=============================================================================
+
+def read_exactly(fd, size, timeout=5.0):
+	data, deadline = b'', time.monotonic() + timeout
+	while len(data) < size and time.monotonic() < deadline:
+		data += os.read(fd, size - len(data))
+	return data
+
+
+def test_invalid_sources():
+	with pytest.raises(ValueError, match='Unknown synthetic source kind'):
+		SyntheticAudioSource('s', kind='square')
+	with pytest.raises(ValueError, match='requires a source_file'):
+		SyntheticAudioSource('s', kind='file')
+
+
+def test_vlc_input(tmp_path):
+	source = SyntheticAudioSource('s', samplerate=22050, channels=1, fifo_path=str(tmp_path / 's.pcm'))
+	assert source.mrl == f"file://{tmp_path / 's.pcm'}"
+	assert source.vlc_input_opts == "--demux=rawaud --rawaud-channels=1 --rawaud-samplerate=22050 --rawaud-fourcc=s16l"
+
+
+def test_tone_is_continuous_across_blocks():
+	source = SyntheticAudioSource('s', samplerate=8000, channels=2, frequency=1000.0, amplitude=0.5)
+	first = source.generate(80)
+	source.frames_written += 80
+	second = source.generate(80)
+	assert first.dtype == np.dtype('<i2') and first.shape == (80, 2)
+	assert np.array_equal(first[:, 0], first[:, 1])
+	expected = 0.5 * np.sin(2.0 * np.pi * 1000.0 * np.arange(160) / 8000) * 32767.0
+	assert np.allclose(np.concatenate([first, second])[:, 0], expected, atol=1.0)
+
+
+def test_noise_level():
+	source = SyntheticAudioSource('s', kind='noise', samplerate=8000, channels=1, amplitude=0.1)
+	block = source.generate(8000) / 32767.0
+	assert np.sqrt(np.mean(block ** 2)) == pytest.approx(0.1, rel=0.1)
+
+
+def test_file_source_is_looped_resampled_and_channel_mapped(make_wav):
+	path = make_wav('loop.wav', np.linspace(-0.5, 0.5, 400), samplerate=8000)
+	source = SyntheticAudioSource('s', kind='file', source_file=path, samplerate=16000, channels=2)
+	block = source.generate(1000)
+	assert block.shape == (1000, 2) and np.array_equal(block[:, 0], block[:, 1])
+	assert np.array_equal(block[:200], block[800:1000])   ## 400 frames at 8 kHz --> an 800-frame loop at 16 kHz
+	assert block[0, 0] == pytest.approx(-0.5 * 32767, abs=1)
+
+
+def test_stream_through_the_fifo(tmp_path):
+	source = SyntheticAudioSource('s', samplerate=8000, channels=1, fifo_path=str(tmp_path / 's.pcm'), block_seconds=0.01)
+	source.start()
+	try:
+		fd = os.open(source.fifo_path, os.O_RDONLY)
+		data = read_exactly(fd, 320)
+		os.close(fd)
+		assert len(data) == 320
+		assert np.array_equal(np.frombuffer(data, dtype='<i2'), SyntheticAudioSource('t', samplerate=8000, channels=1).generate(160)[:, 0])
+
+		fd = os.open(source.fifo_path, os.O_RDONLY)   ## The reader went away and came back
+		assert len(read_exactly(fd, 320)) == 320
+		os.close(fd)
+		assert source.is_running
+	finally:
+		source.stop()
+	assert not source.is_running
+
+
+def test_generation_errors_stop_the_source(tmp_path):
+	messages = []
+
+	class Logger():
+		def info(self, msg):
+			messages.append(('info', msg))
+
+		def error(self, msg):
+			messages.append(('error', msg))
+
+	source = SyntheticAudioSource('s', kind='file', source_file=str(tmp_path / 'missing.wav'),
+								  fifo_path=str(tmp_path / 's.pcm'), logger=Logger())
+	source.start()
+	fd = os.open(source.fifo_path, os.O_RDONLY)
+	deadline = time.monotonic() + 5.0
+	while source.is_running and time.monotonic() < deadline:
+		time.sleep(0.01)
+	os.close(fd)
+	assert not source.is_running
+	assert [level for level, msg in messages if 'failed' in msg] == ['error']
+
+
+##=============================================================================
@@ -0,0 +1,279 @@
+import threading
+import pytest
+import microphone
+from microphone import MicrophoneSensor
+from upload_scheduler import CALIBRATION, CLIP, UploadScheduler, upload_class
+
+
+class Response():
+	def __init__(self, status_code=200, text=''):
+		self.status_code = status_code
+		self.text = text
+
+
+class Counter():
+	def __init__(self):
+		self.value = 0
+
+	def inc(self, amount=1):
+		self.value += amount
+
+	def observe(self, value):
+		self.value += 1
+
+
+class Logger():
+	def info(self, msg):
+		pass
+
+	def error(self, msg):
+		pass
+
+
+class Uploader():
+	""" The parts of MicrophoneSensor that upload_clip() uses, with the CDN answering 'fileid' && 'status'. """
+	upload_clip = MicrophoneSensor.upload_clip
+
+	def __init__(self):
+		self.my_logger = Logger()
+		self.cdn_base_url = 'http://cdn'
+		self.upload_bucket = None
+		self.sha_cache = set()
+		self.sha_cache_lock = threading.Lock()
+		self.m_upload_seconds, self.m_upload_bytes, self.m_upload_failures = Counter(), Counter(), Counter()
+		self.alerts = []
+
+	def already_uploaded(self, sha):
+		return None
+
+	def queue_hash_alert(self, kafka_q, message):
+		self.alerts.append(message["sha"])
+
+
+@pytest.fixture
+def cdn(monkeypatch):
+	replies = {}
+	monkeypatch.setattr(microphone, 'DRY_RUN', False)
+	monkeypatch.setattr(microphone.requests, 'post', lambda url, **kwargs: Response(text=f"Uploaded {replies['fileid']}"))
+	monkeypatch.setattr(microphone.requests, 'get', lambda url: Response(replies['status']))
+	return replies
+
+
+def upload(tmp_path, cdn, fileid, status):
+	path = tmp_path / 'clip.wav'
+	path.write_bytes(b'RIFF')
+	cdn.update(fileid=fileid, status=status)
+	uploader = Uploader()
+	result = uploader.upload_clip(None, {"filename": str(path), "sha": 'a' * 40, "file_size": 4})
+	return result, uploader, path
+
+
+def test_confirmed_upload_deletes_the_clip(tmp_path, cdn):
+	result, uploader, path = upload(tmp_path, cdn, 'a' * 40, 200)
+	assert result is True and not path.exists()
+	assert uploader.sha_cache == {'a' * 40} and uploader.alerts == ['a' * 40]
+	assert uploader.m_upload_failures.value == 0
+
+
+def test_sha_mismatch_is_retried_even_if_confirmed(tmp_path, cdn):
+	result, uploader, path = upload(tmp_path, cdn, 'b' * 40, 200)
+	assert result is False and path.exists()   ## Re-queued with backoff by the caller; the file stays
+	assert uploader.sha_cache == set() and uploader.alerts == []
+	assert uploader.m_upload_failures.value == 1
+
+
+def test_unconfirmed_upload_is_retried(tmp_path, cdn):
+	result, uploader, path = upload(tmp_path, cdn, 'a' * 40, 404)
+	assert result is False and path.exists() and uploader.alerts == []
+
+
+##=============================================================================
+
+def clip(name, created, calibration=False):
+	return {"filename": name, "created": created, "calibration": calibration}
+
+
+def drain(scheduler):
+	""" Takes every uploadable message, completing each before taking the next. """
+	names = []
+	while True:
+		message = scheduler.next()
+		if message is None:
+			return names
+		scheduler.done(message)
+		names.append(message["filename"])
+
+
+def test_upload_class():
+	assert upload_class(clip('a', 1, calibration=True)) == CALIBRATION
+	assert upload_class(clip('b', 1)) == CLIP
+	assert upload_class({"filename": 'c'}) == CLIP
+
+
+def test_oldest_first_with_calibration_ahead(clock):
+	scheduler = UploadScheduler({CALIBRATION: 1, CLIP: 1})
+	for message in (clip('b', 20), clip('a', 10), clip('cal', 30, calibration=True), clip('c', 30)):
+		scheduler.add(message)
+	assert len(scheduler) == 4
+	assert drain(scheduler) == ['cal', 'a', 'b', 'c']
+	assert len(scheduler) == 0
+
+
+def test_newest_first(clock):
+	scheduler = UploadScheduler({CLIP: 1}, drain_order='newest')
+	for message in (clip('a', 10), clip('c', 30), clip('b', 20)):
+		scheduler.add(message)
+	assert drain(scheduler) == ['c', 'b', 'a']
+
+
+def test_equal_keys_keep_arrival_order(clock):
+	scheduler = UploadScheduler({CLIP: 1})
+	for name in 'xyz':
+		scheduler.add(clip(name, 5))
+	assert drain(scheduler) == ['x', 'y', 'z']
+
+
+def test_invalid_drain_order():
+	with pytest.raises(ValueError, match='drain_order'):
+		UploadScheduler({}, drain_order='random')
+
+
+def test_per_class_concurrency_limits(clock):
+	scheduler = UploadScheduler({CALIBRATION: 1, CLIP: 2})
+	for index in range(4):
+		scheduler.add(clip(f'c{index}', index))
+	scheduler.add(clip('cal0', 0, calibration=True))
+	scheduler.add(clip('cal1', 1, calibration=True))
+
+	taken = [scheduler.next() for _ in range(3)]
+	assert [m["filename"] for m in taken] == ['cal0', 'c0', 'c1']
+	assert scheduler.next() is None 	## Both classes are at their limit
+	assert scheduler.in_flight(CALIBRATION) == 1 and scheduler.in_flight(CLIP) == 2
+	assert scheduler.pending(CALIBRATION) == 1 and scheduler.pending(CLIP) == 2
+
+	scheduler.done(taken[1])
+	assert scheduler.next()["filename"] == 'c2' 		## A clip slot is free; the calibration slot is not
+	scheduler.done(taken[0])
+	assert scheduler.next()["filename"] == 'cal1'
+
+
+def test_limits_are_at_least_one(clock):
+	scheduler = UploadScheduler({CLIP: 0})
+	assert scheduler.limits == {CALIBRATION: 1, CLIP: 1}
+
+
+def test_retry_backoff_doubles_up_to_the_cap(clock):
+	scheduler = UploadScheduler({CLIP: 1}, retry_base=1.0, retry_max=5.0)
+	message = clip('a', 10)
+	delays = [scheduler.retry(message) for _ in range(5)]
+	assert delays == [1.0, 2.0, 4.0, 5.0, 5.0]
+	assert message["attempts"] == 5
+
+
+def test_retried_message_waits_for_its_delay(clock):
+	scheduler = UploadScheduler({CLIP: 1}, retry_base=2.0)
+	message = clip('a', 10)
+	scheduler.add(message)
+	scheduler.done(scheduler.next())
+	assert scheduler.retry(message) == 2.0
+	assert scheduler.pending(CLIP) == 1 and len(scheduler) == 1
+
+	clock.advance(1.9)
+	assert scheduler.next() is None
+	clock.advance(0.1)
+	assert scheduler.next() is message
+
+
+def test_retried_message_keeps_its_place(clock):
+	scheduler = UploadScheduler({CLIP: 1}, retry_base=1.0)
+	old = clip('old', 10)
+	scheduler.retry(old)
+	scheduler.add(clip('new', 20))
+	clock.advance(1.0)
+	assert drain(scheduler) == ['old', 'new']
+
+
+
+class Response():
+	def __init__(self, status_code=200, text=''):
+		self.status_code = status_code
+		self.text = text
+
+
+class Counter():
+	def __init__(self):
+		self.value = 0
+
+	def inc(self, amount=1):
+		self.value += amount
+
+	def observe(self, value):
+		self.value += 1
+
+
+class Logger():
+	def info(self, msg):
+		pass
+
+	def error(self, msg):
+		pass
+
+
+class Uploader():
+	""" The parts of MicrophoneSensor that upload_clip() uses, with the CDN answering 'fileid' && 'status'. """
+	upload_clip = MicrophoneSensor.upload_clip
+
+	def __init__(self):
+		self.my_logger = Logger()
+		self.cdn_base_url = 'http://cdn'
+		self.upload_bucket = None
+		self.sha_cache = set()
+		self.sha_cache_lock = threading.Lock()
+		self.m_upload_seconds, self.m_upload_bytes, self.m_upload_failures = Counter(), Counter(), Counter()
+		self.alerts = []
+
+	def already_uploaded(self, sha):
+		return None
+
+	def queue_hash_alert(self, kafka_q, message):
+		self.alerts.append(message["sha"])
+
+
+@pytest.fixture
+def cdn(monkeypatch):
+	replies = {}
+	monkeypatch.setattr(microphone, 'DRY_RUN', False)
+	monkeypatch.setattr(microphone.requests, 'post', lambda url, **kwargs: Response(text=f"Uploaded {replies['fileid']}"))
+	monkeypatch.setattr(microphone.requests, 'get', lambda url: Response(replies['status']))
+	return replies
+
+
+def upload(tmp_path, cdn, fileid, status):
+	path = tmp_path / 'clip.wav'
+	path.write_bytes(b'RIFF')
+	cdn.update(fileid=fileid, status=status)
+	uploader = Uploader()
+	result = uploader.upload_clip(None, {"filename": str(path), "sha": 'a' * 40, "file_size": 4})
+	return result, uploader, path
+
+
+def test_confirmed_upload_deletes_the_clip(tmp_path, cdn):
+	result, uploader, path = upload(tmp_path, cdn, 'a' * 40, 200)
+	assert result is True and not path.exists()
+	assert uploader.sha_cache == {'a' * 40} and uploader.alerts == ['a' * 40]
+	assert uploader.m_upload_failures.value == 0
+
+
+def test_sha_mismatch_is_retried_even_if_confirmed(tmp_path, cdn):
+	result, uploader, path = upload(tmp_path, cdn, 'b' * 40, 200)
+	assert result is False and path.exists()   ## Re-queued with backoff by the caller; the file stays
+	assert uploader.sha_cache == set() and uploader.alerts == []
+	assert uploader.m_upload_failures.value == 1
+
+
+def test_unconfirmed_upload_is_retried(tmp_path, cdn):
+	result, uploader, path = upload(tmp_path, cdn, 'a' * 40, 404)
+	assert result is False and path.exists() and uploader.alerts == []
+
+
+##=============================================================================
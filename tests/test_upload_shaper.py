@@ -0,0 +1,218 @@
+import pytest
+from upload_shaper import TokenBucket, ThrottledMultipart, UploadRateController, parse_tc_stats, default_interface
+
+##=============================================================================
+
+class StubBucket():
+	""" Records the rate set by the controller; tests move 'bytes' and 'waited' as uploads would. """
+	def __init__(self):
+		self.rate = None
+		self.bytes = 0
+		self.waited = 0.0
+
+	def set_rate(self, rate):
+		self.rate = rate
+
+
+class StubEgress():
+	def __init__(self):
+		self.congestion = False
+
+	def congested(self):
+		return self.congestion
+
+
+def close_window(controller, bucket, clock, achieved_bps, throttled, seconds=5.0):
+	""" Simulates 'seconds' of uploading at 'achieved_bps', held back by the bucket or not, then updates. """
+	clock.advance(seconds)
+	bucket.bytes += int(achieved_bps * seconds / 8)
+	if throttled:
+		bucket.waited += seconds / 2
+	controller.update(True)
+
+
+##=============================================================================
+## TokenBucket
+
+def test_unlimited_bucket_only_counts(clock):
+	bucket = TokenBucket()
+	assert bucket.consume(10 ** 9) == 0.0
+	assert bucket.bytes == 10 ** 9 and bucket.waited == 0.0 and clock.slept == 0.0
+
+
+def test_bucket_waits_for_tokens(clock):
+	bucket = TokenBucket(rate=1000, burst=500)
+	assert bucket.consume(500) == 0.0 			## The burst goes out at once
+	assert bucket.consume(1000) == pytest.approx(1.0)
+	assert bucket.consume(100) == pytest.approx(0.1)
+	assert clock.slept == pytest.approx(1.1)
+	assert bucket.waited == pytest.approx(1.1)
+	assert bucket.bytes == 1600
+
+
+def test_bucket_refills_up_to_the_burst(clock):
+	bucket = TokenBucket(rate=1000, burst=500)
+	bucket.consume(500)
+	clock.advance(60.0)
+	assert bucket.consume(500) == 0.0
+	assert bucket.consume(250) == pytest.approx(0.25)
+
+
+def test_bucket_rate_change(clock):
+	bucket = TokenBucket(rate=1000, burst=100)
+	bucket.consume(100)
+	bucket.set_rate(4000)
+	assert bucket.consume(400) == pytest.approx(0.1)
+	bucket.set_rate(None)
+	assert bucket.rate is None and bucket.consume(10 ** 6) == 0.0
+
+
+##=============================================================================
+## ThrottledMultipart
+
+def test_multipart_body(tmp_path, clock):
+	path = tmp_path / 'clip.wav'
+	payload = bytes(range(256)) * 200
+	path.write_bytes(payload)
+	bucket = TokenBucket()
+	with ThrottledMultipart(str(path), bucket, field='files', chunk_size=1000) as body:
+		chunks = []
+		while True:
+			chunk = body.read(4096)
+			if not chunk:
+				break
+			assert len(chunk) <= 1000
+			chunks.append(chunk)
+		data = b''.join(chunks)
+		assert len(body) == len(data) == bucket.bytes
+		assert body.content_type == f'multipart/form-data; boundary={body.boundary}'
+
+	head = (f'--{body.boundary}\r\nContent-Disposition: form-data; name="files"; filename="clip.wav"\r\n'
+			f'Content-Type: application/octet-stream\r\n\r\n').encode()
+	assert data == head + payload + f'\r\n--{body.boundary}--\r\n'.encode()
+
+
+def test_multipart_body_is_paced_by_the_bucket(tmp_path, clock):
+	path = tmp_path / 'clip.wav'
+	path.write_bytes(b'\0' * 20000)
+	bucket = TokenBucket(rate=10000, burst=1000)
+	with ThrottledMultipart(str(path), bucket) as body:
+		while body.read():
+			pass
+		assert clock.slept == pytest.approx((len(body) - 1000) / 10000.0)
+
+
+##=============================================================================
+## Egress statistics
+
+def test_parse_tc_stats():
+	output = ("qdisc fq_codel 0: root refcnt 2 limit 10240p flows 1024 quantum 1514 target 5ms interval 100ms\n"
+			  " Sent 12345678 bytes 9876 pkt (dropped 42, overlimits 0 requeues 3)\n"
+			  " backlog 48Kb 33p requeues 3\n")
+	assert parse_tc_stats(output) == (42, 48 * 1024)
+	assert parse_tc_stats(" Sent 0 bytes 0 pkt (dropped 0, overlimits 0 requeues 0)\n backlog 0b 0p requeues 0\n") == (0, 0)
+	assert parse_tc_stats('') == (0, 0)
+
+
+def test_default_interface(tmp_path):
+	route = tmp_path / 'route'
+	route.write_text("Iface\tDestination\tGateway\tFlags\n"
+					 "eth0\t0000A8C0\t00000000\t0001\n"
+					 "wlan0\t00000000\t0100A8C0\t0003\n")
+	assert default_interface(str(route)) == 'wlan0'
+	assert default_interface(str(tmp_path / 'missing')) is None
+
+
+##=============================================================================
+## UploadRateController
+
+def test_configured_link_leaves_headroom_and_the_stream(clock):
+	bucket = StubBucket()
+	controller = UploadRateController(bucket, stream_bps=256000, link_bps=2000000, headroom=0.2)
+	assert controller.limit_bps() == pytest.approx(2000000 * 0.8 - 256000)
+	assert bucket.rate == pytest.approx(controller.limit_bps() / 8)
+
+	controller.update(False, stream_bps=1900000)
+	assert controller.limit_bps() == controller.min_bps 	## Never below the floor
+
+
+def test_slow_start_from_min_rate(clock):
+	bucket = StubBucket()
+	controller = UploadRateController(bucket, stream_bps=256000, min_bps=64000, window=5.0)
+	assert controller.capacity_bps is None
+	assert bucket.rate == pytest.approx(64000 / 8)
+	for expected in (128000, 256000, 512000):
+		close_window(controller, bucket, clock, achieved_bps=controller.limit_bps(), throttled=True)
+		assert controller.limit_bps() == expected
+
+
+def test_link_bound_window_sets_the_capacity(clock):
+	bucket = StubBucket()
+	controller = UploadRateController(bucket, stream_bps=256000, headroom=0.2, window=5.0)
+	close_window(controller, bucket, clock, achieved_bps=1000000, throttled=False)
+	assert controller.capacity_bps == pytest.approx(1256000, rel=1e-3)
+	assert controller.limit_bps() == pytest.approx(1256000 * 0.8 - 256000, rel=1e-3)
+
+
+def test_capacity_grows_at_most_once_per_probe_interval(clock):
+	bucket = StubBucket()
+	controller = UploadRateController(bucket, stream_bps=256000, headroom=0.2, window=5.0, probe_interval=300.0)
+	close_window(controller, bucket, clock, achieved_bps=1000000, throttled=False)
+	capacity = controller.capacity_bps
+	for _ in range(10): 	## 50 s of throttled windows: no growth yet
+		close_window(controller, bucket, clock, achieved_bps=controller.limit_bps(), throttled=True)
+	assert controller.capacity_bps == capacity
+
+	clock.advance(300.0)
+	controller.update(False)
+	close_window(controller, bucket, clock, achieved_bps=controller.limit_bps(), throttled=True)
+	assert controller.capacity_bps == pytest.approx(capacity * 1.1)
+	assert controller.limit_bps() == pytest.approx(controller.capacity_bps * 0.8 - 256000) 	## No probe above the headroom
+
+
+def test_idle_time_does_not_count_towards_a_window(clock):
+	bucket = StubBucket()
+	controller = UploadRateController(bucket, stream_bps=256000, window=5.0)
+	clock.advance(4.0)
+	controller.update(True)
+	clock.advance(60.0)
+	controller.update(False)
+	clock.advance(4.0)
+	bucket.waited += 2.0
+	controller.update(True)
+	assert controller.limit_bps() == controller.min_bps
+
+
+def test_congestion_backs_off_and_recovers(clock):
+	bucket = StubBucket()
+	egress = StubEgress()
+	controller = UploadRateController(bucket, stream_bps=256000, headroom=0.2, window=5.0, egress=egress)
+	close_window(controller, bucket, clock, achieved_bps=1000000, throttled=False)
+	limit = controller.limit_bps()
+
+	egress.congestion = True
+	clock.advance(0.25)
+	controller.update(True)
+	assert controller.congestion_scale == 0.5
+	assert controller.capacity_bps == pytest.approx(limit + 256000) 	## Capped at the rate that congested the egress
+	assert controller.limit_bps() == pytest.approx(((limit + 256000) * 0.8 - 256000) * 0.5)
+	assert bucket.rate == pytest.approx(controller.limit_bps() / 8)
+
+	egress.congestion = False
+	close_window(controller, bucket, clock, achieved_bps=controller.limit_bps(), throttled=True, seconds=4.75)
+	assert controller.congestion_scale == 0.625
+
+
+def test_congestion_ends_slow_start(clock):
+	bucket = StubBucket()
+	egress = StubEgress()
+	controller = UploadRateController(bucket, stream_bps=256000, min_bps=64000, window=5.0, egress=egress)
+	close_window(controller, bucket, clock, achieved_bps=64000, throttled=True)
+	egress.congestion = True
+	clock.advance(0.25)
+	controller.update(True)
+	assert controller.capacity_bps == pytest.approx(128000 + 256000)
+	assert controller.limit_bps() == controller.min_bps
+
+
+##=============================================================================
@@ -0,0 +1,87 @@
+import time
+import heapq
+import itertools
+
+"""
+Priority scheduling of CDN uploads.
+
+Clips waiting for upload are held per class, and next() hands out the most urgent one whose class has a free
+upload slot:
+
+	- 'calibration' clips always go first (an operator is waiting on their profile), on their own slot(s), so they
+	  never queue behind a backlog of regular clips.
+	- 'clip' clips drain in 'oldest' (completeness) or 'newest' (freshness) order of their capture time, i.e. the
+	  message's 'created' epoch.
+
+Failed uploads are handed back through retry(): they keep their class and place in the drain order, but are held
+back for an exponentially growing delay (capped at 'retry_max' seconds) so a down CDN is not hammered.
+
+Not thread-safe: all methods are called from the posting process's scheduling loop only.
+"""
+
+CALIBRATION = 'calibration'
+CLIP = 'clip'
+UPLOAD_CLASSES = (CALIBRATION, CLIP)   ## In priority order
+DRAIN_ORDERS = ('oldest', 'newest')
+
+##=============================================================================
+
+def upload_class(message):
+	return CALIBRATION if message.get("calibration") else CLIP
+
+
+class UploadScheduler():
+	"""
+	Per-class priority queues of post_queue messages with per-class concurrency limits ({class: max uploads}).
+	"""
+	def __init__(self, limits, drain_order='oldest', retry_base=1.0, retry_max=60.0):
+		if drain_order not in DRAIN_ORDERS:
+			raise ValueError(f"drain_order must be one of {DRAIN_ORDERS}, not {drain_order!r}")
+		self.limits = {name: max(1, limits.get(name, 1)) for name in UPLOAD_CLASSES}
+		self.drain_order = drain_order
+		self.retry_base = retry_base
+		self.retry_max = retry_max
+		self.__ready = {name: [] for name in UPLOAD_CLASSES}
+		self.__delayed = []   ## (not_before, seq, message) heap of failed uploads waiting to be retried
+		self.__in_flight = {name: 0 for name in UPLOAD_CLASSES}
+		self.__seq = itertools.count()   ## Tie-breaker: equal keys keep their arrival order
+
+	def __len__(self):
+		return sum(len(heap) for heap in self.__ready.values()) + len(self.__delayed)
+
+	def pending(self, name):
+		""" Clips of class 'name' waiting for upload (including those waiting to be retried). """
+		return len(self.__ready[name]) + sum(1 for _, _, message in self.__delayed if upload_class(message) == name)
+
+	def in_flight(self, name):
+		return self.__in_flight[name]
+
+	def add(self, message):
+		created = message.get("created") or 0.0
+		key = -created if self.drain_order == 'newest' else created
+		heapq.heappush(self.__ready[upload_class(message)], (key, next(self.__seq), message))
+
+	def retry(self, message):
+		""" Re-queues a failed upload after a backoff that doubles with each consecutive failure. """
+		message["attempts"] = message.get("attempts", 0) + 1
+		delay = min(self.retry_max, self.retry_base * 2 ** (message["attempts"] - 1))
+		heapq.heappush(self.__delayed, (time.monotonic() + delay, next(self.__seq), message))
+		return delay
+
+	def next(self):
+		""" Returns the most urgent uploadable message (counting it as in flight until done()), or None. """
+		now = time.monotonic()
+		while self.__delayed and self.__delayed[0][0] <= now:
+			self.add(heapq.heappop(self.__delayed)[2])
+		for name in UPLOAD_CLASSES:
+			if self.__ready[name] and self.__in_flight[name] < self.limits[name]:
+				self.__in_flight[name] += 1
+				return heapq.heappop(self.__ready[name])[2]
+		return None
+
+	def done(self, message):
+		""" Frees the upload slot taken by next() for 'message'. """
+		self.__in_flight[upload_class(message)] -= 1
+
+
+##=============================================================================
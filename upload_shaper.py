@@ -0,0 +1,273 @@
+import os
+import re
+import time
+import uuid
+import shutil
+import threading
+import subprocess
+
+"""
+Upload bandwidth shaping, so that CDN backlog drains leave room on the uplink for the live RTP multicast.
+
+	- TokenBucket: thread-safe byte-rate limiter shared by all upload threads (rate None = unlimited).
+	- ThrottledMultipart: streaming multipart/form-data body of one clip whose read() draws from the bucket, so the
+	  upload goes out at the shaped rate (instead of requests encoding the whole file in memory and sending it flat out).
+	- EgressMonitor: congestion signals (tx drops, qdisc drops && backlog) of the interface the multicast leaves by.
+	- UploadRateController: sets the bucket's rate to the link capacity -- configured, or measured by a slow start
+	  from 'min_bps' -- less the live stream's bitrate (plus packet overhead) and a headroom fraction, and backs off
+	  when the egress interface shows congestion while uploads run.
+
+The controller is not thread-safe: update() is called from the posting process's scheduling loop only.
+"""
+
+STREAM_OVERHEAD = 1.1   ## RTP/UDP/IP headers on top of the codec bitrate
+
+##=============================================================================
+
+class TokenBucket():
+	""" Rate limiter in bytes per second, with a 'burst' of bytes that may be sent at once. """
+	def __init__(self, rate=None, burst=65536):
+		self.burst = burst
+		self.bytes = 0 				## Total bytes consumed
+		self.waited = 0.0 			## Total seconds callers were held back
+		self.__rate = rate
+		self.__tokens = float(burst)
+		self.__last = time.monotonic()
+		self.__lock = threading.Lock()
+
+	@property
+	def rate(self):
+		return self.__rate
+
+	def set_rate(self, rate):
+		with self.__lock:
+			self.__refill()
+			self.__rate = rate
+
+	def __refill(self):
+		now = time.monotonic()
+		if self.__rate is not None:
+			self.__tokens = min(float(self.burst), self.__tokens + (now - self.__last) * self.__rate)
+		self.__last = now
+
+	def consume(self, n):
+		""" Takes 'n' bytes' worth of tokens, sleeping until they have accrued; returns the seconds waited. """
+		with self.__lock:
+			self.bytes += n
+			if self.__rate is None:
+				return 0.0
+			self.__refill()
+			self.__tokens -= n   ## May go negative: later callers then wait for this reservation too
+			wait = -self.__tokens / self.__rate if self.__tokens < 0 else 0.0
+			self.waited += wait
+		if wait > 0:
+			time.sleep(wait)
+		return wait
+
+
+class ThrottledMultipart():
+	"""
+	File-like multipart/form-data body (a single 'field' part holding the file at 'path') for requests' 'data'
+	argument; its length is known up front, so it is sent with a Content-Length rather than chunked.
+	"""
+	def __init__(self, path, bucket, field='files', chunk_size=16384):
+		self.bucket = bucket
+		self.chunk_size = chunk_size
+		self.boundary = uuid.uuid4().hex
+		filename = os.path.basename(path)
+		self.__head = (f'--{self.boundary}\r\n'
+					   f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+					   f'Content-Type: application/octet-stream\r\n\r\n').encode()
+		self.__tail = f'\r\n--{self.boundary}--\r\n'.encode()
+		self.__length = len(self.__head) + os.path.getsize(path) + len(self.__tail)
+		self.__file = open(path, 'rb')
+		self.__pending = self.__head
+
+	@property
+	def content_type(self):
+		return f'multipart/form-data; boundary={self.boundary}'
+
+	def __len__(self):
+		return self.__length
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+	def read(self, size=-1):
+		if size is None or size < 0 or size > self.chunk_size:
+			size = self.chunk_size
+		if self.__pending:
+			data, self.__pending = self.__pending[:size], self.__pending[size:]
+		else:
+			data = self.__file.read(size)
+			if not data and self.__tail:
+				data, self.__tail = self.__tail, b''
+		if data:
+			self.bucket.consume(len(data))
+		return data
+
+	def close(self):
+		self.__file.close()
+
+
+def default_interface(route_path='/proc/net/route'):
+	""" The interface of the IPv4 default route (which the multicast && the uploads leave by), or None. """
+	try:
+		with open(route_path) as f:
+			for line in f.readlines()[1:]:
+				fields = line.split()
+				if len(fields) > 1 and fields[1] == '00000000':
+					return fields[0]
+	except OSError:
+		pass
+	return None
+
+
+def parse_tc_stats(text):
+	""" Returns (dropped packets, backlog bytes) of the first (root) qdisc in 'tc -s qdisc show' output. """
+	dropped = re.search(r'\(dropped (\d+)', text)
+	backlog = re.search(r'backlog (\d+)([KMG]?)b', text)
+	scale = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+	return (int(dropped.group(1)) if dropped else 0,
+			int(backlog.group(1)) * scale[backlog.group(2)] if backlog else 0)
+
+
+class EgressMonitor():
+	"""
+	Congestion signals from the egress path shared by the uploads && the multicast: the interface's tx_dropped and
+	tx_errors counters (sysfs) plus its root qdisc's drops && standing backlog ('tc -s qdisc', if installed).
+	Only the sensor's own NIC is visible, so congestion further upstream (e.g., a Wi-Fi hop) goes unnoticed.
+	"""
+	def __init__(self, interface=None, backlog_bytes=32768, period=1.0, tc=None):
+		self.interface = interface or default_interface()
+		self.backlog_bytes = backlog_bytes
+		self.period = period
+		self.tc = tc if tc is not None else shutil.which('tc')
+		self.dropped = 0 			## Total tx + qdisc drops
+		self.backlog = 0 			## Bytes queued in the qdisc at the last sample
+		self.__last_sample = None
+
+	def __read_counter(self, name):
+		try:
+			with open(f'/sys/class/net/{self.interface}/statistics/{name}') as f:
+				return int(f.read())
+		except (OSError, ValueError):
+			return 0
+
+	def sample(self):
+		""" Re-reads the counters; returns the number of drops since the previous sample. """
+		if not self.interface:
+			return 0
+		dropped = self.__read_counter('tx_dropped') + self.__read_counter('tx_errors')
+		self.backlog = 0
+		if self.tc:
+			try:
+				output = subprocess.run([self.tc, '-s', 'qdisc', 'show', 'dev', self.interface], stdout=subprocess.PIPE,
+										stderr=subprocess.DEVNULL, timeout=2, check=False).stdout.decode('utf-8', 'replace')
+				qdisc_dropped, self.backlog = parse_tc_stats(output)
+				dropped += qdisc_dropped
+			except (OSError, subprocess.SubprocessError):
+				self.tc = None
+		new_drops = max(0, dropped - self.dropped) if self.__last_sample is not None else 0
+		self.dropped = dropped
+		self.__last_sample = time.monotonic()
+		return new_drops
+
+	def congested(self):
+		""" True if the egress dropped packets, or its qdisc held a standing backlog, at this check (at most every 'period' s). """
+		if self.__last_sample is not None and time.monotonic() - self.__last_sample < self.period:
+			return False
+		return self.sample() > 0 or self.backlog > self.backlog_bytes
+
+
+class UploadRateController():
+	"""
+	Adapts a TokenBucket's rate to (capacity * (1 - headroom) - stream bitrate) * congestion scale, bounded below by
+	'min_bps' (rates in bits per second). With 'link_bps' = 0 the capacity is measured: uploads start at 'min_bps'
+	and the cap doubles after each busy window the bucket throttled without egress congestion, until a window is
+	link (or CDN) bound or congested; the rate reached plus the stream is then the capacity estimate. Afterwards the
+	cap never exceeds the estimate's (capacity * (1 - headroom) - stream) -- there are no probes above it -- but at
+	most every 'probe_interval' seconds a window that the bucket throttled without congestion grows the estimate by
+	10%, so a faster link is found gradually. Congestion while uploading halves the congestion scale (and caps the
+	measured capacity at the rate in force); the scale recovers by 25% per window.
+	"""
+	def __init__(self, bucket, stream_bps, link_bps=0, headroom=0.2, min_bps=64000, window=5.0, probe_interval=300.0,
+				 smoothing=0.3, egress=None):
+		self.bucket = bucket
+		self.stream_bps = stream_bps
+		self.measured = not link_bps
+		self.capacity_bps = link_bps or None
+		self.headroom = headroom
+		self.min_bps = min_bps
+		self.window = window
+		self.probe_interval = probe_interval
+		self.smoothing = smoothing
+		self.egress = egress
+		self.congestion_scale = 1.0
+		self.achieved_bps = 0.0
+		self.__start_bps = min_bps 		## Slow-start cap while the capacity is unknown
+		self.__busy_seconds = 0.0
+		self.__window_bytes = bucket.bytes
+		self.__window_waited = bucket.waited
+		self.__last_update = time.monotonic()
+		self.__last_growth = self.__last_update
+		self.bucket.set_rate(self.limit_bps() / 8.0)
+
+	def limit_bps(self):
+		""" The current upload cap. """
+		if self.capacity_bps is None:
+			return self.__start_bps
+		usable = self.capacity_bps * (1.0 - self.headroom) - self.stream_bps
+		return max(self.min_bps, usable * self.congestion_scale)
+
+	def update(self, busy, stream_bps=None):
+		"""
+		Called every few hundred ms with whether uploads are in flight && the live stream's bitrate; reacts to egress
+		congestion, closes a measurement window after 'window' busy seconds and re-sets the bucket's rate.
+		"""
+		now = time.monotonic()
+		elapsed, self.__last_update = now - self.__last_update, now
+		if stream_bps is not None:
+			self.stream_bps = stream_bps
+		if busy and self.egress is not None and self.egress.congested():
+			self.__back_off()
+		if not busy:   ## Windows only span continuous upload activity
+			self.__busy_seconds = 0.0
+			self.__window_bytes, self.__window_waited = self.bucket.bytes, self.bucket.waited
+			return
+		self.__busy_seconds += elapsed
+		if self.__busy_seconds < self.window:
+			return
+		self.achieved_bps = (self.bucket.bytes - self.__window_bytes) * 8.0 / self.__busy_seconds
+		throttled = self.bucket.waited - self.__window_waited > 0.1 * self.__busy_seconds
+		if self.measured and self.achieved_bps > 0:
+			if not throttled:   ## Not held back by the bucket --> link (or CDN) bound
+				sample = self.achieved_bps + self.stream_bps   ## The stream shared the link during the window
+				self.capacity_bps = sample if self.capacity_bps is None else \
+									(1.0 - self.smoothing) * self.capacity_bps + self.smoothing * sample
+			elif self.capacity_bps is None:
+				self.__start_bps *= 2
+			elif self.congestion_scale >= 1.0 and now - self.__last_growth >= self.probe_interval:
+				self.capacity_bps *= 1.1
+				self.__last_growth = now
+		self.congestion_scale = min(1.0, self.congestion_scale * 1.25)
+		self.__busy_seconds = 0.0
+		self.__window_bytes, self.__window_waited = self.bucket.bytes, self.bucket.waited
+		self.bucket.set_rate(self.limit_bps() / 8.0)
+
+	def __back_off(self):
+		rate_bps = self.limit_bps()
+		if self.measured:
+			if self.capacity_bps is None:   ## Slow start overshot
+				self.capacity_bps = rate_bps + self.stream_bps
+			else:
+				self.capacity_bps = min(self.capacity_bps, rate_bps + self.stream_bps)
+		self.congestion_scale = max(0.125, self.congestion_scale / 2)
+		self.__last_growth = time.monotonic()
+		self.bucket.set_rate(self.limit_bps() / 8.0)
+
+
+##=============================================================================
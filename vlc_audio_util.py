@@ -1,9 +1,15 @@
 import os
-from time import sleep
+import re
+import shlex
+import socket
+import struct
+import ipaddress
+import threading
+from time import sleep, monotonic
 from signal import SIGKILL
 from dataclasses import dataclass
+from multiprocessing import Array, Value
 import subprocess as sproc
-import shlex
 
 ##=============================================================================
 
@@ -27,16 +33,297 @@ class VLCAudioSettings:
 	bitrate: int = 128                     		#256
 
 
+##=============================================================================
+
+## Known VLC output lines worth counting, checked in order (first match wins)
+KNOWN_VLC_EVENTS = (
+	('alsa_xrun', re.compile(r'overrun|underrun|xrun', re.I)),
+	('input_error', re.compile(r'(cannot|unable to) open|no such (file|device)|alsa\w*.*(error|fail)', re.I)),
+	('sout_error', re.compile(r'(stream_out|sout|access_out|mux)\w*.*(error|cannot|fail)', re.I)),
+	('error', re.compile(r'\berror\b', re.I)),
+)
+
+class VLCOutputMonitor():
+	"""
+	Collects a VLC child's combined stdout/stderr into a bounded ring buffer and counts known error lines
+	(ALSA xruns, input and sout errors), replacing the old 'nohup.out' file.
+
+	The ring buffer and counters live in multiprocessing shared memory: create the monitor before forking, and
+	diagnostics() will then reflect output read by whichever process launched VLC.
+	"""
+	def __init__(self, name, max_lines=200, line_width=240, on_event=None):
+		self.name = name
+		self.max_lines = max_lines
+		self.line_width = line_width
+		self.on_event = on_event 	## Optional callback(kind, line) for each known event
+		self.__lines = Array('c', max_lines * line_width)
+		self.__written = Value('L', 0, lock=False) 	## Total lines ever written (guarded by the __lines lock)
+		self.__counts = Array('L', len(KNOWN_VLC_EVENTS))
+		self.__thread = None
+
+
+	@staticmethod
+	def classify(line):
+		""" Returns the kind of known event that 'line' reports, or None. """
+		for kind, pattern in KNOWN_VLC_EVENTS:
+			if pattern.search(line):
+				return kind
+		return None
+
+
+	def attach(self, process):
+		""" Starts a daemon thread draining 'process.stdout' (must be a pipe) into the ring buffer. """
+		self.__thread = threading.Thread(target=self.__reader, args=(process.stdout,), name=f'{self.name}_output', daemon=True)
+		self.__thread.start()
+
+
+	def record(self, line):
+		line = line.rstrip()
+		if not line:
+			return
+		data = line.encode('utf-8', 'replace')[:self.line_width]
+		with self.__lines.get_lock():
+			slot = self.__written.value % self.max_lines
+			start = slot * self.line_width
+			self.__lines[start:start + self.line_width] = data.ljust(self.line_width, b'\0')
+			self.__written.value += 1
+		kind = self.classify(line)
+		if kind is not None:
+			idx = [k for k, _ in KNOWN_VLC_EVENTS].index(kind)
+			with self.__counts.get_lock():
+				self.__counts[idx] += 1
+			if self.on_event is not None:
+				try:
+					self.on_event(kind, line)
+				except Exception:
+					pass
+
+
+	def __reader(self, pipe):
+		try:
+			for raw in iter(pipe.readline, b''):
+				self.record(raw.decode('utf-8', 'replace'))
+		except (OSError, ValueError):
+			pass 	## Pipe closed underneath us (child killed)
+		finally:
+			try:
+				pipe.close()
+			except OSError:
+				pass
+
+
+	def recent_lines(self, n=None):
+		""" Returns up to 'n' (default: all buffered) of the most recent output lines, oldest first. """
+		with self.__lines.get_lock():
+			written = self.__written.value
+			raw = self.__lines.raw
+		available = min(written, self.max_lines)
+		n = available if n is None else min(n, available)
+		lines = []
+		for i in range(written - n, written):
+			start = (i % self.max_lines) * self.line_width
+			lines.append(raw[start:start + self.line_width].rstrip(b'\0').decode('utf-8', 'replace'))
+		return lines
+
+
+	def diagnostics(self, n_lines=20):
+		with self.__counts.get_lock():
+			counts = {kind: self.__counts[i] for i, (kind, _) in enumerate(KNOWN_VLC_EVENTS)}
+		return {"lines_seen": self.__written.value, "event_counts": counts, "recent_lines": self.recent_lines(n_lines)}
+
+
+##=============================================================================
+
+## Input MRL prefixes that several VLC instances can capture from at once (see VLCAudioStreamer.replace())
+SHAREABLE_INPUT_PREFIXES = ('alsa://dsnoop', 'alsa://pulse', 'pulse://')
+
+## Seconds between repeats of a "waiting for VLC to exit" message (works with any logger, not just AsyncLogger)
+STOP_WAIT_REPORT_PERIOD = 10.0
+
+## How VLCAudioStreamer.replace() applied new settings
+REPLACED_MAKE_BEFORE_BREAK = 'make_before_break'
+REPLACED_BY_RESTART = 'restart'
+REPLACEMENT_FAILED = 'failed' 		## The new encoder produced no packets; the old stream keeps running on the old settings
+
+def is_multicast(address):
+	try:
+		return ipaddress.ip_address(address).is_multicast
+	except ValueError:
+		return False
+
+
+class StreamPacketProbe():
+	"""
+	Listens on an RTP/UDP stream destination to tell when (and from which source) packets arrive. On a multicast
+	group it joins passively (every member socket gets its own copy); on a unicast address it binds the port itself,
+	so it may only be used while nothing else is bound there (e.g., on the loopback port before the listener starts)
+	-- otherwise it raises OSError. Use as a context manager (or call close()).
+	"""
+	def __init__(self, address, port):
+		self.address = address
+		self.port = port
+		self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+		try:
+			if is_multicast(address):
+				self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+				if hasattr(socket, 'SO_REUSEPORT'):
+					self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+				self.sock.bind((address, port)) 	## Binding to the group (not INADDR_ANY) leaves the unicast loopback port alone
+				self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP,
+									 struct.pack('4s4s', socket.inet_aton(address), socket.inet_aton('0.0.0.0')))
+			else:
+				self.sock.bind((address, port))
+		except OSError:
+			self.sock.close()
+			raise
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+	def close(self):
+		try:
+			self.sock.close()
+		except OSError:
+			pass
+
+	@staticmethod
+	def source_of(packet):
+		"""
+		Identifies a stream packet: 'rtp:<ssrc>' for an RTP v2 packet (VLC's 'rtp{mux=ts}' output), 'ts' for a raw
+		MPEG-TS datagram (sync byte 0x47), or None if it is neither.
+		"""
+		if len(packet) >= 12 and (packet[0] >> 6) == 2:
+			return 'rtp:%08x' % struct.unpack('!I', packet[8:12])[0]
+		if packet and packet[0] == 0x47:
+			return 'ts'
+		return None
+
+	def wait_for_source(self, timeout, exclude=()):
+		""" Returns the source of the first stream packet not from a source in 'exclude', or None after 'timeout' s. """
+		deadline = monotonic() + timeout
+		while True:
+			remaining = deadline - monotonic()
+			if remaining <= 0:
+				return None
+			self.sock.settimeout(remaining)
+			try:
+				packet = self.sock.recv(2048)
+			except socket.timeout:
+				return None
+			source = self.source_of(packet)
+			if source is not None and source not in exclude:
+				return source
+
+	def sources(self, duration):
+		""" Returns the set of sources heard within 'duration' seconds. """
+		heard = set()
+		deadline = monotonic() + duration
+		while True:
+			source = self.wait_for_source(deadline - monotonic(), exclude=heard)
+			if source is None:
+				return heard
+			heard.add(source)
+
+
+def wait_for_stream_packets(address, port, timeout):
+	""" Blocks until a stream packet arrives at address:port (returns its source), or None after 'timeout' s. """
+	with StreamPacketProbe(address, port) as probe:
+		return probe.wait_for_source(timeout)
+
+
+class StreamMonitor():
+	"""
+	Background thread tracking packet arrival && RTP sequence continuity on a dedicated monitor destination of the
+	stream (see VLCAudioStreamer's 'monitor_port'): stalled_for() tells how long the stream has been silent on the wire,
+	which VLC's own process state does not (with '--sout-keep' it keeps running after its input dies).
+	"""
+	def __init__(self, address, port):
+		self.address = address
+		self.port = port
+		self.packets = 0
+		self.lost_packets = 0 		## Missing RTP sequence numbers
+		self.source_changes = 0
+		self.source = None
+		self.__last_seq = None
+		self.__last_packet = monotonic()
+		self.__lock = threading.Lock()
+		self.__stop = threading.Event()
+		self.__probe = None
+
+	def start(self):
+		""" Binds the monitor port (raises OSError if it is taken) && starts the receiving thread. """
+		self.__probe = StreamPacketProbe(self.address, self.port)
+		self.__probe.sock.settimeout(0.5)
+		threading.Thread(target=self.__run, name=f'stream_monitor_{self.port}', daemon=True).start()
+
+	def stop(self):
+		self.__stop.set()
+
+	def reset(self):
+		""" Restarts the stall clock (e.g., after deliberately restarting the stream). """
+		with self.__lock:
+			self.__last_packet = monotonic()
+			self.__last_seq = None
+
+	def stalled_for(self):
+		""" Seconds since the last packet (or since start()/reset() if none arrived since). """
+		with self.__lock:
+			return monotonic() - self.__last_packet
+
+	def snapshot(self):
+		with self.__lock:
+			return {"packets": self.packets, "lost_packets": self.lost_packets, "source_changes": self.source_changes,
+					"source": self.source, "seconds_since_packet": round(monotonic() - self.__last_packet, 3)}
+
+	def __record(self, packet):
+		source = StreamPacketProbe.source_of(packet)
+		if source is None:
+			return
+		with self.__lock:
+			self.__last_packet = monotonic()
+			self.packets += 1
+			if source != self.source:
+				if self.source is not None:
+					self.source_changes += 1
+				self.source = source
+				self.__last_seq = None
+			if source.startswith('rtp:'):
+				seq = struct.unpack('!H', packet[2:4])[0]
+				if self.__last_seq is not None:
+					self.lost_packets += (seq - self.__last_seq - 1) % 65536 	## Sequence numbers wrap at 2^16
+				self.__last_seq = seq
+
+	def __run(self):
+		try:
+			while not self.__stop.is_set():
+				try:
+					self.__record(self.__probe.sock.recv(2048))
+				except socket.timeout:
+					continue
+				except OSError:
+					break
+		finally:
+			self.__probe.close()
+
+
 ##=============================================================================
 
 class VLCAudioBase():
 	""" 
 	Base class from which the VLCAudioStreamer and VLCAudioListener subclasses inherit.
 	"""
-	def __init__(self, audio_settings, verbose_level, executable, protocol):
+	def __init__(self, audio_settings, verbose_level, executable, protocol, output_monitor=None):
 		assert isinstance(audio_settings, VLCAudioSettings)
 		self.cfg = audio_settings 	 ## Must be an `AudioSettings` dataclass instance
-		self.v_opt = '-{}'.format('v'*verbose_level) if verbose_level in range(1,4) else '-q'
+		self.output_monitor = output_monitor 	## Optional VLCOutputMonitor capturing the child's stdout/stderr
+		if verbose_level in range(1,4):
+			self.v_opt = '-{}'.format('v'*verbose_level)
+		else:
+			## '-q' also silences errors; keep VLC's default (errors only) when its output is being monitored
+			self.v_opt = '' if output_monitor is not None else '-q'
 		self.vlc = executable
 		self.proto = protocol
 
@@ -44,7 +331,24 @@ class VLCAudioBase():
 	@property
 	def opt_str(self):
 		""" Returns the global VLC options shared by both streamers and listeners. """
-		return f'{self.v_opt} --no-sout-video --sout-audio --ttl=1 --sout-keep'
+		return f'{self.v_opt} --no-sout-video --sout-audio --ttl=1 --sout-keep'.lstrip()
+
+
+	def launch(self, cmd_str, use_shell=False):
+		"""
+		Spawns the VLC command; without a shell, the trailing '&' is dropped (Popen already runs the job in the 
+		background). If an output monitor is attached, the child's stdout/stderr are piped into it.
+		"""
+		cmd = cmd_str
+		if not use_shell:
+			cmd = shlex.split(cmd_str)
+			if cmd and cmd[-1] == '&':
+				cmd = cmd[:-1]
+		if self.output_monitor is None:
+			return sproc.Popen(cmd, shell=use_shell)
+		process = sproc.Popen(cmd, shell=use_shell, stdout=sproc.PIPE, stderr=sproc.STDOUT, stdin=sproc.DEVNULL)
+		self.output_monitor.attach(process)
+		return process
 	
 
 	@property
@@ -100,17 +404,24 @@ class VLCAudioStreamer(VLCAudioBase):
 	"""
 	def __init__(self, name, audio_settings, dest_ip_address, dest_port=1234, 
 				loopback_addr='127.0.0.1', loopback_port=1234, loopback_name='loopback', 
-				verbose_level=0, executable='cvlc', protocol='rtp', logger=None, use_nohup=True):
+				verbose_level=0, executable='cvlc', protocol='rtp', logger=None, use_nohup=True, input_opts='',
+				output_monitor=None, monitor_addr='127.0.0.1', monitor_port=None, meter_addr='127.0.0.1', meter_port=None):
 		## NOTE: Currently no support for any protocol other than RTP; in future, can add support for HTTP streams
-		super().__init__(audio_settings, verbose_level, executable, protocol)
+		super().__init__(audio_settings, verbose_level, executable, protocol, output_monitor)
 		self.name = name 
+		self.input_opts = input_opts 	## Extra demuxer options for the input MRL (e.g., for a synthetic raw PCM source)
 		self.out_addr = dest_ip_address
 		self.out_port = dest_port
 		self.dup_out_addr = loopback_addr
 		self.dup_out_port = loopback_port
 		self.dup_out_name = loopback_name
+		self.monitor_addr = monitor_addr 	## Optional third destination for a StreamMonitor (None/0 port disables it)
+		self.monitor_port = monitor_port
+		self.meter_addr = meter_addr 	## Optional raw s16l PCM copy (before the lossy transcode) for a LiveLevelFeed (None/0 port disables it)
+		self.meter_port = meter_port
 		self.__state = "STOPPED"
 		self.process = None
+		self.launched_at = None 	## monotonic() instant the running encoder was launched (for pipeline delay measurement)
 		self.stream_log = logger
 		self.__last_cmd_used_shell = False
 		self.nohup = use_nohup
@@ -129,7 +440,20 @@ class VLCAudioStreamer(VLCAudioBase):
 		"""
 		destination1 = ''.join(["rtp{mux=ts,dst=", self.out_addr, ",port=", str(self.out_port), ",sdp=sap,name='", self.name, "'}"])
 		destination2 = ''.join(["rtp{mux=ts,dst=", self.dup_out_addr, ",port=", str(self.dup_out_port), ",sdp=sap,name='", self.dup_out_name, "'}"])
-		return ''.join(["duplicate{dst=", destination1, ",dst=", destination2, "}"])
+		if not self.monitor_port:
+			return ''.join(["duplicate{dst=", destination1, ",dst=", destination2, "}"])
+		destination3 = ''.join(["rtp{mux=ts,dst=", self.monitor_addr, ",port=", str(self.monitor_port), "}"])
+		return ''.join(["duplicate{dst=", destination1, ",dst=", destination2, ",dst=", destination3, "}"])
+
+
+	@property
+	def meter_str(self):
+		""" Transcode && output chain of the level meter's raw PCM copy (stream sample rate && channel count). """
+		return ''.join([
+				"transcode{acodec=s16l,channels=", str(self.cfg.channels),
+				",samplerate=", str(self.cfg.samplerate), "}",
+				":std{access=udp,mux=raw,dst=", self.meter_addr, ":", str(self.meter_port), "}"
+				])
 	
 
 	@property
@@ -137,9 +461,12 @@ class VLCAudioStreamer(VLCAudioBase):
 		"""
 		Formats and returns the 'sout' stream output configuration string for the VLC command; this 
 		tells VLC how to transcode the raw audio data ('transcode_str' acquired from VLCAudioBase class)
-		and where/how to stream the transcoded audio data to its multiple target addresses.
+		and where/how to stream the transcoded audio data to its multiple target addresses. With a meter port,
+		the input is duplicated first so that the meter's copy skips the lossy transcode.
 		"""
-		return f"#{self.transcode_str}:{self.duplicate_str}"
+		if not self.meter_port:
+			return f"#{self.transcode_str}:{self.duplicate_str}"
+		return ''.join(["#duplicate{dst=", self.transcode_str, ":", self.duplicate_str, ",dst=", self.meter_str, "}"])
 
 
 	@property
@@ -151,7 +478,8 @@ class VLCAudioStreamer(VLCAudioBase):
 		other being a local loopback address for a VLCAudioListener instance to bind to for capturing
 		and processing the live feed's audio data in parallel.
 		"""
-		self.__stream_cmd = f'{self.vlc} {self.opt_str} --sout "{self.sout}" {self.input_stream} &'
+		input_str = f'{self.input_opts} {self.input_stream}' if self.input_opts else self.input_stream
+		self.__stream_cmd = f'{self.vlc} {self.opt_str} --sout "{self.sout}" {input_str} &'
 		if self.nohup:
 			self.__stream_cmd = 'nohup ' + self.__stream_cmd
 		return self.__stream_cmd
@@ -230,8 +558,8 @@ class VLCAudioStreamer(VLCAudioBase):
 		https://stackoverflow.com/questions/4789837/how-to-terminate-a-python-subprocess-launched-with-shell-true
 		"""
 		if not self.is_running:
-			cmd = self.stream_cmd if use_shell else shlex.split(self.stream_cmd)
-			self.process = sproc.Popen(cmd, shell=use_shell)
+			self.process = self.launch(self.stream_cmd, use_shell)
+			self.launched_at = monotonic()
 			self.update_state("STREAMING")
 		else:
 			msg = f"[{self.name}]  Streamer is already streaming audio; call ignored."
@@ -265,14 +593,16 @@ class VLCAudioStreamer(VLCAudioBase):
 					except (ProcessLookupError, TypeError):
 						pass	## Ignore errors if the stream process no longer exists or if self.pid is None
 			sleep(0.05)
+			last_report = None
 			while self.is_running:
-				msg = f"[stream_stop]  Waiting for child process '{self.name}' to terminate..."
-				if self.stream_log:
-					self.stream_log.warning(msg)
-				else:
-					print(msg)
+				if last_report is None or monotonic() - last_report >= STOP_WAIT_REPORT_PERIOD: 	## Rate-limited (capture hot path)
+					msg = f"[stream_stop]  Waiting for child process '{self.name}' to terminate..."
+					if self.stream_log:
+						self.stream_log.warning(msg)
+					else:
+						print(msg)
+					last_report = monotonic()
 				sleep(0.2)
-				continue
 			self.process = None
 		else:
 			msg = f"[stream_stop]  Popen process for VLCAudioStreamer '{self.name}' is None!"
@@ -294,6 +624,105 @@ class VLCAudioStreamer(VLCAudioBase):
 		self.update_state("STOPPED")
 		
 
+	@property
+	def input_is_shareable(self):
+		"""
+		True if a second VLC instance can capture from the same input concurrently, i.e., the input MRL is an ALSA
+		'dsnoop' (or PulseAudio) device; 'alsa://hw:...' devices are exclusive and a FIFO would split its data.
+		"""
+		return self.cfg.tx_mrl.startswith(SHAREABLE_INPUT_PREFIXES)
+
+
+	def replace(self, new_settings, ready_timeout=10.0, survey_seconds=0.5):
+		"""
+		Restarts the stream with 'new_settings', make-before-break where possible: the new encoder is launched while
+		the old one is still streaming, and the old one is killed as soon as a packet from the new encoder's RTP
+		source (a new SSRC) is heard on the multicast group -- so listeners see at most the brief overlap instead of
+		VLC's startup time. VLC cannot re-target a running instance's outputs, so the new encoder sends to the real
+		destinations from the start and the "swap" is the old encoder's retirement.
+
+		This needs a shareable input (see input_is_shareable) and a multicast destination to observe; otherwise (or
+		if the group can't be watched) it falls back to break-before-make, waiting for the restarted stream's first
+		packet instead of a fixed sleep. If the new encoder never produces packets, it is killed and the old stream
+		keeps running on the old settings.
+
+		Returns the path taken: REPLACED_MAKE_BEFORE_BREAK, REPLACED_BY_RESTART or REPLACEMENT_FAILED. Raises OSError
+		only if VLC can't be launched at all.
+		"""
+		old_settings = self.cfg
+		if not self.is_running:
+			self.update_audio_settings(new_settings)
+			self.stream_start()
+			return REPLACED_BY_RESTART
+		if not (self.input_is_shareable and is_multicast(self.out_addr)) or self.__last_cmd_used_shell:
+			msg = f"[{self.name}]  Input '{self.cfg.tx_mrl}' is not shareable (or '{self.out_addr}' is not multicast); restarting the stream"
+			if self.stream_log:
+				self.stream_log.info(msg)
+			else:
+				print(msg)
+			return self.__restart(new_settings, ready_timeout)
+		try:
+			probe = StreamPacketProbe(self.out_addr, self.out_port)
+		except OSError as exc:
+			msg = f"[{self.name}]  Cannot watch {self.out_addr}:{self.out_port} for the new encoder ({exc}); restarting the stream"
+			if self.stream_log:
+				self.stream_log.warning(msg)
+			else:
+				print(msg)
+			return self.__restart(new_settings, ready_timeout)
+
+		with probe:
+			old_sources = probe.sources(survey_seconds)
+			self.update_audio_settings(new_settings)
+			try:
+				new_process = self.launch(self.stream_cmd)
+			except OSError:
+				self.update_audio_settings(old_settings) 	## The old encoder is untouched
+				raise
+			started = monotonic()
+			new_source = probe.wait_for_source(ready_timeout, exclude=old_sources)
+		if new_source is None:
+			new_process.kill()
+			new_process.wait()
+			self.update_audio_settings(old_settings)
+			msg = f"[{self.name}]  Replacement encoder produced no packets within {ready_timeout} s; keeping the old stream"
+			if self.stream_log:
+				self.stream_log.warning(msg)
+			else:
+				print(msg)
+			return REPLACEMENT_FAILED
+		old_process, self.process = self.process, new_process
+		self.launched_at = started
+		old_process.kill()
+		old_process.wait()
+		msg = f"[{self.name}]  Stream replaced make-before-break (new source {new_source} after {monotonic() - started:.2f} s)"
+		if self.stream_log:
+			self.stream_log.info(msg)
+		else:
+			print(msg)
+		self.update_state("STREAMING")
+		return REPLACED_MAKE_BEFORE_BREAK
+
+
+	def __restart(self, new_settings, ready_timeout):
+		""" Break-before-make restart for replace(); waits for the first multicast packet when the group can be watched. """
+		self.stream_stop()
+		self.update_audio_settings(new_settings)
+		self.stream_start()
+		if is_multicast(self.out_addr):
+			try:
+				live = wait_for_stream_packets(self.out_addr, self.out_port, ready_timeout) is not None
+				msg = None if live else f"[{self.name}]  No packets from the restarted stream within {ready_timeout} s"
+			except OSError as exc:
+				msg = f"[{self.name}]  Cannot verify the restarted stream on {self.out_addr}:{self.out_port} ({exc})"
+			if msg is not None:
+				if self.stream_log:
+					self.stream_log.warning(msg)
+				else:
+					print(msg)
+		return REPLACED_BY_RESTART
+
+
 ## TODO (optional): Additional methods for controlling stream, reading CPU usage, etc.
 
 ##=============================================================================
@@ -314,11 +743,15 @@ class VLCAudioListener(VLCAudioBase):
 	TODO
 	"""
 	def __init__(self, name, audio_settings, capture_format='wav', capture_duration=30, 
-				verbose_level=0, executable='cvlc', protocol='rtp', logger=None, use_nohup=True):
-		super().__init__(audio_settings, verbose_level, executable, protocol)
+				verbose_level=0, executable='cvlc', protocol='rtp', logger=None, use_nohup=True, output_monitor=None,
+				analysis_samplerate=0):
+		super().__init__(audio_settings, verbose_level, executable, protocol, output_monitor)
 		self.name = name 
 		self.clip_format = capture_format.lower()
 		self.recording_duration = capture_duration
+		## If non-zero, each clip also gets a PCM (s16l) sidecar at this rate for in-process audio analysis
+		self.analysis_samplerate = int(analysis_samplerate or 0)
+		self.__current_analysis_name = None
 		self.__state = "STOPPED"
 		self.process = None
 		self.listen_log = logger
@@ -351,12 +784,27 @@ class VLCAudioListener(VLCAudioBase):
 		return ''.join(["std{access=file,mux=", self.clip_format, ",dst=", self.clip_filename, "}"])
 	
 
+	@property
+	def analysis_transcode_str(self):
+		""" Transcode chain for the PCM analysis sidecar (same channel count as the clip, reduced sample rate). """
+		return ''.join([
+				"transcode{acodec=s16l,channels=", str(self.cfg.channels),
+				",samplerate=", str(self.analysis_samplerate), "}"
+				])
+
+
 	@property
 	def sout(self):
 		""" 
 
 		"""
-		return f"#{self.transcode_str}:{self.save_clip_str}"
+		if not self.analysis_samplerate:
+			return f"#{self.transcode_str}:{self.save_clip_str}"
+		save_clip_str = self.save_clip_str
+		self.__current_analysis_name = f"{self.__current_clip_name}.anl"
+		save_analysis_str = ''.join(["std{access=file,mux=wav,dst=", os.path.join(os.getcwd(), self.__current_analysis_name), "}"])
+		return ''.join(["#duplicate{dst=", self.transcode_str, ":", save_clip_str,
+						",dst=", self.analysis_transcode_str, ":", save_analysis_str, "}"])
 
 
 	@property
@@ -437,13 +885,13 @@ class VLCAudioListener(VLCAudioBase):
 
 		"""
 		if not self.is_running:
-			cmd = self.listen_cmd if use_shell else shlex.split(self.listen_cmd)
+			cmd = self.listen_cmd 	## Evaluating listen_cmd also picks the new clip's filename
 			msg = f"[{self.name}]  Listener recording new clip:  '{self.__current_clip_name}'"
 			if self.listen_log:
 				self.listen_log.info(msg)
 			else:
 				print(msg)
-			self.process = sproc.Popen(cmd, shell=use_shell)
+			self.process = self.launch(cmd, use_shell)
 			self.update_state("RECORDING")
 		else:
 			msg = f"[{self.name}]  Listener is already recording loopback audio; call ignored."
@@ -475,14 +923,16 @@ class VLCAudioListener(VLCAudioBase):
 					except (ProcessLookupError, TypeError):
 						pass	## Ignore errors if the stream process no longer exists or if self.pid is None
 			sleep(0.05)
+			last_report = None
 			while self.is_running:
-				msg = f"[listen_stop]  Waiting for child process '{self.name}' to terminate..."
-				if self.listen_log:
-					self.listen_log.warning(msg)
-				else:
-					print(msg)
+				if last_report is None or monotonic() - last_report >= STOP_WAIT_REPORT_PERIOD: 	## Rate-limited (capture hot path)
+					msg = f"[listen_stop]  Waiting for child process '{self.name}' to terminate..."
+					if self.listen_log:
+						self.listen_log.warning(msg)
+					else:
+						print(msg)
+					last_report = monotonic()
 				sleep(0.2)
-				continue
 			msg = f"[{self.name}]  Listener successfully captured audio clip:  '{self.__current_clip_name}'"
 			if self.listen_log:
 				self.listen_log.info(msg)
@@ -521,4 +971,11 @@ class VLCAudioListener(VLCAudioBase):
 		return current_clip_name
 
 
+	def get_recent_analysis_file(self):
+		""" Returns (and forgets) the most recent clip's PCM analysis sidecar filename, or None if disabled. """
+		current_analysis_name = self.__current_analysis_name
+		self.__current_analysis_name = None
+		return current_analysis_name
+
+
 ##=============================================================================